@@ -2,7 +2,7 @@ from logging.config import fileConfig
 from sqlalchemy import engine_from_config, pool
 from alembic import context
 from app.data.connection import Base, engine  # Import Base and engine
-from app.data.model import Kline  # Add other models as necessary
+from app.data.model import Kline, Cycle  # Add other models as necessary
 
 # Interpret the config file for Python logging
 config = context.config
@@ -0,0 +1,40 @@
+"""Add trade journal columns and indexes to cycles
+
+Revision ID: 7c3f1e2a9b54
+Revises: de12ecf48286
+Create Date: 2025-01-15 09:41:07.512236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3f1e2a9b54'
+down_revision: Union[str, None] = 'de12ecf48286'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cycles', sa.Column('symbol', sa.String(length=20), nullable=True))
+    op.add_column('cycles', sa.Column('strategy_id', sa.String(length=50), nullable=True))
+    op.add_column('cycles', sa.Column('quantity', sa.Float(), nullable=True))
+    op.add_column('cycles', sa.Column('fees', sa.Float(), server_default='0', nullable=False))
+    op.add_column('cycles', sa.Column('profit', sa.Float(), nullable=True))
+    op.add_column('cycles', sa.Column('exit_reason', sa.String(length=20), nullable=True))
+    op.create_index(op.f('ix_cycles_status'), 'cycles', ['status'], unique=False)
+    op.create_index(op.f('ix_cycles_buy_date'), 'cycles', ['buy_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cycles_buy_date'), table_name='cycles')
+    op.drop_index(op.f('ix_cycles_status'), table_name='cycles')
+    op.drop_column('cycles', 'exit_reason')
+    op.drop_column('cycles', 'profit')
+    op.drop_column('cycles', 'fees')
+    op.drop_column('cycles', 'quantity')
+    op.drop_column('cycles', 'strategy_id')
+    op.drop_column('cycles', 'symbol')
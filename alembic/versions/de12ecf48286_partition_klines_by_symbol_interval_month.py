@@ -0,0 +1,102 @@
+"""Partition klines by month with a (symbol, interval, open_time) key
+
+Revision ID: de12ecf48286
+Revises: 491129f677f8
+Create Date: 2025-01-08 10:12:44.318402
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de12ecf48286'
+down_revision: Union[str, None] = '491129f677f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+KLINE_COLUMNS = "open_time, close_time, open_price, high_price, low_price, close_price, volume"
+
+
+def _month_partitions(start, end):
+    """Yields (name, from, to) for every month between start and end included."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        next_year, next_month = year + month // 12, month % 12 + 1
+        yield (
+            f"klines_y{year}m{month:02d}",
+            f"{year}-{month:02d}-01",
+            f"{next_year}-{next_month:02d}-01",
+        )
+        year, month = next_year, next_month
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Existing rows have no symbol/interval, by default they are the BTCUSDT 1m history.
+    # Override with: alembic -x legacy_symbol=ETHUSDT -x legacy_interval=1m upgrade head
+    x_args = context.get_x_argument(as_dictionary=True)
+    legacy_symbol = x_args.get('legacy_symbol', 'BTCUSDT')
+    legacy_interval = x_args.get('legacy_interval', '1m')
+
+    op.rename_table('klines', 'klines_legacy')
+    op.execute('ALTER TABLE klines_legacy RENAME CONSTRAINT klines_pkey TO klines_legacy_pkey')
+
+    has_timescale = bind.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")).scalar()
+
+    columns = [
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('interval', sa.String(length=5), nullable=False),
+        sa.Column('open_time', sa.DateTime(), nullable=False),
+        sa.Column('close_time', sa.DateTime(), nullable=False),
+        sa.Column('open_price', sa.Float(), nullable=False),
+        sa.Column('high_price', sa.Float(), nullable=False),
+        sa.Column('low_price', sa.Float(), nullable=False),
+        sa.Column('close_price', sa.Float(), nullable=False),
+        sa.Column('volume', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol', 'interval', 'open_time'),
+    ]
+
+    if has_timescale:
+        # TimescaleDB chunks the hypertable by open_time on its own
+        op.create_table('klines', *columns)
+        op.execute("SELECT create_hypertable('klines', 'open_time', chunk_time_interval => INTERVAL '1 month')")
+    else:
+        op.create_table('klines', *columns, postgresql_partition_by='RANGE (open_time)')
+        bounds = bind.execute(sa.text("SELECT min(open_time), max(open_time) FROM klines_legacy")).first()
+        if bounds[0] is not None:
+            for name, start, end in _month_partitions(bounds[0], bounds[1]):
+                op.execute(f"CREATE TABLE {name} PARTITION OF klines FOR VALUES FROM ('{start}') TO ('{end}')")
+        op.execute("CREATE TABLE klines_default PARTITION OF klines DEFAULT")
+
+    op.execute(sa.text(
+        f'INSERT INTO klines (symbol, "interval", {KLINE_COLUMNS}) '
+        f'SELECT :symbol, :interval, {KLINE_COLUMNS} FROM klines_legacy '
+        f'ON CONFLICT DO NOTHING'
+    ).bindparams(symbol=legacy_symbol, interval=legacy_interval))
+    op.drop_table('klines_legacy')
+
+
+def downgrade() -> None:
+    op.rename_table('klines', 'klines_partitioned')
+    op.execute('ALTER TABLE klines_partitioned RENAME CONSTRAINT klines_pkey TO klines_partitioned_pkey')
+    op.create_table('klines',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('open_time', sa.DateTime(), nullable=False),
+    sa.Column('close_time', sa.DateTime(), nullable=False),
+    sa.Column('open_price', sa.Float(), nullable=False),
+    sa.Column('high_price', sa.Float(), nullable=False),
+    sa.Column('low_price', sa.Float(), nullable=False),
+    sa.Column('close_price', sa.Float(), nullable=False),
+    sa.Column('volume', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        f"INSERT INTO klines ({KLINE_COLUMNS}) "
+        f"SELECT {KLINE_COLUMNS} FROM klines_partitioned ORDER BY symbol, \"interval\", open_time"
+    )
+    # Dropping the parent drops every partition with it
+    op.drop_table('klines_partitioned')
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import math
+from collections import defaultdict
+
+import pandas as pd
+from loguru import logger
+
+
+def _finite(value):
+    """JSON has no NaN: indicators still warming up are sent as null."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+class CandleBroadcaster:
+    """
+    Single fan-out of live candles to the chart. LiveKlineService calls on_bar() once per
+    update; the message (candle, latest indicator values and signal) is built and serialized
+    once, then queued to every viewer of that symbol, so a viewer only costs a put_nowait
+    and nothing per viewer touches the database.
+    `strategy_factory(symbol)` returns the Strategy whose streaming indicators and signal
+    are attached to the closed bars.
+    """
+
+    def __init__(self, strategy_factory=None, queue_size=256):
+        self.strategy_factory = strategy_factory
+        self.queue_size = queue_size
+        self.clients = defaultdict(set)  # symbol -> queues of the connected viewers
+        self.strategies = {}
+        self.indicators = {}  # symbol -> latest indicator values and signal
+        self.last_message = {}  # symbol -> latest message, sent first to new viewers
+
+    def connect(self, symbol):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if symbol in self.last_message:
+            queue.put_nowait(self.last_message[symbol])
+        self.clients[symbol].add(queue)
+        return queue
+
+    def disconnect(self, symbol, queue):
+        self.clients[symbol].discard(queue)
+
+    def viewers(self, symbol=None):
+        if symbol is not None:
+            return len(self.clients.get(symbol, ()))
+        return sum(len(queues) for queues in self.clients.values())
+
+    def _update_indicators(self, symbol, buffer):
+        strategy = self.strategies.get(symbol)
+        if strategy is None:
+            # First closed bar seen: warm up on the buffer history, then score the newest bar
+            strategy = self.strategies[symbol] = self.strategy_factory(symbol)
+            arrays = buffer.arrays()
+            history = pd.DataFrame({
+                name: arrays[name][:-1][arrays["closed"][:-1]] for name in ("high_price", "low_price", "close_price")
+            })
+            strategy.warm_up(history)
+
+        index = (buffer.count - 1) % buffer.capacity
+        bar = {
+            "high_price": buffer.values[index, 1],
+            "low_price": buffer.values[index, 2],
+            "close_price": buffer.values[index, 3],
+        }
+        signal = strategy.update(bar)
+        values = {name: _finite(value) for name, value in strategy.stream.values().items() if name != "close_price"}
+        self.indicators[symbol] = {"values": values, "signal": signal}
+
+    def on_bar(self, symbol, buffer, closed):
+        """LiveKlineService subscriber: publishes the newest bar of `buffer`."""
+        if closed and self.strategy_factory is not None:
+            try:
+                self._update_indicators(symbol, buffer)
+            except Exception as e:
+                logger.error(f"Failed to update live indicators for {symbol}: {e}")
+
+        index = (buffer.count - 1) % buffer.capacity
+        open_price, high_price, low_price, close_price, volume = buffer.values[index]
+        message = {
+            "symbol": symbol,
+            "candle": {
+                "open_time": int(buffer.open_time[index]),
+                "open_price": float(open_price),
+                "high_price": float(high_price),
+                "low_price": float(low_price),
+                "close_price": float(close_price),
+                "volume": float(volume),
+                "closed": bool(closed),
+            },
+        }
+        if symbol in self.indicators:
+            message["indicators"] = self.indicators[symbol]["values"]
+            message["signal"] = self.indicators[symbol]["signal"]
+        self.publish(symbol, json.dumps(message, separators=(",", ":")))
+
+    def publish(self, symbol, message):
+        self.last_message[symbol] = message
+        for queue in self.clients.get(symbol, ()):
+            if queue.full():
+                queue.get_nowait()  # A slow viewer skips to the newest updates
+            queue.put_nowait(message)
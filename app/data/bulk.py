@@ -0,0 +1,138 @@
+import io
+import time
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import insert
+
+from app.data.model import Kline, ensure_kline_partitions
+
+
+class KlineBulkLoader:
+    """
+    Loads kline DataFrames or CSV files into the klines table in large batches.
+    On PostgreSQL each batch is streamed with COPY FROM STDIN into a temporary staging
+    table and moved with INSERT ... ON CONFLICT DO NOTHING, other backends fall back to
+    a batched executemany. Each batch is one transaction.
+    With upsert=True existing rows are overwritten instead (ON CONFLICT DO UPDATE), which
+    candles still in progress (rollups, live bars) need.
+    After each batch `on_write(symbol, months)` is called with the YYYY-MM months it wrote
+    (symbol None when the frame has no symbol), e.g. ResponseCache.invalidate.
+    """
+
+    def __init__(self, engine, table=Kline.__table__, batch_size=100_000, upsert=False, on_write=None):
+        self.engine = engine
+        self.table = table
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.on_write = on_write
+        # Every table column except the autoincrement key can be loaded
+        self.table_columns = [column.name for column in table.columns if column.autoincrement is not True]
+
+    def _prepare(self, df, constants):
+        df = df.copy()
+        for name, value in constants.items():
+            if value is not None and name in self.table_columns:
+                df[name] = value
+        columns = [name for name in self.table_columns if name in df.columns]
+        for name in ("open_time", "close_time"):
+            if name in columns and not pd.api.types.is_datetime64_any_dtype(df[name]):
+                df[name] = pd.to_datetime(df[name])
+        return df[columns]
+
+    def load_dataframe(self, df, symbol=None, interval=None):
+        """Loads a DataFrame, returns the number of rows sent to the database."""
+        df = self._prepare(df, {"symbol": symbol, "interval": interval})
+        total = 0
+        started = time.perf_counter()
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start:start + self.batch_size]
+            if self.engine.dialect.name == "postgresql":
+                self._copy_batch(batch)
+            else:
+                self._executemany_batch(batch)
+            total += len(batch)
+            self._notify(batch)
+
+        elapsed = time.perf_counter() - started
+        if total:
+            logger.info(f"Loaded {total} klines in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)")
+        return total
+
+    def _notify(self, batch):
+        if self.on_write is None or "open_time" not in batch.columns:
+            return
+        months = batch["open_time"].dt.strftime("%Y-%m")
+        if "symbol" not in batch.columns:
+            self.on_write(None, set(months))
+            return
+        for symbol, symbol_months in months.groupby(batch["symbol"]):
+            self.on_write(symbol, set(symbol_months))
+
+    def write(self, df, symbol, interval):
+        """Same signature as ParquetKlineStore.write, so either can be a kline sink."""
+        return self.load_dataframe(df, symbol=symbol, interval=interval)
+
+    def _conflict_clause(self, columns):
+        if not self.upsert:
+            return "ON CONFLICT DO NOTHING"
+        keys = [column.name for column in self.table.primary_key.columns]
+        conflict = ", ".join(f'"{name}"' for name in keys)
+        updates = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in columns if name not in keys)
+        return f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+
+    def load_csv(self, csv_file, chunksize=None, symbol=None, interval=None):
+        """Streams a kline CSV into the database chunk by chunk."""
+        total = 0
+        for chunk in pd.read_csv(csv_file, chunksize=chunksize or self.batch_size):
+            total += self.load_dataframe(chunk, symbol=symbol, interval=interval)
+        logger.info(f"Successfully saved {total} rows from {csv_file} to the database!")
+        return total
+
+    def _copy_batch(self, batch):
+        columns = ", ".join(f'"{name}"' for name in batch.columns)
+        buffer = io.StringIO()
+        batch.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        with self.engine.begin() as connection:
+            if self.table is Kline.__table__ and "open_time" in batch.columns:
+                ensure_kline_partitions(connection, batch["open_time"].min(), batch["open_time"].max())
+
+            cursor = connection.connection.cursor()
+            cursor.execute(
+                f"CREATE TEMP TABLE klines_staging ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {self.table.name} WITH NO DATA"
+            )
+            copy_sql = f"COPY klines_staging ({columns}) FROM STDIN WITH (FORMAT csv)"
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(copy_sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                f"INSERT INTO {self.table.name} ({columns}) "
+                f"SELECT {columns} FROM klines_staging {self._conflict_clause(batch.columns)}"
+            )
+
+    def _executemany_batch(self, batch):
+        statement = insert(self.table)
+        if self.engine.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            statement = sqlite_insert(self.table)
+            if self.upsert:
+                keys = [column.name for column in self.table.primary_key.columns]
+                statement = statement.on_conflict_do_update(
+                    index_elements=keys,
+                    set_={name: statement.excluded[name] for name in batch.columns if name not in keys},
+                )
+            else:
+                statement = statement.on_conflict_do_nothing()
+        columns = list(batch.columns)
+        values = [
+            list(batch[name].dt.to_pydatetime()) if pd.api.types.is_datetime64_any_dtype(batch[name]) else batch[name].tolist()
+            for name in columns
+        ]
+        rows = [dict(zip(columns, row)) for row in zip(*values)]
+        with self.engine.begin() as connection:
+            connection.execute(statement, rows)
@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
@@ -22,14 +23,70 @@ engine = create_engine(
 # SessionLocal for dependency injection in apps
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Generic Type for SQLAlchemy models
+# Async drivers used by the FastAPI app for each sync URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-def get_db() -> Session:
+# Created on first use so scripts that only need the sync engine don't require asyncpg
+_async_engine = None
+_async_session_factory = None
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """Rewrites a sync database URL to its async driver (postgresql:// -> postgresql+asyncpg://)."""
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def get_async_engine():
+    """
+    Returns the shared AsyncEngine. Its pool is sized by DB_POOL_SIZE / DB_MAX_OVERFLOW
+    so concurrent chart requests each get a connection instead of queueing on one.
+    """
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+        options = {"pool_pre_ping": True}
+        if not url.startswith("sqlite"):
+            options["pool_size"] = int(os.getenv("DB_POOL_SIZE", "10"))
+            options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        _async_engine = create_async_engine(url, **options)
+        _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_engine
+
+
+async def get_async_session():
+    """
+    FastAPI dependency providing an AsyncSession, closed when the request ends.
+    """
+    get_async_engine()
+    async with _async_session_factory() as session:
+        yield session
+
+
+async def dispose_async_engine():
+    """Closes the pooled async connections (app shutdown)."""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_session_factory = None
+
+
+def get_db():
     """
-    Provides a database session.
+    Provides a database session (FastAPI dependency), closed once the request is done.
     """
     db = SessionLocal()  # Create a new session
-    return db  # Return the session directly
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 # Create all tables (only for development, avoid in production)
@@ -50,13 +107,18 @@ class Database:
         self.engine = create_engine(db_url, pool_pre_ping=True)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
+    @contextmanager
     def get_session(self) -> Session:
         """
-        Creates and returns a database session.
+        Session for scripts: `with db_manager.get_session() as db: ...`, rolled back on
+        error and always closed. The app uses get_async_session instead.
         """
         db = self.SessionLocal()
         try:
             yield db
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
 
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of the n_out points that best keep the shape
+    of the (x, y) line. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Third vertex: average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        indices[bucket + 1] = previous
+    return indices
+
+
+def minmax_buckets(df, n_out):
+    """
+    Merges consecutive candles into n_out equal-count buckets (open first, high max, low min,
+    close last, volume sum), so every wick of the full range survives downsampling.
+    """
+    n = len(df)
+    if n_out >= n:
+        return df
+    starts = np.unique(np.linspace(0, n, n_out, endpoint=False).astype(np.int64))
+    ends = np.concatenate((starts[1:], [n])) - 1
+
+    candles = {"open_time": df["open_time"].to_numpy()[starts]}
+    if "close_time" in df.columns:
+        candles["close_time"] = df["close_time"].to_numpy()[ends]
+    candles["open_price"] = df["open_price"].to_numpy()[starts]
+    candles["high_price"] = np.maximum.reduceat(df["high_price"].to_numpy(), starts)
+    candles["low_price"] = np.minimum.reduceat(df["low_price"].to_numpy(), starts)
+    candles["close_price"] = df["close_price"].to_numpy()[ends]
+    if "volume" in df.columns:
+        candles["volume"] = np.add.reduceat(df["volume"].to_numpy(), starts)
+    return pd.DataFrame(candles)
+
+
+def downsample_klines(df, max_points, method="minmax"):
+    """
+    Reduces a kline frame to at most max_points rows: "minmax" re-buckets the candles,
+    "lttb" keeps the candles selected by LTTB on the close price.
+    """
+    if not max_points or len(df) <= max_points:
+        return df
+    if method == "lttb":
+        x = df["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+        return df.iloc[lttb_indices(x, df["close_price"].to_numpy(), max_points)].reset_index(drop=True)
+    if method == "minmax":
+        return minmax_buckets(df, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
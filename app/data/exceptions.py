@@ -7,4 +7,9 @@ class BinanceKlinesError(Exception):
 class BinanceAPIError(BinanceKlinesError):
     """Exception raised for errors in the Binance API."""
     def __init__(self, message="An error occurred with the Binance API"):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+
+class BinanceRateLimitError(BinanceAPIError):
+    """Exception raised when Binance keeps rejecting requests for exceeding the rate limit."""
+    def __init__(self, message="Binance rate limit exceeded"):
+        super().__init__(message)
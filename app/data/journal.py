@@ -0,0 +1,245 @@
+import asyncio
+import datetime
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import insert, select, update
+
+from app.data.model import Cycle
+
+
+EXIT_REASONS = {0: "stop_loss", 1: "target_profit"}  # backtester.EXIT_STOP_LOSS / EXIT_TARGET_PROFIT
+
+
+def _to_datetime(value):
+    """Epoch ms, Timestamp or datetime -> naive UTC datetime as stored in the cycles table."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.datetime.fromtimestamp(value / 1000, tz=datetime.timezone.utc).replace(tzinfo=None)
+    return pd.Timestamp(value).to_pydatetime()
+
+
+class TradeJournal:
+    """
+    Write-behind journal of trade cycles in the `cycles` table. open_cycle()/close_cycle()
+    only enqueue, so the trading loop never waits on the database; a background task
+    drains the queue and commits up to `batch_size` operations per transaction, at least
+    every `flush_interval` seconds. A batch that fails is retried as a whole (one
+    transaction) with exponential backoff, ahead of what was queued meanwhile; on close()
+    it gets `close_retries` more attempts before being dropped.
+    Cycles are identified by a key chosen by the caller (by default (symbol, strategy_id),
+    one open cycle per strategy and symbol). A close whose cycle wasn't opened by this
+    journal, e.g. before a restart, goes to the latest open cycle of its symbol and strategy.
+    """
+
+    def __init__(self, session_factory=None, strategy_id=None, batch_size=500, flush_interval=1.0,
+                 retry_delay=1.0, max_retry_delay=60.0, close_retries=3):
+        if session_factory is None:
+            from app.data.connection import get_async_engine
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+            session_factory = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+        self.session_factory = session_factory
+        self.strategy_id = strategy_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.close_retries = close_retries
+        self.queue = asyncio.Queue()
+        self.ids = {}  # key -> id of the open cycle in the database
+        self.written = 0
+        self.dropped = 0
+        self._task = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def close(self):
+        """Writes what is still queued and stops the writer."""
+        self._closing = True
+        try:
+            if self._task is not None:
+                self.queue.put_nowait(None)
+                await self._task
+                self._task = None
+            else:
+                while not self.queue.empty():
+                    await self._write_batch(self._drain())
+        finally:
+            self._closing = False
+
+    # Producers (non-blocking)
+
+    def open_cycle(self, symbol, buy_price, buy_date, quantity=None, fees=0.0, strategy_id=None, key=None):
+        strategy_id = strategy_id or self.strategy_id
+        self.queue.put_nowait(("open", key or (symbol, strategy_id), {
+            "symbol": symbol,
+            "strategy_id": strategy_id,
+            "buy_price": buy_price,
+            "buy_date": _to_datetime(buy_date),
+            "quantity": quantity,
+            "fees": fees,
+            "status": "in_progress",
+        }))
+
+    def close_cycle(self, symbol, sell_price, sell_date, fees=0.0, profit=None, exit_reason=None, strategy_id=None, key=None):
+        strategy_id = strategy_id or self.strategy_id
+        self.queue.put_nowait(("close", key or (symbol, strategy_id), {
+            "symbol": symbol,  # Only used to find the open cycle
+            "strategy_id": strategy_id,
+            "sell_price": sell_price,
+            "sell_date": _to_datetime(sell_date),
+            "fees": fees,  # Added to the buy fees
+            "profit": profit,
+            "exit_reason": EXIT_REASONS.get(exit_reason, exit_reason),
+            "status": "completed",
+        }))
+
+    def on_trade(self, event, details):
+        """LiveTradingEngine on_trade callback."""
+        fill = details["fill"]
+        # Fees are journaled in the quote asset (buy fees are usually taken in the base asset)
+        fee = fill.fee * fill.price if fill.fee_asset and fill.symbol.startswith(fill.fee_asset) else fill.fee
+        strategy_id = details.get("strategy_id")
+        if event == "buy":
+            self.open_cycle(fill.symbol, fill.price, details["time"], fill.quantity, fee, strategy_id)
+        else:
+            self.close_cycle(fill.symbol, fill.price, details["time"], fee, details.get("profit"),
+                             details.get("reason"), strategy_id)
+
+    # Writer
+
+    def _drain(self, first=None):
+        operations = [] if first is None else [first]
+        while len(operations) < self.batch_size:
+            try:
+                operations.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return operations
+
+    async def _run(self):
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            operations = self._drain(first)
+            stop = None in operations
+            await self._write_batch([operation for operation in operations if operation is not None])
+            if stop:
+                while not self.queue.empty():
+                    await self._write_batch(self._drain())
+                return
+
+    async def _write_batch(self, operations):
+        """_write() with retries, returns False when the batch was dropped (only on close)."""
+        delay = self.retry_delay
+        failures = 0
+        while True:
+            try:
+                await self._write(operations)
+                return True
+            except Exception as e:
+                failures += 1
+                if self._closing and failures > self.close_retries:
+                    self.dropped += len(operations)
+                    logger.error(f"Dropped {len(operations)} journal operations after {failures} failed writes: {e}")
+                    return False
+                logger.warning(f"Failed to write {len(operations)} journal operations ({e}), retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    @staticmethod
+    async def _open_cycle_id(session, symbol, strategy_id):
+        """Id of the latest cycle of symbol/strategy_id still open in the database."""
+        result = await session.execute(
+            select(Cycle.id)
+            .where(Cycle.symbol == symbol, Cycle.strategy_id == strategy_id,
+                   Cycle.sell_date.is_(None), Cycle.status == "in_progress")
+            .order_by(Cycle.buy_date.desc(), Cycle.id.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def _close(session, cycle_id, values):
+        """Completes cycle `cycle_id` if it is still open, returns whether it was."""
+        result = await session.execute(
+            update(Cycle)
+            .where(Cycle.id == cycle_id, Cycle.sell_date.is_(None), Cycle.status == "in_progress")
+            .values(values)
+        )
+        return result.rowcount > 0
+
+    async def _write(self, operations):
+        if not operations:
+            return
+        # self.ids only changes once the transaction is committed, so a failed batch can be replayed
+        closed = set()
+        async with self.session_factory() as session:
+            async with session.begin():
+                pending = {}  # key -> Cycle added in this transaction
+                for kind, key, values in operations:
+                    if kind == "open":
+                        cycle = Cycle(**values)
+                        session.add(cycle)
+                        pending[key] = cycle
+                        continue
+                    symbol, strategy_id = values["symbol"], values["strategy_id"]
+                    values = {name: value for name, value in values.items() if name not in ("symbol", "strategy_id")}
+                    if key in pending:
+                        cycle = pending.pop(key)
+                        values = dict(values, fees=(cycle.fees or 0.0) + values["fees"])
+                        for name, value in values.items():
+                            setattr(cycle, name, value)
+                        continue
+                    values = dict(values, fees=Cycle.fees + values["fees"])
+                    cycle_id = self.ids.get(key) if key not in closed else None
+                    if cycle_id is None or not await self._close(session, cycle_id, values):
+                        cycle_id = await self._open_cycle_id(session, symbol, strategy_id)
+                        if cycle_id is None or not await self._close(session, cycle_id, values):
+                            logger.warning(f"No open cycle to close for {key}")
+                            continue
+                    closed.add(key)
+                await session.flush()
+                opened = {key: cycle.id for key, cycle in pending.items()}
+        for key in closed:
+            self.ids.pop(key, None)
+        self.ids.update(opened)
+        self.written += len(operations)
+
+    # Readers
+
+    async def open_cycles(self):
+        async with self.session_factory() as session:
+            result = await session.execute(select(Cycle).where(Cycle.status == "in_progress"))
+            return result.scalars().all()
+
+
+def record_trade_cycles(engine, trade_cycles, symbol=None, strategy_id=None):
+    """
+    Stores completed cycles (TradingSystem.trade_cycles dicts) in one transaction with a
+    single executemany, instead of a commit per row.
+    """
+    rows = [
+        {
+            "symbol": symbol,
+            "strategy_id": strategy_id,
+            "buy_price": cycle["Buy Price"],
+            "buy_date": _to_datetime(cycle["Buy Date"]),
+            "sell_price": cycle["Sell Price"],
+            "sell_date": _to_datetime(cycle["Sell Date"]),
+            "profit": cycle["Profit/Loss"],
+            "status": "completed",
+        }
+        for cycle in trade_cycles
+    ]
+    if rows:
+        with engine.begin() as connection:
+            connection.execute(insert(Cycle), rows)
+    return len(rows)
@@ -1,86 +1,321 @@
+import asyncio
 import os
+import time
+import numpy as np
 import pandas as pd
-from app.data.exceptions import BinanceAPIError
-from app.data.schemas import KlineColumns
+from app.data.exceptions import BinanceAPIError, BinanceRateLimitError
+from app.data.schemas import KlineColumns, KlineIntervals
+from app.data.manifest import BackfillManifest, find_holes, merge_ranges, subtract_ranges
 import httpx  # Use httpx for asynchronous HTTP requests
 from loguru import logger
+
+
+BINANCE_BASE_URL = "https://api.binance.com"
+KLINES_PATH = "/api/v3/klines"
+MAX_KLINES_LIMIT = 1000  # Largest page Binance returns for /api/v3/klines
+
+
+class RequestWeightLimiter:
+    """
+    Keeps track of the request weight Binance reports in the X-MBX-USED-WEIGHT-1M header
+    and holds new requests back when the budget for the current minute is nearly used.
+    """
+
+    def __init__(self, weight_limit=6000, safety_margin=0.9, request_weight=2):
+        self.weight_limit = weight_limit
+        self.threshold = weight_limit * safety_margin
+        self.request_weight = request_weight
+        self.used_weight = 0
+        self.window_start = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.used_weight = 0
+            if self.used_weight + self.request_weight > self.threshold:
+                wait = 60 - (now - self.window_start)
+                logger.warning(f"Request weight {self.used_weight}/{self.weight_limit} used, waiting {wait:.1f}s")
+                await asyncio.sleep(max(wait, 0))
+                self.window_start = time.monotonic()
+                self.used_weight = 0
+            # Reserve the weight now, the response header corrects it afterwards
+            self.used_weight += self.request_weight
+
+    def update_from_headers(self, headers):
+        used = headers.get("x-mbx-used-weight-1m")
+        if used is not None:
+            self.used_weight = max(self.used_weight, int(used))
+
+    def block_for(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
 class BinanceKlines:
-    def __init__(self, symbol, interval, start_time, end_time, chunk_size=3600000):  # Default chunk size = 1 hour in ms
+    def __init__(self, symbol, interval, start_time, end_time, chunk_size=None, base_url=BINANCE_BASE_URL,
+                 limit=MAX_KLINES_LIMIT, max_concurrency=10, max_retries=5, weight_limit=6000, client=None,
+                 output_dir="klines_data"):
         self.symbol = symbol
         self.interval = interval
         self.start_time = start_time
         self.end_time = end_time
-        self.chunk_size = chunk_size
+        self.limit = limit
+        # One request covers `limit` candles unless a smaller chunk is asked for; a larger
+        # chunk would only get its first `limit` bars back and silently skip the rest
+        max_chunk_size = limit * KlineIntervals.to_milliseconds(interval.lower())
+        if chunk_size is not None and not 0 < chunk_size <= max_chunk_size:
+            raise ValueError(f"chunk_size must be between 1 and {max_chunk_size} ms ({limit} {interval} bars).")
+        self.chunk_size = chunk_size or max_chunk_size
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.rate_limiter = RequestWeightLimiter(weight_limit=weight_limit, request_weight=2 if limit > 100 else 1)
+        self._client = client
+        self._owns_client = client is None
+        self.output_dir = output_dir
         self.data = None
-        logger.info(f"BinanceKlines initialized with symbol={symbol}, interval={interval}, start_time={start_time}, end_time={end_time}, chunk_size={chunk_size}")
+        logger.info(f"BinanceKlines initialized with symbol={symbol}, interval={interval}, start_time={start_time}, end_time={end_time}, chunk_size={self.chunk_size}")
 
-    async def fetch_and_wrangle_klines(self, save_to_csv=True):
-        try:
-            # Loop through the time period in chunks
-            current_start_time = self.start_time
-            while current_start_time < self.end_time:
-                current_end_time = min(current_start_time + self.chunk_size, self.end_time)
-                logger.info(f"Fetching data from {current_start_time} to {current_end_time}")
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
 
-                # Fetch data for the current chunk
-                self.data = await self.fetch_data_from_binance(current_start_time, current_end_time)
+    def get_client(self):
+        """Returns the pooled HTTP client, reused by every chunk request."""
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            try:
+                self._client = httpx.AsyncClient(base_url=self.base_url, http2=True, limits=limits, timeout=30)
+            except ImportError:
+                # http2 needs the h2 package, keep-alive over HTTP/1.1 still avoids a handshake per chunk
+                self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=30)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    def plan_chunks(self, start_time=None, end_time=None):
+        """Splits [start_time, end_time) into the (start, end) ranges of single requests."""
+        start_time = self.start_time if start_time is None else start_time
+        end_time = self.end_time if end_time is None else end_time
+        return [
+            (chunk_start, min(chunk_start + self.chunk_size, end_time))
+            for chunk_start in range(start_time, end_time, self.chunk_size)
+        ]
+
+    async def fetch_and_wrangle_klines(self, save_to_csv=True, batch_size=50):
+        try:
+            chunks = self.plan_chunks()
+            frames = []
+            # Fetch the chunks concurrently, a batch at a time, so rows are written in order
+            for batch_start in range(0, len(chunks), batch_size):
+                batch = chunks[batch_start:batch_start + batch_size]
+                logger.info(f"Fetching data from {batch[0][0]} to {batch[-1][1]} in {len(batch)} requests")
+                self.data = await self.fetch_chunks(batch)
 
                 if not self.data:
                     logger.error("No data returned from fetch_data_from_binance.")
                     raise ValueError("No data fetched from Binance API.")
-                
+
                 df = self.convert_data_to_dataframe()
 
-                # Save data to CSV immediately after each chunk is fetched
                 if save_to_csv:
                     self.save_to_csv(df)
+                else:
+                    frames.append(df)
 
-                # Move to the next chunk
-                current_start_time = current_end_time
-
+            if not save_to_csv:
+                return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=KlineColumns.COLUMNS[:-1])
             return "Data fetched and saved successfully!"
-        
+
         except Exception as e:
             logger.error(f"Error during fetching and wrangling klines: {e}")
             raise
+        finally:
+            await self.aclose()
+
+    def store_path(self):
+        """CSV file holding every downloaded bar of the symbol/interval, used by backfill()."""
+        return os.path.join(self.output_dir, f"{self.symbol}_{self.interval}.csv")
+
+    @staticmethod
+    def stored_open_times(file_path):
+        """Open times (ms) of the bars stored in a kline CSV, sorted."""
+        open_time = pd.read_csv(file_path, usecols=["open_time"])["open_time"]
+        open_time = pd.to_datetime(open_time).to_numpy().astype("datetime64[ms]").astype(np.int64)
+        return np.unique(open_time)
+
+    async def backfill(self, manifest=None, verify_stored=True, batch_size=50):
+        """
+        Downloads only what is missing between start_time and end_time: ranges the manifest
+        has no record of and, with verify_stored, holes found in the stored CSV.
+        Progress is written to the manifest after every batch, so a crashed run resumes
+        where it stopped. Returns the number of bars fetched.
+        """
+        manifest = manifest or BackfillManifest(os.path.join(self.output_dir, "manifest.json"))
+        interval_ms = KlineIntervals.to_milliseconds(self.interval.lower())
+        file_path = self.store_path()
+        file_existed = os.path.exists(file_path)
+
+        # Bars that have not closed yet cannot be backfilled
+        now_ms = int(time.time() * 1000)
+        end_time = min(self.end_time, now_ms - now_ms % interval_ms)
+        start_time = self.start_time + (-self.start_time) % interval_ms  # First bar open time
+        if end_time <= start_time:
+            return 0
+
+        to_fetch = manifest.missing(self.symbol, self.interval, start_time, end_time)
+        if verify_stored and file_existed:
+            open_times = self.stored_open_times(file_path)
+            known_empty = merge_ranges(manifest.empty(self.symbol, self.interval))
+            for start, end in manifest.completed(self.symbol, self.interval):
+                start, end = max(start, start_time), min(end, end_time)
+                if start >= end:
+                    continue
+                for hole_start, hole_end in find_holes(open_times, interval_ms, start, end):
+                    to_fetch.extend(subtract_ranges(hole_start, hole_end, known_empty))
+        to_fetch = merge_ranges(to_fetch)
+
+        if not to_fetch:
+            logger.info(f"{self.symbol} {self.interval} already complete between {start_time} and {end_time}.")
+            return 0
+
+        chunks = [chunk for start, end in to_fetch for chunk in self.plan_chunks(start, end)]
+        logger.info(f"Backfilling {len(to_fetch)} gaps of {self.symbol} {self.interval} in {len(chunks)} requests")
+
+        fetched = 0
+        try:
+            for batch_start in range(0, len(chunks), batch_size):
+                batch = chunks[batch_start:batch_start + batch_size]
+                results = await self.fetch_chunk_results(batch)
+
+                klines = [kline for chunk in results for kline in chunk]
+                if klines:
+                    self.save_to_csv(self.convert_data_to_dataframe(klines), file_path)
+                    fetched += len(klines)
+
+                # Bars Binance does not have inside a fetched chunk are recorded as empty
+                empty = []
+                for (start, end), chunk in zip(batch, results):
+                    empty.extend(find_holes([kline[0] for kline in chunk], interval_ms, start, end))
+                manifest.record(self.symbol, self.interval, completed=batch, empty=empty)
+        finally:
+            await self.aclose()
+
+        # Gap fills were appended after later bars, restore order and drop any duplicates
+        if file_existed and fetched:
+            self.compact_csv(file_path)
+
+        logger.info(f"Backfill of {self.symbol} {self.interval} fetched {fetched} bars.")
+        return fetched
+
+    @staticmethod
+    def compact_csv(file_path):
+        """Rewrites a kline CSV sorted by open_time with duplicate bars removed."""
+        df = pd.read_csv(file_path)
+        df = df.drop_duplicates(subset="open_time", keep="last")
+        df["sort_key"] = pd.to_datetime(df["open_time"])
+        df = df.sort_values("sort_key").drop(columns=["sort_key"])
+        tmp_path = f"{file_path}.tmp"
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+        logger.info(f"Compacted {file_path} to {len(df)} rows")
+
+    async def fetch_chunk_results(self, chunks):
+        """Fetches the given (start, end) chunks concurrently, one kline list per chunk."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch(chunk_start, chunk_end):
+            async with semaphore:
+                return await self.fetch_data_from_binance(chunk_start, chunk_end)
+
+        return await asyncio.gather(*(fetch(start, end) for start, end in chunks))
+
+    async def fetch_chunks(self, chunks):
+        """
+        Fetches the given (start, end) chunks concurrently and returns their klines
+        reassembled in time order, without duplicates.
+        """
+        results = await self.fetch_chunk_results(chunks)
+
+        klines = []
+        last_open_time = None
+        for chunk in results:
+            for kline in chunk:
+                if last_open_time is None or kline[0] > last_open_time:
+                    klines.append(kline)
+                    last_open_time = kline[0]
+        return klines
 
     async def fetch_data_from_binance(self, start_time, end_time):
-        base_url = "https://api.binance.com/api/v3/klines"
-        all_klines = []
+        client = self.get_client()
+        params = {
+            "symbol": self.symbol,
+            "interval": self.interval.lower(),
+            "startTime": start_time,
+            "endTime": end_time - 1,  # endTime is inclusive, the next chunk starts at end_time
+            "limit": self.limit,
+        }
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await client.get(KLINES_PATH, params=params)
+            except httpx.RequestError as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Error fetching data from Binance API: {str(e)}")
+                    raise BinanceAPIError(f"Error fetching data from Binance API: {str(e)}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
 
-        async with httpx.AsyncClient() as client:
-            params = {
-                "symbol": self.symbol,
-                "interval": self.interval.lower(),
-                "startTime": start_time,
-                "endTime": end_time
-            }
+            self.rate_limiter.update_from_headers(response.headers)
+
+            # 429: too many requests, 418: IP banned after ignoring 429s
+            if response.status_code in (429, 418):
+                retry_after = float(response.headers.get("retry-after", 2 ** attempt))
+                self.rate_limiter.block_for(retry_after)
+                logger.warning(f"Binance returned {response.status_code}, retrying in {retry_after:.0f}s")
+                if attempt == self.max_retries:
+                    raise BinanceRateLimitError(f"Binance rate limit exceeded for {start_time}-{end_time}")
+                continue
+
+            if response.status_code >= 500 and attempt < self.max_retries:
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
 
             try:
-                response = await client.get(base_url, params=params)
                 response.raise_for_status()
-                klines = response.json()
+            except httpx.HTTPStatusError as e:
+                raise BinanceAPIError(f"Error fetching data from Binance API: {str(e)}")
 
-                if not klines:
-                    logger.info(f"No more data found between {start_time} and {end_time}.")
-                    return []
+            klines = response.json()
+            if not klines:
+                logger.info(f"No more data found between {start_time} and {end_time}.")
+                return []
 
-                all_klines.extend(klines)
-                logger.info(f"Fetched {len(klines)} klines from Binance API between {start_time} and {end_time}.")
+            logger.info(f"Fetched {len(klines)} klines from Binance API between {start_time} and {end_time}.")
+            return klines
 
-            except httpx.RequestError as e:
-                logger.error(f"Error fetching data from Binance API: {str(e)}")
-                raise BinanceAPIError(f"Error fetching data from Binance API: {str(e)}")
-        
-        return all_klines
+        raise BinanceAPIError(f"Error fetching data from Binance API between {start_time} and {end_time}")
 
-    def convert_data_to_dataframe(self):
-        if not self.data:
+    def convert_data_to_dataframe(self, data=None):
+        data = self.data if data is None else data
+        if not data:
             logger.error("No data available for conversion.")
             raise ValueError("No data available to convert to DataFrame.")
 
         logger.info("Converting fetched data to DataFrame.")
-        df = pd.DataFrame(self.data, columns=KlineColumns.COLUMNS)
+        df = pd.DataFrame(data, columns=KlineColumns.COLUMNS)
 
         # Ensure columns exist before trying to convert types
         if 'open_price' in df.columns:
@@ -90,7 +325,7 @@ class BinanceKlines:
         if 'low_price' in df.columns:
             df['low_price'] = df['low_price'].astype(float)
         if 'close_price' in df.columns:
-            df['close'] = df['close_price'].astype(float)
+            df['close_price'] = df['close_price'].astype(float)
         if 'volume' in df.columns:
             df['volume'] = df['volume'].astype(float)
         if 'quote_asset_volume' in df.columns:
@@ -104,19 +339,19 @@ class BinanceKlines:
 
         df["open_time"] = pd.to_datetime(df["open_time"], unit='ms')
         df["close_time"] = pd.to_datetime(df["close_time"], unit='ms')
-        df = df.drop(columns=["ignored"], axis=1, errors='ignore')
-        
+        df = df.drop(columns=["ignored"], errors='ignore')
+
         logger.info("Data conversion to DataFrame completed.")
         return df
 
-    def save_to_csv(self, df):
+    def save_to_csv(self, df, file_path=None):
         # Ensure output directory exists
-        output_dir = "klines_data"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
 
         # Save all chunks to the same CSV file (appending data)
-        file_path = os.path.join(output_dir, f"{self.symbol}_{self.interval}_{self.start_time}_{self.end_time}.csv")
+        if file_path is None:
+            file_path = os.path.join(self.output_dir, f"{self.symbol}_{self.interval}_{self.start_time}_{self.end_time}.csv")
 
         # If the file exists, append; otherwise, create a new file
         if os.path.exists(file_path):
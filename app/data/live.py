@@ -0,0 +1,311 @@
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+import websockets
+from loguru import logger
+
+from app.data.exceptions import BinanceKlinesError
+from app.data.klines import BINANCE_BASE_URL, BinanceKlines
+from app.data.resample import KlineRollups
+from app.data.schemas import KlineIntervals
+
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+
+# Failures of the stream or of the REST backfill that end in a reconnect with backoff:
+# dropped connections, rejected handshakes (e.g. HTTP 429/5xx on the upgrade) and REST errors
+RECONNECT_ERRORS = (websockets.WebSocketException, BinanceKlinesError, httpx.HTTPError, OSError,
+                    asyncio.TimeoutError)
+
+# Order of the float columns in KlineRingBuffer.values
+BAR_FIELDS = ("open_price", "high_price", "low_price", "close_price", "volume")
+
+
+class KlineRingBuffer:
+    """
+    The last `capacity` bars of one symbol in preallocated NumPy arrays. Writing a bar is
+    O(1) and allocation free; the bar still in progress is overwritten in place until it
+    closes.
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.open_time = np.zeros(capacity, dtype=np.int64)  # Epoch ms
+        self.close_time = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros((capacity, len(BAR_FIELDS)), dtype=np.float64)
+        self.closed = np.zeros(capacity, dtype=bool)
+        self.count = 0  # Bars written since creation, the newest is at (count - 1) % capacity
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def latest_open_time(self):
+        return int(self.open_time[(self.count - 1) % self.capacity]) if self.count else None
+
+    def update(self, open_time, close_time, open_price, high_price, low_price, close_price, volume, closed):
+        """Writes a bar, returns False when it is older than the newest bar (stale update)."""
+        latest = self.latest_open_time
+        if latest is not None and open_time < latest:
+            return False
+        if latest is None or open_time > latest:
+            self.count += 1
+        index = (self.count - 1) % self.capacity
+        self.open_time[index] = open_time
+        self.close_time[index] = close_time
+        row = self.values[index]
+        row[0], row[1], row[2], row[3], row[4] = open_price, high_price, low_price, close_price, volume
+        self.closed[index] = closed
+        return True
+
+    def _order(self):
+        size = len(self)
+        return np.arange(self.count - size, self.count) % self.capacity
+
+    def arrays(self):
+        """Chronological copies of the buffer: open_time, close_time (ms), the BAR_FIELDS and closed."""
+        order = self._order()
+        arrays = {"open_time": self.open_time[order], "close_time": self.close_time[order]}
+        for column, name in enumerate(BAR_FIELDS):
+            arrays[name] = self.values[order, column]
+        arrays["closed"] = self.closed[order]
+        return arrays
+
+    def to_frame(self):
+        frame = pd.DataFrame(self.arrays())
+        frame["open_time"] = pd.to_datetime(frame["open_time"], unit="ms")
+        frame["close_time"] = pd.to_datetime(frame["close_time"], unit="ms")
+        return frame
+
+
+class LiveKlineService:
+    """
+    Long-running kline ingestion from the Binance WebSocket API. All symbols share one
+    combined-stream connection. On every (re)connect the bars missed since the last closed
+    one are backfilled over REST (BinanceKlines) before the stream is consumed, and the
+    connection is retried with exponential backoff.
+    Every bar lands in the symbol's KlineRingBuffer. Closed bars are also queued and flushed
+    to `writer.write(df, symbol, interval)` (KlineBulkLoader / ParquetKlineStore) every
+    `flush_size` bars or `flush_interval` seconds, with the rollups of `rollup_intervals`
+    (a rollup candle is only complete when the warm-up buffer covers its start, e.g.
+    capacity >= 1440 for 1d). Each flush merges into ParquetKlineStore by rewriting the
+    month file of every interval written, so with that writer keep `flush_interval` in
+    the minutes rather than seconds; KlineBulkLoader only inserts the new rows.
+    """
+
+    def __init__(self, symbols, interval="1m", capacity=1000, writer=None, flush_size=500, flush_interval=5.0,
+                 ws_url=BINANCE_WS_URL, rest_base_url=BINANCE_BASE_URL, rest_client=None, rollup_intervals=(),
+                 warm_up=True, max_backoff=60.0):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.interval = interval
+        self.interval_ms = KlineIntervals.to_milliseconds(interval)
+        self.buffers = {symbol: KlineRingBuffer(capacity) for symbol in self.symbols}
+        self.last_closed = {symbol: None for symbol in self.symbols}  # open_time (ms) of the last closed bar
+        self.writer = writer
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.ws_url = ws_url
+        self.rest_base_url = rest_base_url
+        self.rest_client = rest_client
+        self.warm_up = warm_up
+        self.max_backoff = max_backoff
+        self.rollups = {
+            symbol: KlineRollups(symbol, writer=writer, intervals=rollup_intervals)
+            for symbol in self.symbols
+        } if writer is not None and rollup_intervals else {}
+
+        self.pending = []  # Closed bars waiting for the next flush
+        self.subscribers = []
+        self.connected = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_wakeup = asyncio.Event()
+        self._flush_stop = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.reconnects = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def stream_url(self):
+        streams = "/".join(f"{symbol.lower()}@kline_{self.interval}" for symbol in self.symbols)
+        return f"{self.ws_url}/stream?streams={streams}"
+
+    def subscribe(self, callback):
+        """
+        Registers callback(symbol, buffer, closed), called on the event loop after every bar
+        update. Callbacks must be quick (e.g. Queue.put_nowait).
+        """
+        self.subscribers.append(callback)
+
+    def handle_message(self, raw):
+        """Applies one combined-stream kline message, returns (symbol, closed) or None."""
+        received = time.perf_counter()
+        message = json.loads(raw)
+        kline = message.get("data", message).get("k")
+        if kline is None:
+            return None
+        symbol = kline["s"]
+        closed = kline["x"]
+        applied = self.apply_bar(
+            symbol, kline["t"], kline["T"], float(kline["o"]), float(kline["h"]), float(kline["l"]),
+            float(kline["c"]), float(kline["v"]), closed, number_of_trades=kline["n"],
+        )
+        latency = (time.perf_counter() - received) * 1000
+        self.last_latency_ms = latency
+        self.max_latency_ms = max(self.max_latency_ms, latency)
+        return (symbol, closed) if applied else None
+
+    def apply_bar(self, symbol, open_time, close_time, open_price, high_price, low_price, close_price, volume,
+                  closed, number_of_trades=0, notify=True, store=True):
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            return False
+        if self.last_closed[symbol] is not None and open_time <= self.last_closed[symbol]:
+            return False  # Already closed (messages queued during a backfill)
+        if not buffer.update(open_time, close_time, open_price, high_price, low_price, close_price, volume, closed):
+            return False
+
+        if closed:
+            self.last_closed[symbol] = open_time
+            if store and self.writer is not None:
+                self.pending.append((symbol, open_time, close_time, open_price, high_price, low_price,
+                                     close_price, volume, number_of_trades))
+                if len(self.pending) >= self.flush_size:
+                    self._flush_wakeup.set()
+        if notify:
+            for callback in self.subscribers:
+                try:
+                    callback(symbol, buffer, closed)
+                except Exception as e:
+                    logger.error(f"Kline subscriber failed: {e}")
+        return True
+
+    async def backfill(self, symbol, client=None):
+        """
+        Loads the closed bars missing since the last one seen over REST, or the last `capacity`
+        bars on first start when warm_up is set (those are not flushed, they are already stored).
+        Backfilled bars only land in the buffer, subscribers are not notified of them.
+        """
+        now = int(time.time() * 1000)
+        end = now // self.interval_ms * self.interval_ms  # Open time of the bar still in progress
+        last = self.last_closed[symbol]
+        if last is None:
+            if not self.warm_up:
+                return 0
+            start, store = end - self.buffers[symbol].capacity * self.interval_ms, False
+        else:
+            start, store = last + self.interval_ms, True
+        if start >= end:
+            return 0
+
+        klines = BinanceKlines(symbol, self.interval, start, end, base_url=self.rest_base_url, client=client)
+        try:
+            rows = await klines.fetch_chunks(klines.plan_chunks())
+        finally:
+            await klines.aclose()
+
+        for row in rows:
+            self.apply_bar(symbol, int(row[0]), int(row[6]), float(row[1]), float(row[2]), float(row[3]),
+                           float(row[4]), float(row[5]), True, number_of_trades=int(row[8]), notify=False,
+                           store=store)
+        if rows and not store and symbol in self.rollups:
+            # Seed the candles in progress so the first live flush doesn't write truncated rollups
+            self.rollups[symbol].update(self.buffers[symbol].to_frame(), write=False)
+        if rows:
+            logger.info(f"Backfilled {len(rows)} {symbol} {self.interval} bars over REST")
+        return len(rows)
+
+    async def run(self):
+        """Consumes the streams until stop() is called."""
+        self._flush_stop.clear()
+        flusher = asyncio.create_task(self._flush_loop())
+        backoff = 1.0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    async with websockets.connect(self.stream_url(), ping_interval=20, max_size=2 ** 20) as connection:
+                        # Messages queue up in the connection while the gap is filled
+                        await asyncio.gather(*(self.backfill(symbol, self.rest_client) for symbol in self.symbols))
+                        self.connected.set()
+                        backoff = 1.0
+                        stop_task = asyncio.create_task(self._stopping.wait())
+                        try:
+                            while True:
+                                receive = asyncio.create_task(connection.recv())
+                                done, _ = await asyncio.wait({receive, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                                if stop_task in done:
+                                    receive.cancel()
+                                    return
+                                self.handle_message(receive.result())
+                        finally:
+                            stop_task.cancel()
+                except RECONNECT_ERRORS as e:
+                    self.connected.clear()
+                    self.reconnects += 1
+                    logger.warning(f"Kline stream disconnected ({e}), reconnecting in {backoff:.0f}s")
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+                    except asyncio.TimeoutError:
+                        pass
+                    backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            self.connected.clear()
+            # Let the flush loop finish its write (a worker thread can't be interrupted), then flush the rest
+            self._flush_stop.set()
+            self._flush_wakeup.set()
+            await flusher
+            await self.flush()
+
+    async def stop(self):
+        self._stopping.set()
+
+    async def _flush_loop(self):
+        while not self._flush_stop.is_set():
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush closed klines: {e}")
+
+    async def flush(self):
+        """Writes the queued closed bars (in a worker thread), returns how many were written."""
+        if not self.pending or self.writer is None:
+            return 0
+        async with self._flush_lock:
+            rows, self.pending = self.pending, []
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except BaseException:
+                # Keep the bars for the next flush, ahead of those closed meanwhile (writers dedupe),
+                # also when the flush is cancelled since the write may not have happened
+                self.pending[:0] = rows
+                raise
+        return len(rows)
+
+    def _write(self, rows):
+        frame = pd.DataFrame(rows, columns=["symbol", "open_time", "close_time", *BAR_FIELDS, "number_of_trades"])
+        frame["open_time"] = pd.to_datetime(frame["open_time"], unit="ms")
+        frame["close_time"] = pd.to_datetime(frame["close_time"], unit="ms")
+        for symbol, bars in frame.groupby("symbol", sort=False):
+            bars = bars.drop(columns="symbol").sort_values("open_time").reset_index(drop=True)
+            self.writer.write(bars, symbol, self.interval)
+            if symbol in self.rollups:
+                self.rollups[symbol].update(bars)
+
+
+# Example usage:
+if __name__ == "__main__":
+    # python -m app.data.live BTCUSDT ETHUSDT
+    import sys
+
+    from app.data.parquet_store import ParquetKlineStore
+
+    service = LiveKlineService(sys.argv[1:] or ["BTCUSDT"], writer=ParquetKlineStore())
+    asyncio.run(service.run())
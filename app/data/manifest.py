@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+
+import numpy as np
+from loguru import logger
+
+
+def merge_ranges(ranges):
+    """Merges overlapping or touching [start, end) ranges, sorted by start."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_ranges(start, end, covered):
+    """Returns the parts of [start, end) not covered by the (merged) `covered` ranges."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append([cursor, covered_start])
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append([cursor, end])
+    return gaps
+
+
+def find_holes(open_times, interval_ms, start, end):
+    """
+    Finds the [start, end) ranges of bars missing between `start` and `end`, given the
+    sorted open times (ms) that are stored.
+    """
+    open_times = np.asarray(open_times, dtype=np.int64)
+    open_times = open_times[(open_times >= start) & (open_times < end)]
+    if open_times.size == 0:
+        return [[start, end]] if start < end else []
+
+    # Bars expected at start and right after the last stored one bound the series
+    bounds = np.concatenate(([start - interval_ms], open_times, [end]))
+    steps = np.diff(bounds)
+    missing = np.flatnonzero(steps > interval_ms)
+    return [[int(bounds[i] + interval_ms), int(bounds[i + 1])] for i in missing]
+
+
+class BackfillManifest:
+    """
+    Records the time ranges (ms, [start, end)) already downloaded per (symbol, interval),
+    plus ranges Binance returned no bars for, in a JSON file next to the stored klines.
+    """
+
+    def __init__(self, path="klines_data/manifest.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def _key(symbol, interval):
+        return f"{symbol}_{interval}"
+
+    def _entry(self, symbol, interval):
+        return self.entries.setdefault(self._key(symbol, interval), {"completed": [], "empty": []})
+
+    def completed(self, symbol, interval):
+        return [tuple(r) for r in self._entry(symbol, interval)["completed"]]
+
+    def empty(self, symbol, interval):
+        return [tuple(r) for r in self._entry(symbol, interval)["empty"]]
+
+    def record(self, symbol, interval, completed=(), empty=()):
+        """Adds downloaded ranges and ranges without bars, then persists the manifest once."""
+        with self._lock:
+            entry = self._entry(symbol, interval)
+            entry["completed"] = merge_ranges(entry["completed"] + [list(r) for r in completed])
+            # Empty ranges (e.g. exchange downtime) are remembered so they are not refetched
+            entry["empty"] = merge_ranges(entry["empty"] + [list(r) for r in empty])
+            self.save()
+
+    def mark_completed(self, symbol, interval, start, end):
+        self.record(symbol, interval, completed=[(start, end)])
+
+    def mark_empty(self, symbol, interval, start, end):
+        self.record(symbol, interval, empty=[(start, end)])
+
+    def forget(self, symbol, interval, start, end):
+        """Drops [start, end) from the completed ranges so it gets downloaded again."""
+        with self._lock:
+            entry = self._entry(symbol, interval)
+            remaining = []
+            for covered_start, covered_end in entry["completed"]:
+                remaining.extend(subtract_ranges(covered_start, covered_end, [[start, end]]))
+            entry["completed"] = remaining
+            self.save()
+
+    def missing(self, symbol, interval, start, end):
+        """Ranges inside [start, end) that were never downloaded."""
+        return subtract_ranges(start, end, merge_ranges(self.completed(symbol, interval)))
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)  # Atomic, a crash never leaves a half-written manifest
+        logger.debug(f"Manifest saved to {self.path}")
@@ -1,11 +1,14 @@
-from sqlalchemy import Column, Integer, Float, DateTime, String
+import datetime
+from sqlalchemy import Column, Integer, Float, DateTime, String, DDL, event, text
 from app.data.connection import Base
 
 class Kline(Base):
     __tablename__ = "klines"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    open_time = Column(DateTime, nullable=False)
+    # (symbol, interval, open_time) identifies a bar; open_time also drives the monthly partitions
+    symbol = Column(String(20), primary_key=True)
+    interval = Column(String(5), primary_key=True)
+    open_time = Column(DateTime, primary_key=True)
     close_time = Column(DateTime, nullable=False)
     open_price = Column(Float, nullable=False)
     high_price = Column(Float, nullable=False)
@@ -13,14 +16,58 @@ class Kline(Base):
     close_price = Column(Float, nullable=False)
     volume = Column(Float, nullable=False)
 
+    __table_args__ = {"postgresql_partition_by": "RANGE (open_time)"}
+
+
+# Catch-all partition so inserts never fail for a month without its own partition yet
+event.listen(
+    Kline.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS klines_default PARTITION OF klines DEFAULT").execute_if(dialect="postgresql"),
+)
+
+
+def kline_partition_name(month_start):
+    return f"klines_y{month_start.year}m{month_start.month:02d}"
+
+
+def ensure_kline_partitions(connection, start, end):
+    """
+    Creates the monthly klines partitions covering [start, end] on PostgreSQL.
+    Does nothing on other backends or when klines is not a partitioned table
+    (e.g. a TimescaleDB hypertable, which manages its own chunks).
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    partitioned = connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'klines'::regclass"
+    )).scalar()
+    if not partitioned:
+        return
+
+    month = datetime.datetime(start.year, start.month, 1)
+    while month <= end:
+        next_month = datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {kline_partition_name(month)} PARTITION OF klines "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        ))
+        month = next_month
+
 
 
 class Cycle(Base):
     __tablename__ = "cycles"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String(20), nullable=True)  # Trading pair, e.g. BTCUSDT
+    strategy_id = Column(String(50), nullable=True)  # Strategy / parameter set that opened the cycle
+    quantity = Column(Float, nullable=True)  # Base asset bought
     buy_price = Column(Float, nullable=False)  # Buy price at the time of opportunity
-    buy_date = Column(DateTime, nullable=False)  # Date and time of buy opportunity
+    buy_date = Column(DateTime, nullable=False, index=True)  # Date and time of buy opportunity
     sell_price = Column(Float, nullable=True)  # Sell price (nullable)
     sell_date = Column(DateTime, nullable=True)  # Date and time of sell opportunity (nullable)
-    status = Column(String(20), nullable=False, default="in_progress")  # Status: 'in_progress' or 'completed'
+    fees = Column(Float, nullable=False, default=0.0, server_default="0")  # Buy and sell fees, in quote asset
+    profit = Column(Float, nullable=True)  # Net profit/loss in quote asset once completed
+    exit_reason = Column(String(20), nullable=True)  # 'stop_loss' or 'target_profit'
+    status = Column(String(20), nullable=False, default="in_progress", index=True)  # Status: 'in_progress' or 'completed'
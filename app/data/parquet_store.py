@@ -0,0 +1,168 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+
+# Columns kept in the store: times as int64 milliseconds, prices and volumes as float32
+KLINE_SCHEMA = pa.schema([
+    ("open_time", pa.timestamp("ms")),
+    ("close_time", pa.timestamp("ms")),
+    ("open_price", pa.float32()),
+    ("high_price", pa.float32()),
+    ("low_price", pa.float32()),
+    ("close_price", pa.float32()),
+    ("volume", pa.float32()),
+    ("number_of_trades", pa.int64()),
+])
+
+
+class ParquetKlineStore:
+    """
+    Local columnar kline store: one Parquet dataset per symbol/interval, one file per month
+    (hive layout <root>/<symbol>/<interval>/month=YYYY-MM/data.parquet).
+    Range reads prune months by directory and row groups by open_time statistics.
+    `on_write(symbol, months)` is called after each month file is rewritten.
+    """
+
+    def __init__(self, root="klines_parquet", row_group_size=64 * 1024, on_write=None):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.on_write = on_write
+
+    def dataset_path(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def months(self, symbol, interval):
+        """Months stored for the symbol/interval, sorted (YYYY-MM strings)."""
+        path = self.dataset_path(symbol, interval)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name.split("=", 1)[1] for name in os.listdir(path) if name.startswith("month="))
+
+    def _month_file(self, symbol, interval, month):
+        return os.path.join(self.dataset_path(symbol, interval), f"month={month}", "data.parquet")
+
+    @staticmethod
+    def _to_table(df):
+        columns = {}
+        for field in KLINE_SCHEMA:
+            if field.name not in df.columns:
+                continue
+            values = df[field.name]
+            if pa.types.is_timestamp(field.type):
+                values = pd.to_datetime(values).to_numpy().astype("datetime64[ms]")
+            else:
+                values = values.to_numpy(dtype=field.type.to_pandas_dtype())
+            columns[field.name] = pa.array(values, type=field.type)
+        schema = pa.schema([field for field in KLINE_SCHEMA if field.name in columns])
+        return pa.table(columns, schema=schema)
+
+    @staticmethod
+    def _align(table, schema):
+        """`table` with the fields of `schema` in order, null columns for the ones it lacks."""
+        return pa.table(
+            [table.column(field.name).cast(field.type) if field.name in table.column_names else pa.nulls(len(table), field.type)
+             for field in schema],
+            schema=schema,
+        )
+
+    def write(self, df, symbol, interval):
+        """
+        Adds klines to the store. Each touched month is merged with what is already there,
+        sorted by open_time and deduplicated, then rewritten atomically. Columns only one of
+        the two has (e.g. number_of_trades, absent from rollups) are kept, null elsewhere.
+        Every call rereads and rewrites the whole month file, so frequent small writes (the
+        live flush) cost O(rows in the month) each.
+        """
+        if df.empty:
+            return 0
+        df = df.copy()
+        df["open_time"] = pd.to_datetime(df["open_time"])
+        month_keys = df["open_time"].to_numpy().astype("datetime64[M]")
+
+        written = 0
+        for month_key, month_df in df.groupby(month_keys, sort=True):
+            month = str(np.datetime64(month_key, "M"))
+            path = self._month_file(symbol, interval, month)
+            table = self._to_table(month_df)
+            if os.path.exists(path):
+                existing = pq.read_table(path)
+                names = set(existing.column_names) | set(table.column_names)
+                schema = pa.schema([field for field in KLINE_SCHEMA if field.name in names])
+                table = pa.concat_tables([self._align(existing, schema), self._align(table, schema)])
+
+            # Keep the last copy of each bar and store the month in time order
+            frame = table.to_pandas()
+            frame = frame.drop_duplicates(subset="open_time", keep="last").sort_values("open_time")
+            table = pa.Table.from_pandas(frame, schema=table.schema, preserve_index=False)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            pq.write_table(table, tmp_path, row_group_size=self.row_group_size, compression="zstd")
+            os.replace(tmp_path, path)
+            written += len(month_df)
+            if self.on_write is not None:
+                self.on_write(symbol, [month])
+
+        logger.info(f"Stored {written} {symbol} {interval} klines in {self.dataset_path(symbol, interval)}")
+        return written
+
+    def import_csv(self, csv_file, symbol, interval, chunksize=500_000):
+        """Loads a kline CSV (as written by BinanceKlines.save_to_csv) into the store."""
+        total = 0
+        for chunk in pd.read_csv(csv_file, chunksize=chunksize):
+            total += self.write(chunk, symbol, interval)
+        return total
+
+    def read_table(self, symbol, interval, start=None, end=None, columns=None):
+        """Reads [start, end] as an Arrow table, memory-mapping the month files."""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        # Month pruning happens on the file list, row-group pruning through the filters
+        paths = [
+            self._month_file(symbol, interval, month)
+            for month in self.months(symbol, interval)
+            if (start is None or month >= f"{start:%Y-%m}") and (end is None or month <= f"{end:%Y-%m}")
+        ]
+        if not paths:
+            schema = KLINE_SCHEMA if columns is None else pa.schema([KLINE_SCHEMA.field(c) for c in columns])
+            return schema.empty_table()
+
+        filters = []
+        if start is not None:
+            filters.append(("open_time", ">=", start.to_datetime64().astype("datetime64[ms]")))
+        if end is not None:
+            filters.append(("open_time", "<=", end.to_datetime64().astype("datetime64[ms]")))
+
+        tables = [
+            pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+            for path in paths
+        ]
+        return pa.concat_tables(tables)
+
+    def read(self, symbol, interval, start=None, end=None, columns=None, float64=True):
+        """
+        Reads [start, end] as a DataFrame in time order. Prices are widened back to float64
+        unless float64=False, so results match the other kline sources.
+        """
+        frame = self.read_table(symbol, interval, start, end, columns).to_pandas()
+        if float64:
+            for name in frame.columns:
+                if frame[name].dtype == np.float32:
+                    frame[name] = frame[name].astype(np.float64)
+        return frame
+
+
+# Example usage:
+if __name__ == "__main__":
+    # python -m app.data.parquet_store klines_data/BTCUSDT_1m.csv BTCUSDT 1m
+    import sys
+
+    csv_file, symbol, interval = sys.argv[1:4]
+    rows = ParquetKlineStore().import_csv(csv_file, symbol, interval)
+    print(f"Imported {rows} rows from {csv_file}")
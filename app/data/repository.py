@@ -0,0 +1,241 @@
+import asyncio
+from calendar import monthrange
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy.sql import text
+
+from app.data.resample import ROLLUP_INTERVALS, bucket_starts, resample_frame
+from app.data.schemas import KlineIntervals
+
+
+KLINE_FIELDS = ["open_time", "close_time", "open_price", "high_price", "low_price", "close_price", "volume"]
+PRICE_FIELDS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+
+def month_range(month):
+    """Returns the [start, end) timestamps of a 'YYYY-MM' month, raises ValueError otherwise."""
+    year, month_num = map(int, month.split("-"))
+    _, last_day = monthrange(year, month_num)
+    start = pd.Timestamp(year=year, month=month_num, day=1)
+    return start, start + pd.Timedelta(days=last_day)
+
+
+def normalize_klines(df):
+    """Gives a kline frame datetime64[ns] times and float64 prices, whatever the source returned."""
+    for name in ("open_time", "close_time"):
+        if name in df.columns:
+            df[name] = pd.to_datetime(df[name]).astype("datetime64[ns]")
+    for name in PRICE_FIELDS:
+        if name in df.columns:
+            df[name] = df[name].astype(np.float64)
+    return df
+
+
+class KlineRepository:
+    """
+    Single access point for stored klines. Reads from Postgres through `engine`, or from a
+    ParquetKlineStore when `store` is given, and always returns frames sorted by open_time
+    with datetime64 times and float64 prices.
+    `rollups` lists the intervals materialized by app.data.resample (KlineRollups /
+    materialize_rollups); aggregate() reads those directly instead of rebuilding them.
+    The *_async methods run the queries on `async_engine` (asyncpg) and the pandas work
+    in a worker thread, so they never block the event loop.
+    """
+
+    def __init__(self, engine=None, store=None, rollups=ROLLUP_INTERVALS, async_engine=None):
+        if engine is None and store is None:
+            from app.data.connection import engine
+        self.engine = engine
+        self.store = store
+        self.rollups = rollups
+        self.async_engine = async_engine
+
+    @staticmethod
+    def _range_filter(query, params, start, end):
+        if start is not None:
+            query += " AND open_time >= :start"
+            params["start"] = pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            query += " AND open_time < :end"
+            params["end"] = pd.Timestamp(end).to_pydatetime()
+        return query
+
+    def _fetch_query(self, symbol, interval, start, end, columns):
+        query = f"""
+        SELECT {", ".join(columns)}
+        FROM klines
+        WHERE symbol = :symbol AND "interval" = :interval
+        """
+        params = {"symbol": symbol, "interval": interval}
+        query = self._range_filter(query, params, start, end) + " ORDER BY open_time ASC"
+        return text(query), params
+
+    @staticmethod
+    def _bucket_sql(interval):
+        """date_bin() expression putting open_time in its `interval` bucket (needs :bucket_seconds)."""
+        # Binance weeks start on Monday, every shorter candle is aligned on the epoch
+        origin = "1970-01-05" if interval == "1w" else "1970-01-01"
+        return f"date_bin(make_interval(secs => :bucket_seconds), open_time, TIMESTAMP '{origin}')"
+
+    def _aggregate_query(self, interval, symbol, source_interval, start, end):
+        bucket_seconds = KlineIntervals.to_milliseconds(interval) // 1000
+        query = f"""
+        SELECT {self._bucket_sql(interval)} AS open_time,
+               max(close_time) AS close_time,
+               (array_agg(open_price ORDER BY open_time ASC))[1] AS open_price,
+               max(high_price) AS high_price,
+               min(low_price) AS low_price,
+               (array_agg(close_price ORDER BY open_time DESC))[1] AS close_price,
+               sum(volume) AS volume
+        FROM klines
+        WHERE symbol = :symbol AND "interval" = :interval
+        """
+        params = {"bucket_seconds": bucket_seconds, "symbol": symbol, "interval": source_interval}
+        query = self._range_filter(query, params, start, end) + " GROUP BY 1 ORDER BY 1"
+        return text(query), params
+
+    def _buckets_query(self, interval, symbol, source_interval, start, end):
+        query = f"""
+        SELECT {self._bucket_sql(interval)} AS bucket
+        FROM klines
+        WHERE symbol = :symbol AND "interval" = :interval
+        """
+        params = {"bucket_seconds": KlineIntervals.to_milliseconds(interval) // 1000, "symbol": symbol,
+                  "interval": source_interval}
+        query = self._range_filter(query, params, start, end)
+        query = f"SELECT min(bucket), max(bucket), count(DISTINCT bucket) FROM ({query}) AS source"
+        return text(query), params
+
+    @staticmethod
+    def _bucket_summary(open_time, interval):
+        """(first, last, count) of the distinct `interval` buckets (ns) of source bar times."""
+        if len(open_time) == 0:
+            return None
+        open_time = np.asarray(open_time).astype("datetime64[ns]").astype(np.int64)
+        buckets = np.unique(bucket_starts(open_time, interval))
+        return int(buckets[0]), int(buckets[-1]), len(buckets)
+
+    @staticmethod
+    def _row_summary(row):
+        first, last, count = row
+        return (pd.Timestamp(first).value, pd.Timestamp(last).value, count) if first is not None else None
+
+    def _source_buckets(self, interval, symbol, source_interval, start, end):
+        """
+        (first, last, count) of the `interval` buckets holding stored `source_interval` bars in
+        [start, end), None when there are none. Counted by Postgres, elsewhere from the bar times.
+        """
+        if not self._sql_aggregates(self.engine):
+            open_time = self.fetch(symbol, source_interval, start, end, columns=["open_time"])["open_time"]
+            return self._bucket_summary(open_time, interval)
+        with self.engine.connect() as connection:
+            row = connection.execute(*self._buckets_query(interval, symbol, source_interval, start, end)).one()
+        return self._row_summary(row)
+
+    async def _source_buckets_async(self, interval, symbol, source_interval, start, end):
+        if not self._sql_aggregates(self.async_engine):
+            open_time = (await self.fetch_async(symbol, source_interval, start, end, columns=["open_time"]))["open_time"]
+            return self._bucket_summary(open_time, interval)
+        async with self.async_engine.connect() as connection:
+            result = await connection.execute(*self._buckets_query(interval, symbol, source_interval, start, end))
+            row = result.one()
+        return self._row_summary(row)
+
+    @staticmethod
+    def _covers(candles, buckets):
+        """
+        True when rollup `candles` hold one candle per bucket the source bars fall in
+        (`buckets` from _source_buckets). A partially materialized range or a missing candle
+        fails the check; gaps in the source bars themselves don't.
+        """
+        if buckets is None:
+            return True
+        if candles.empty:
+            return False
+        first, last, count = buckets
+        open_time = candles["open_time"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        return open_time[0] == first and open_time[-1] == last and len(open_time) == count
+
+    def _read_store(self, symbol, interval, start, end, columns):
+        df = self.store.read(symbol, interval, start, end, columns=columns)
+        if end is not None and not df.empty:
+            df = df[df["open_time"] < pd.Timestamp(end)].reset_index(drop=True)
+        return normalize_klines(df)
+
+    def _read_sql(self, query, params):
+        with self.engine.connect() as connection:
+            df = pd.read_sql_query(query, con=connection, params=params)
+        return normalize_klines(df)
+
+    async def _read_sql_async(self, query, params):
+        async with self.async_engine.connect() as connection:
+            result = await connection.execute(query, params)
+            columns, rows = list(result.keys()), result.fetchall()
+        return await asyncio.to_thread(
+            lambda: normalize_klines(pd.DataFrame.from_records(rows, columns=columns))
+        )
+
+    def _sql_aggregates(self, engine):
+        return self.store is None and engine.dialect.name == "postgresql"
+
+    def fetch(self, symbol="BTCUSDT", interval="1m", start=None, end=None, columns=None):
+        """Klines of symbol/interval with start <= open_time < end (both bounds optional)."""
+        columns = columns or KLINE_FIELDS
+        if self.store is not None:
+            return self._read_store(symbol, interval, start, end, columns)
+        return self._read_sql(*self._fetch_query(symbol, interval, start, end, columns))
+
+    async def fetch_async(self, symbol="BTCUSDT", interval="1m", start=None, end=None, columns=None):
+        """fetch() without blocking the event loop."""
+        columns = columns or KLINE_FIELDS
+        if self.store is not None:
+            return await asyncio.to_thread(self._read_store, symbol, interval, start, end, columns)
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.fetch, symbol, interval, start, end, columns)
+        return await self._read_sql_async(*self._fetch_query(symbol, interval, start, end, columns))
+
+    def fetch_month(self, month, symbol="BTCUSDT", interval="1m"):
+        start, end = month_range(month)
+        return self.fetch(symbol, interval, start, end)
+
+    def aggregate(self, interval, symbol="BTCUSDT", source_interval="1m", start=None, end=None):
+        """
+        OHLCV candles of `interval` built from stored `source_interval` bars. Materialized
+        rollups are served as they are when they cover the stored bars of the range;
+        otherwise on Postgres the bucketing runs in SQL with date_bin (PostgreSQL 14+), so
+        only the aggregated rows cross the wire, and elsewhere the bars are resampled with
+        numpy.
+        """
+        if interval == source_interval:
+            return self.fetch(symbol, interval, start, end)
+        if source_interval == "1m" and interval in self.rollups:
+            candles = self.fetch(symbol, interval, start, end)
+            if self._covers(candles, self._source_buckets(interval, symbol, source_interval, start, end)):
+                return candles
+            logger.debug(f"{symbol} {interval} rollups don't cover [{start}, {end}), aggregating from {source_interval}")
+        if not self._sql_aggregates(self.engine):
+            return resample_frame(self.fetch(symbol, source_interval, start, end), interval)
+        return self._read_sql(*self._aggregate_query(interval, symbol, source_interval, start, end))
+
+    async def aggregate_async(self, interval, symbol="BTCUSDT", source_interval="1m", start=None, end=None):
+        """aggregate() without blocking the event loop."""
+        if self.async_engine is None:
+            return await asyncio.to_thread(self.aggregate, interval, symbol, source_interval, start, end)
+        if interval == source_interval:
+            return await self.fetch_async(symbol, interval, start, end)
+        if source_interval == "1m" and interval in self.rollups:
+            candles = await self.fetch_async(symbol, interval, start, end)
+            buckets = await self._source_buckets_async(interval, symbol, source_interval, start, end)
+            if self._covers(candles, buckets):
+                return candles
+            logger.debug(f"{symbol} {interval} rollups don't cover [{start}, {end}), aggregating from {source_interval}")
+        if not self._sql_aggregates(self.async_engine):
+            bars = await self.fetch_async(symbol, source_interval, start, end)
+            return await asyncio.to_thread(resample_frame, bars, interval)
+        return await self._read_sql_async(*self._aggregate_query(interval, symbol, source_interval, start, end))
+
+    def aggregate_month(self, month, interval, symbol="BTCUSDT", source_interval="1m"):
+        start, end = month_range(month)
+        return self.aggregate(interval, symbol, source_interval, start, end)
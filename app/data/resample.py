@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from app.data.schemas import KlineIntervals
+
+
+# Coarser intervals kept materialized next to the 1m bars
+ROLLUP_INTERVALS = ("5m", "15m", "1h", "4h", "1d")
+
+# Binance weeks start on Monday 1970-01-05, every shorter candle is aligned on the epoch
+WEEK_ORIGIN_NS = 4 * 86_400_000 * 1_000_000
+
+
+def bucket_starts(open_time_ns, interval):
+    """Open time (ns) of the `interval` candle each bar belongs to."""
+    bucket_ns = KlineIntervals.to_milliseconds(interval) * 1_000_000
+    origin = WEEK_ORIGIN_NS if interval == "1w" else 0
+    return (open_time_ns - origin) // bucket_ns * bucket_ns + origin
+
+
+def resample_arrays(open_time_ns, open_price, high_price, low_price, close_price, volume, close_time_ns, interval):
+    """
+    Aggregates time-sorted bars into `interval` OHLCV candles with reduceat, no Python loop.
+    Returns a dict of arrays keyed like the kline columns (times as int64 ns).
+    """
+    if open_time_ns.size == 0:
+        empty_float = np.empty(0, dtype=np.float64)
+        empty_time = np.empty(0, dtype=np.int64)
+        return {"open_time": empty_time, "close_time": empty_time, "open_price": empty_float, "high_price": empty_float,
+                "low_price": empty_float, "close_price": empty_float, "volume": empty_float}
+
+    buckets = bucket_starts(open_time_ns, interval)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [buckets.size])) - 1
+    return {
+        "open_time": buckets[starts],
+        "close_time": close_time_ns[ends],
+        "open_price": open_price[starts],
+        "high_price": np.maximum.reduceat(high_price, starts),
+        "low_price": np.minimum.reduceat(low_price, starts),
+        "close_price": close_price[ends],
+        "volume": np.add.reduceat(volume, starts),
+    }
+
+
+def resample_frame(df, interval):
+    """Aggregates a time-sorted kline DataFrame into `interval` candles."""
+    if df.empty:
+        return df
+    open_time = df["open_time"].to_numpy().astype("datetime64[ns]").view(np.int64)
+    close_time = df["close_time"].to_numpy().astype("datetime64[ns]").view(np.int64) if "close_time" in df.columns else open_time
+    volume = df["volume"].to_numpy(dtype=np.float64) if "volume" in df.columns else np.zeros(len(df))
+    candles = resample_arrays(
+        open_time,
+        df["open_price"].to_numpy(dtype=np.float64),
+        df["high_price"].to_numpy(dtype=np.float64),
+        df["low_price"].to_numpy(dtype=np.float64),
+        df["close_price"].to_numpy(dtype=np.float64),
+        volume,
+        close_time,
+        interval,
+    )
+    candles["open_time"] = candles["open_time"].view("datetime64[ns]")
+    candles["close_time"] = candles["close_time"].view("datetime64[ns]")
+    return pd.DataFrame(candles)
+
+
+class KlineRollups:
+    """
+    Keeps coarser candles up to date as 1m bars arrive. Each update() only aggregates the
+    new bars and merges them into the candle still in progress for every interval, then
+    hands the touched candles to `writer.write(df, symbol, interval)` (ParquetKlineStore,
+    or KlineBulkLoader with upsert=True), which must replace candles with the same open_time.
+    """
+
+    def __init__(self, symbol, writer=None, intervals=ROLLUP_INTERVALS):
+        self.symbol = symbol
+        self.writer = writer
+        self.intervals = intervals
+        self.in_progress = {interval: None for interval in intervals}  # Last candle of each interval, as a dict
+        self.last_open_time = None
+
+    def update(self, bars, write=True):
+        """
+        Adds new time-sorted 1m bars. Returns {interval: DataFrame of the candles created
+        or changed by these bars}. write=False only updates the state (seeding from history).
+        """
+        if self.last_open_time is not None:
+            bars = bars[bars["open_time"] > self.last_open_time]
+        if bars.empty:
+            return {}
+        self.last_open_time = bars["open_time"].iloc[-1]
+
+        changed = {}
+        for interval in self.intervals:
+            candles = resample_frame(bars, interval)
+            current = self.in_progress[interval]
+            if current is not None and candles["open_time"].iloc[0] == current["open_time"]:
+                # The first new candle continues the one in progress
+                candles.loc[0, "open_price"] = current["open_price"]
+                candles.loc[0, "high_price"] = max(current["high_price"], candles["high_price"].iloc[0])
+                candles.loc[0, "low_price"] = min(current["low_price"], candles["low_price"].iloc[0])
+                candles.loc[0, "volume"] += current["volume"]
+            self.in_progress[interval] = candles.iloc[-1].to_dict()
+            changed[interval] = candles
+
+            if write and self.writer is not None:
+                self.writer.write(candles, self.symbol, interval)
+        return changed
+
+
+def materialize_rollups(repository, writer, symbol="BTCUSDT", start=None, end=None, intervals=ROLLUP_INTERVALS, months=None):
+    """
+    Builds the rollups of stored 1m history month by month (bounded memory) and writes them
+    through `writer`. `months` is a list of 'YYYY-MM' strings, otherwise [start, end) is read at once.
+    """
+    from app.data.repository import month_range
+
+    rollups = KlineRollups(symbol, writer=writer, intervals=intervals)
+    ranges = [month_range(month) for month in months] if months else [(start, end)]
+    for range_start, range_end in ranges:
+        bars = repository.fetch(symbol, "1m", range_start, range_end)
+        rollups.update(bars)
+        logger.info(f"Rolled up {len(bars)} {symbol} 1m bars from {range_start} to {range_end}")
+    return rollups
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+
+class CachedResponse:
+    """A rendered response body with the validators sent to browsers."""
+
+    __slots__ = ("body", "media_type", "etag", "last_modified", "expires_at", "closed")
+
+    def __init__(self, body, media_type, closed, ttl):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.last_modified = int(time.time())
+        self.closed = closed
+        self.expires_at = None if closed else time.monotonic() + ttl
+
+    def headers(self):
+        # Browsers revalidate closed months on every load (a 304 while the ETag holds), since
+        # late writes can still change them; the current month is reused until it expires here
+        cache_control = "no-cache" if self.closed else f"max-age={max(int(self.expires_at - time.monotonic()), 0)}"
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": f"public, {cache_control}",
+        }
+
+    def not_modified(self, request_headers):
+        """True when the browser copy is still valid (If-None-Match first, then If-Modified-Since)."""
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered chart responses keyed by (symbol, interval, month, ...).
+    Closed months never expire (only LRU eviction or invalidate() drops them, so the kline
+    writers call invalidate() through their on_write hook), the current month expires
+    after `ttl` seconds because new bars keep arriving.
+    """
+
+    def __init__(self, max_entries=256, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, closed, media_type="text/html"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        entry = CachedResponse(body, media_type, closed, self.ttl)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, symbol=None, months=None):
+        """Drops the entries of a symbol (all of them when None), optionally only for some months."""
+        months = set(months) if months is not None else None
+        with self.lock:
+            for key in list(self.entries):
+                if (symbol is None or key[0] == symbol) and (months is None or key[2] in months):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, ConfigDict
 import datetime
 class KlineColumns:
@@ -9,6 +10,34 @@ class KlineColumns:
     ]
 
 
+class KlineIntervals:
+    """Binance kline intervals and their length in milliseconds."""
+    MILLISECONDS = {
+        "1s": 1_000,
+        "1m": 60_000,
+        "3m": 3 * 60_000,
+        "5m": 5 * 60_000,
+        "15m": 15 * 60_000,
+        "30m": 30 * 60_000,
+        "1h": 3_600_000,
+        "2h": 2 * 3_600_000,
+        "4h": 4 * 3_600_000,
+        "6h": 6 * 3_600_000,
+        "8h": 8 * 3_600_000,
+        "12h": 12 * 3_600_000,
+        "1d": 86_400_000,
+        "3d": 3 * 86_400_000,
+        "1w": 7 * 86_400_000,
+    }
+
+    @staticmethod
+    def to_milliseconds(interval):
+        try:
+            return KlineIntervals.MILLISECONDS[interval]
+        except KeyError:
+            raise ValueError(f"Unsupported kline interval: {interval}")
+
+
 class KlineSchema(BaseModel):
     open_time: datetime
     close_time: datetime
@@ -19,3 +48,20 @@ class KlineSchema(BaseModel):
     volume: float
 
     model_config = ConfigDict(from_attributes=True, arbitrary_types_allowed=True)
+
+
+class CycleSchema(BaseModel):
+    id: int
+    symbol: Optional[str] = None
+    strategy_id: Optional[str] = None
+    quantity: Optional[float] = None
+    buy_price: float
+    buy_date: datetime.datetime
+    sell_price: Optional[float] = None
+    sell_date: Optional[datetime.datetime] = None
+    fees: float
+    profit: Optional[float] = None
+    exit_reason: Optional[str] = None
+    status: str
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,56 @@
+import struct
+
+import numpy as np
+import pyarrow as pa
+
+
+# Columns sent to the chart: times as epoch milliseconds, then OHLCV
+WIRE_COLUMNS = ["open_time", "open_price", "high_price", "low_price", "close_price", "volume"]
+PRICE_COLUMNS = WIRE_COLUMNS[1:]
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FLOAT32_MEDIA_TYPE = "application/octet-stream"
+
+
+def epoch_ms(values):
+    return np.asarray(values).astype("datetime64[ms]").astype(np.int64)
+
+
+def to_columnar(df):
+    """{column: list} with open_time in epoch ms, the compact JSON form of a kline frame."""
+    columns = {"open_time": epoch_ms(df["open_time"]).tolist()}
+    for name in PRICE_COLUMNS:
+        if name in df.columns:
+            columns[name] = df[name].to_numpy(dtype=np.float64).tolist()
+    return columns
+
+
+def to_arrow_ipc(df):
+    """Kline frame as an Arrow IPC stream (timestamp[ms] times, float64 prices)."""
+    arrays = {"open_time": pa.array(epoch_ms(df["open_time"]), type=pa.timestamp("ms"))}
+    for name in PRICE_COLUMNS:
+        if name in df.columns:
+            arrays[name] = pa.array(df[name].to_numpy(dtype=np.float64))
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_float32_binary(df):
+    """
+    Packed little-endian buffer, every column aligned on its item size so a client can
+    view it without copying (BigInt64Array / Float32Array in the browser):
+
+        offset 0        uint64   row count n
+        offset 8        int64    open_time as epoch ms, n values
+        offset 8 + 8n   float32  open, high, low, close, volume columns, n values each
+                                 (volume zeros when absent)
+    """
+    n = len(df)
+    parts = [struct.pack("<Q", n), epoch_ms(df["open_time"]).astype("<i8").tobytes()]
+    for name in PRICE_COLUMNS:
+        values = df[name].to_numpy(dtype="<f4") if name in df.columns else np.zeros(n, dtype="<f4")
+        parts.append(values.tobytes())
+    return b"".join(parts)
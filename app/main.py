@@ -1,18 +1,38 @@
 import uvicorn
 from app.data.klines import BinanceKlines
 from loguru import logger
-from fastapi import FastAPI, Depends, HTTPException, Request, Query
-from app.data.model import Kline
-from app.data.connection import Database
-from app.data.schemas import KlineSchema
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, WebSocket, WebSocketDisconnect
+from app.data.model import Kline, Cycle
+from app.data.schemas import KlineSchema, KlineIntervals, CycleSchema
 from app.data.connection import get_db
 from sqlalchemy.orm import Session
-from fastapi.responses import HTMLResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 import plotly.graph_objects as go
 import pandas as pd
-from app.data.connection import engine
-from sqlalchemy.sql import text
-from calendar import monthrange
+from app.data.connection import engine, get_async_engine, get_async_session, dispose_async_engine
+from app.data.bulk import KlineBulkLoader
+from app.data.parquet_store import ParquetKlineStore
+from app.data.repository import KlineRepository, month_range
+from app.data.resample import ROLLUP_INTERVALS, materialize_rollups
+from app.data.response_cache import ResponseCache
+from app.data.downsample import downsample_klines
+from app.data.live import LiveKlineService
+from app.data.broadcast import CandleBroadcaster
+from app.strategies.indicators import Strategy
+from app.data.serialize import (
+    ARROW_MEDIA_TYPE,
+    FLOAT32_MEDIA_TYPE,
+    to_arrow_ipc,
+    to_columnar,
+    to_float32_binary,
+)
+import os
+import json
+import hashlib
+import asyncio
+from fastapi.concurrency import run_in_threadpool
 import numpy as np
 
 from fastapi.templating import Jinja2Templates
@@ -24,66 +44,77 @@ templates = Jinja2Templates(directory="templates")
 # Initialize FastAPI app
 app = FastAPI()
 
-# Initialize Database instance
-db_manager = Database()
+# Rendered charts per (symbol, interval, month): closed months stay cached, the current one for a few seconds.
+# Every kline writer below drops the months it writes into.
+chart_cache = ResponseCache(
+    max_entries=int(os.getenv("CHART_CACHE_ENTRIES", "256")),
+    ttl=int(os.getenv("CHART_CACHE_TTL", "30")),
+)
+
+# Bulk loader used to store fetched klines
+bulk_loader = KlineBulkLoader(engine, on_write=chart_cache.invalidate)
+
+# Read the chart data from a local Parquet store instead of Postgres when configured
+KLINES_PARQUET_DIR = os.getenv("KLINES_PARQUET_DIR")
+kline_store = ParquetKlineStore(KLINES_PARQUET_DIR, on_write=chart_cache.invalidate) if KLINES_PARQUET_DIR else None
+kline_repository = KlineRepository(engine, store=kline_store)
+
+# 5m..1d candles are materialized in Postgres next to the 1m bars they are built from
+rollup_loader = KlineBulkLoader(engine, upsert=True, on_write=chart_cache.invalidate)
+
+# Candles inlined in the page for the first paint
+CHART_OVERVIEW_POINTS = 1000
+
+# Range served by /api/klines when the request gives no start (nor month)
+API_DEFAULT_WINDOW = pd.Timedelta(days=7)
+
+# Live candles pushed to the chart: one Binance stream and one fan-out shared by every viewer
+LIVE_SYMBOLS = [symbol for symbol in os.getenv("LIVE_SYMBOLS", "").split(",") if symbol]
+LIVE_INTERVAL = os.getenv("LIVE_INTERVAL", "1m")
+LIVE_FLUSH_INTERVAL = float(os.getenv("LIVE_FLUSH_INTERVAL", "5"))
+broadcaster = CandleBroadcaster(
+    strategy_factory=lambda symbol: Strategy(None, symbol=symbol, interval=LIVE_INTERVAL)
+)
+live_service = None
+live_task = None
 
 
 
 
 # Function to fetch data from the database
-def fetch_data_from_db(start_open_time=None, end_close_time=None, interval='1m'):
-    """
-    Fetch filtered data from the PostgreSQL database and return as a DataFrame.
+async def fetch_data_from_db(start_open_time=None, end_close_time=None, interval='1m', symbol='BTCUSDT'):
     """
-    # Base query
-    base_query = """
-    SELECT open_time, close_time, open_price, high_price, low_price, close_price
-    FROM klines
+    Fetch the candles of `interval` with start_open_time <= open_time < end_close_time.
+    Materialized rollups are served directly, other intervals are aggregated by the repository.
+    The query runs on the async engine and the pandas work in a worker thread.
     """
+    return await kline_repository.aggregate_async(interval, symbol=symbol, start=start_open_time, end=end_close_time)
 
-    filters = []
-    params = {}
-
-    # Add filters only if they are provided
-    if start_open_time:
-        filters.append("open_time >= :start_open_time")
-        params["start_open_time"] = start_open_time
-    if end_close_time:
-        filters.append("close_time <= :end_close_time")
-        params["end_close_time"] = end_close_time
-
-    # Add WHERE clause dynamically
-    if filters:
-        base_query += " WHERE " + " AND ".join(filters)
-    
-    # Add ordering
-    base_query += " ORDER BY open_time ASC"
-
-    # Fetch data
-    with engine.connect() as connection:
-        df = pd.read_sql_query(
-            text(base_query),
-            con=connection,
-            params=params,
-        )
-
-        # Ensure that open_time and close_time are in datetime format for resampling
-    df['open_time'] = pd.to_datetime(df['open_time'])
-    df['close_time'] = pd.to_datetime(df['close_time'])
-
-    # Set the open_time as the index
 
-    # Resample the data based on the provided interval
-    df_resampled = df.resample(interval).agg({
-        'open_time': 'first',    # First open_time in the interval
-        'close_time': 'last',    # Last close_time in the interval
-        'open_price': 'first',   # First open price in the interval
-        'high_price': 'max',     # Highest price in the interval
-        'low_price': 'min',      # Lowest price in the interval
-        'close_price': 'last'    # Last close price in the interval
+def render_chart(request, data, interval, month, symbol, start, end):
+    """
+    Renders candlestick.html to a string (CPU bound, run it in the thread pool). Only a
+    downsampled overview is inlined, the page then loads full resolution from /api/klines.
+    """
+    overview = downsample_klines(data, CHART_OVERVIEW_POINTS)
+    return templates.get_template("candlestick.html").render({
+        "request": request,
+        "data": to_columnar(overview) if not overview.empty else {},
+        "interval": interval,
+        "month": month,
+        "symbol": symbol,
+        "start": int(start.value // 1_000_000),
+        "end": int(end.value // 1_000_000),
+        "total": len(data),
+        "interval_ms": KlineIntervals.MILLISECONDS.get(interval),  # None for calendar intervals (1M)
     })
 
-    return df_resampled
+
+def parse_time(value):
+    """Query time as epoch milliseconds or any date string pandas understands."""
+    if value is None:
+        return None
+    return pd.Timestamp(int(value), unit="ms") if value.isdigit() else pd.Timestamp(value)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -91,88 +122,234 @@ async def display_data(
     request: Request,
     interval: str = Query(None, description="Candlestick interval, e.g., 1m, 5m, 1h"),
     month: str = Query(None, description="Selected month in YYYY-MM format"),
+    symbol: str = Query("BTCUSDT", description="Trading pair, e.g., BTCUSDT"),
 ):
-    data = pd.DataFrame()  # Initialize with an empty DataFrame
     interval = interval or "1d"  # Default interval is 1 day
     month = month or ""  # Default month is empty for the first load
 
-    if interval and month:
-        try:
-            # Parse the month input
-            year, month_num = map(int, month.split("-"))
-            _, last_day = monthrange(year, month_num)
-            start_open_time_dt = pd.Timestamp(f"{year}-{month_num:02d}-01")
-            end_close_time_dt = pd.Timestamp(f"{year}-{month_num:02d}-{last_day} 23:59:59")
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.")
+    if not month:
+        return templates.TemplateResponse(
+            request,
+            "candlestick.html",
+            {"data": {}, "interval": interval, "month": month, "symbol": symbol},
+        )
 
+    try:
+        # Parse the month input
+        start_open_time_dt, end_close_time_dt = month_range(month)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.")
+
+    cache_key = (symbol, interval, month)
+    entry = chart_cache.get(cache_key)
+    if entry is None:
         try:
             # Fetch raw data based on filters
-            data = fetch_data_from_db(
+            data = await fetch_data_from_db(
                 start_open_time=start_open_time_dt,
                 end_close_time=end_close_time_dt,
-                interval=interval
+                interval=interval,
+                symbol=symbol,
             )
         except Exception as e:
             logger.error(f"Error fetching data: {e}")
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-    return templates.TemplateResponse(
-        "candlestick.html",
-        {
-            "request": request,
-            "data": data.to_dict(orient="records") if not data.empty else [],
-            "interval": interval,
-            "month": month,
-        }
-    )
+        body = await run_in_threadpool(
+            render_chart, request, data, interval, month, symbol, start_open_time_dt, end_close_time_dt
+        )
+        # A month that has ended gets no new bars once the live writer has flushed its last ones;
+        # an empty one may still be backfilled, so it only gets the short ttl
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        closed = not data.empty and end_close_time_dt + pd.Timedelta(seconds=LIVE_FLUSH_INTERVAL) <= now
+        entry = chart_cache.put(cache_key, body, closed=closed)
 
+    headers = entry.headers()
+    if entry.not_modified(request.headers):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(entry.body, headers=headers)
 
 
-# Launch browser on startup
-@app.on_event("startup")
-async def launch_browser():
-    webbrowser.open("http://127.0.0.1:8000")
+@app.get("/api/klines")
+async def get_klines_api(
+    request: Request,
+    symbol: str = Query("BTCUSDT", description="Trading pair, e.g., BTCUSDT"),
+    interval: str = Query("1m", description="Candlestick interval, e.g., 1m, 5m, 1h"),
+    start: str = Query(None, description="Range start (inclusive), epoch ms or ISO date, defaults to a week before end"),
+    end: str = Query(None, description="Range end (exclusive), epoch ms or ISO date, defaults to now"),
+    month: str = Query(None, description="Whole month in YYYY-MM format, instead of start/end"),
+    max_points: int = Query(None, ge=3, description="Downsample to at most this many candles"),
+    method: str = Query("minmax", pattern="^(minmax|lttb)$", description="Downsampling method"),
+    format: str = Query(None, pattern="^(json|arrow|f32)$", description="json, arrow or f32, else from Accept"),
+):
+    """
+    Candles as columns: compact JSON arrays (open_time in epoch ms), an Arrow IPC stream,
+    or the packed float32 layout of app.data.serialize.to_float32_binary.
+    """
+    try:
+        KlineIntervals.to_milliseconds(interval)
+        if month:
+            start_time, end_time = month_range(month)
+        else:
+            start_time, end_time = parse_time(start), parse_time(end)
+            if start_time is None:
+                # Never read the whole history by accident, serve the last week up to `end`
+                end_time = end_time or pd.Timestamp.now(tz="UTC").tz_localize(None)
+                start_time = end_time - API_DEFAULT_WINDOW
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        data = await fetch_data_from_db(start_time, end_time, interval=interval, symbol=symbol)
+    except Exception as e:
+        logger.error(f"Error fetching data: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    if format is None:
+        accept = request.headers.get("accept", "")
+        format = "arrow" if ARROW_MEDIA_TYPE in accept else "f32" if FLOAT32_MEDIA_TYPE in accept else "json"
+
+    def encode():
+        candles = downsample_klines(data, max_points, method)
+        if format == "arrow":
+            return to_arrow_ipc(candles), ARROW_MEDIA_TYPE
+        if format == "f32":
+            return to_float32_binary(candles), FLOAT32_MEDIA_TYPE
+        return json.dumps(to_columnar(candles), separators=(",", ":")).encode(), "application/json"
+
+    body, media_type = await run_in_threadpool(encode)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type=media_type, headers={"ETag": etag})
+
 
-# Run the application
-if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
 
- 
-"""
 @app.post("/klines/fetch")
 async def fetch_and_store_klines(
     symbol: str,
     interval: str,
     start_time: int,
     end_time: int,
-    db: Session = Depends(get_db),
 ):
 
     try:
         # Fetch and process data
         binance_klines = BinanceKlines(symbol, interval, start_time, end_time)
-        dataframe = await binance_klines.fetch_and_wrangle_klines()
-
-        # Save data to the database
-        for _, row in dataframe.iterrows():
-            db_manager.create(
-                db,
-                Kline,
-                open_time=row["open_time"],
-                close_time=row["close_time"],
-                open_price=row["open_price"],
-                high_price=row["high_price"],
-                low_price=row["low_price"],
-                close_price=row["close_price"],
-                volume=row["volume"],
-            )
-        return {"message": f"Klines for {symbol} saved successfully!"}
+        dataframe = await binance_klines.fetch_and_wrangle_klines(save_to_csv=False)
+
+        # Save data to the database with COPY batches instead of one INSERT per row
+        rows = await run_in_threadpool(bulk_loader.load_dataframe, dataframe, symbol=symbol, interval=interval)
+
+        if interval == "1m" and rows:
+            # Rebuild the rollups of every day touched, from the stored bars so candles stay complete
+            start = pd.Timestamp(start_time, unit="ms").floor("1D")
+            end = pd.Timestamp(end_time, unit="ms").ceil("1D")
+            await run_in_threadpool(materialize_rollups, KlineRepository(engine), rollup_loader, symbol, start, end)
+        return {"message": f"{rows} klines for {symbol} saved successfully!"}
 
     except Exception as e:
         logger.error(f"Error fetching or saving klines: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch or save klines.")
 
+
+@app.websocket("/ws/klines")
+async def stream_klines(websocket: WebSocket, symbol: str = "BTCUSDT"):
+    """Pushes every live candle update of `symbol` (with indicators and signal) as JSON text."""
+    await websocket.accept()
+    queue = broadcaster.connect(symbol)
+    try:
+        while True:
+            await websocket.send_text(await queue.get())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        broadcaster.disconnect(symbol, queue)
+
+
+@app.get("/sse/klines")
+async def stream_klines_sse(symbol: str = Query("BTCUSDT", description="Trading pair, e.g., BTCUSDT")):
+    """Same updates as /ws/klines as Server-Sent Events."""
+    queue = broadcaster.connect(symbol)
+
+    async def events():
+        try:
+            while True:
+                yield f"data: {await queue.get()}\n\n"
+        finally:
+            broadcaster.disconnect(symbol, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/cycles", response_model=list[CycleSchema])
+async def get_cycles(
+    symbol: str = Query(None, description="Trading pair, e.g., BTCUSDT"),
+    strategy_id: str = Query(None, description="Only cycles of this strategy"),
+    status: str = Query(None, pattern="^(in_progress|completed)$", description="in_progress or completed"),
+    limit: int = Query(100, ge=1, le=5000, description="Number of cycles, latest first"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Trade journal, latest cycles first (indexed on status and buy_date)."""
+    query = select(Cycle).order_by(Cycle.buy_date.desc()).limit(limit)
+    if symbol is not None:
+        query = query.where(Cycle.symbol == symbol)
+    if strategy_id is not None:
+        query = query.where(Cycle.strategy_id == strategy_id)
+    if status is not None:
+        query = query.where(Cycle.status == status)
+    result = await session.execute(query)
+    return result.scalars().all()
+
+
+# Chart reads go through the async engine once the event loop is running, unless the Parquet
+# store serves them (/api/cycles then creates the engine on its first request)
+@app.on_event("startup")
+async def open_async_engine():
+    if kline_store is None:
+        kline_repository.async_engine = get_async_engine()
+
+
+@app.on_event("startup")
+async def start_live_klines():
+    global live_service, live_task
+    if not LIVE_SYMBOLS:
+        return
+    live_service = LiveKlineService(
+        LIVE_SYMBOLS,
+        interval=LIVE_INTERVAL,
+        capacity=1440,  # A full day of 1m bars, so the live 1d rollup starts complete
+        writer=rollup_loader,
+        flush_interval=LIVE_FLUSH_INTERVAL,
+        rollup_intervals=ROLLUP_INTERVALS if LIVE_INTERVAL == "1m" else (),
+    )
+    live_service.subscribe(broadcaster.on_bar)
+    live_task = asyncio.create_task(live_service.run())
+
+
+@app.on_event("shutdown")
+async def stop_live_klines():
+    if live_service is not None:
+        await live_service.stop()
+        await live_task
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+
+# Launch browser on startup
+@app.on_event("startup")
+async def launch_browser():
+    webbrowser.open("http://127.0.0.1:8000")
+
+# Run the application
+if __name__ == "__main__":
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+
+
+"""
 @app.get("/klines", response_model=list[KlineSchema])
 def get_all_klines( 
     db: Session = Depends(get_db),
@@ -1,49 +1,489 @@
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
-
-# Replace with your actual API key and secret
-api_key = 'F3ckZIGICJNVuIpB6Op4dWcOBpPnIVzAAHUYq4tasGTH6Qqvjted2oBW7vUGeUqL'
-api_secret = 'q9kmxILK42ixinbKmQp6aU5bDGzJK27BLmbqNrZzdDAIFNEXi9GsAjvwU2OSYw1V'
-
-# Initialize the Binance client with both API key and secret
-client = Client(api_key, api_secret)
-
-# Example: Get account information (balance) from your futures account
-# Get funding wallet balance
-
-# Function to buy BTC using USDT amount
-def buy_bitcoin_with_usdt(usdt_amount):
-    try:
-        # Get the current balance of USDT in the spot account
-        balance = client.get_asset_balance(asset='USDT')
-        usdt_balance = float(balance['free'])
-        
-        # Check if the user has enough USDT balance
-        if usdt_balance >= usdt_amount:
-            # Get the current market price of Bitcoin in USDT
-            btc_price = client.get_symbol_ticker(symbol="BTCUSDT")
-            market_price = float(btc_price['price'])
-            
-            # Calculate how much BTC can be bought with the given USDT amount
-            btc_amount = usdt_amount / market_price
-            
-            # Place a market buy order
-            order = client.order_market_buy(
-                symbol="BTCUSDT",  # Symbol to trade (BTC/USDT)
-                quantity=round(btc_amount, 6)  # Quantity of BTC to buy, rounded to 6 decimals
-            )
-            
-            print(f"Market buy order placed for {round(btc_amount, 6)} BTC using {usdt_amount} USDT at a price of {market_price} USDT/BTC")
-            return order
+import numpy as np
+from loguru import logger
+
+from app.strategies.metrics import equity_curve, performance_metrics
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path below is used instead
+    njit = None
+
+
+# Exit reasons stored in BacktestResult.exit_reason
+EXIT_STOP_LOSS = 0
+EXIT_TARGET_PROFIT = 1
+
+# How a bar that reaches both the stop-loss and the target is settled without finer data
+TIE_BREAKS = ("pessimistic", "optimistic")
+
+
+def _simulate_loop(close, atr, signal, target_profit, stoploss, fees, atr_multiplier, initial_balance):
+    """
+    Single pass over the bars, mirroring RiskManagement.should_exit():
+    the stop-loss is checked before the target, the target exit is booked at the
+    adjusted target price and the stop-loss exit at the close price.
+    """
+    n = close.shape[0]
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    exit_price = np.empty(n, dtype=np.float64)
+    balance_before = np.empty(n, dtype=np.float64)
+    profit = np.empty(n, dtype=np.float64)
+    exit_reason = np.empty(n, dtype=np.int8)
+
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+
+    balance = initial_balance
+    in_position = False
+    buy_price = 0.0
+    entry = -1
+    count = 0
+    for i in range(1, n):
+        if in_position:
+            price = close[i]
+            stop_price = buy_price * stop_factor - atr[i] * atr_multiplier
+            target_price = buy_price * target_factor + atr[i] * atr_multiplier
+            reason = -1
+            pnl = 0.0
+            if price <= stop_price:
+                pnl = (price - buy_price) * (balance / buy_price)
+                reason = EXIT_STOP_LOSS
+            elif price >= target_price:
+                pnl = (target_price - buy_price) * (balance / buy_price)
+                reason = EXIT_TARGET_PROFIT
+            if reason >= 0:
+                entry_idx[count] = entry
+                exit_idx[count] = i
+                exit_price[count] = price
+                balance_before[count] = balance
+                profit[count] = pnl
+                exit_reason[count] = reason
+                count += 1
+                balance += pnl
+                in_position = False
+
+        if not in_position and signal[i]:
+            buy_price = close[i]
+            entry = i
+            in_position = True
+
+    open_entry = entry if in_position else -1
+    return (entry_idx[:count], exit_idx[:count], exit_price[:count], balance_before[:count],
+            profit[:count], exit_reason[:count], balance, open_entry)
+
+
+_simulate_jit = njit(cache=True, nogil=True)(_simulate_loop) if njit is not None else None
+
+
+def _first_exit(close, atr, start, buy_price, stop_factor, target_factor, atr_multiplier):
+    """
+    Finds the first bar at or after `start` where the stop-loss or the target is hit.
+    Scans in growing windows so a short trade never touches the rest of the array.
+    """
+    n = close.shape[0]
+    window = 256
+    while start < n:
+        stop = min(start + window, n)
+        price = close[start:stop]
+        band = atr[start:stop] * atr_multiplier
+        stop_hit = price <= buy_price * stop_factor - band
+        target_hit = price >= buy_price * target_factor + band
+        hits = np.flatnonzero(stop_hit | target_hit)
+        if hits.size:
+            j = hits[0]
+            if stop_hit[j]:
+                return start + j, EXIT_STOP_LOSS, price[j]
+            return start + j, EXIT_TARGET_PROFIT, buy_price * target_factor + band[j]
+        start = stop
+        window *= 4
+    return -1, -1, np.nan
+
+
+def _simulate_numpy(close, atr, signal, target_profit, stoploss, fees, atr_multiplier, initial_balance):
+    """
+    Same semantics as _simulate_loop, but jumps from entry to exit with vectorized
+    first-touch scans and from exit to the next entry with searchsorted.
+    """
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+    entries = np.flatnonzero(signal)
+
+    trades = []
+    balance = initial_balance
+    open_entry = -1
+    start = 1
+    while True:
+        k = np.searchsorted(entries, start)
+        if k == entries.size:
+            break
+        entry = int(entries[k])
+        buy_price = close[entry]
+        exit_at, reason, booked_price = _first_exit(
+            close, atr, entry + 1, buy_price, stop_factor, target_factor, atr_multiplier
+        )
+        if exit_at < 0:
+            open_entry = entry
+            break
+        pnl = (booked_price - buy_price) * (balance / buy_price)
+        trades.append((entry, exit_at, close[exit_at], balance, pnl, reason))
+        balance += pnl
+        # A new position may be opened on the same bar the previous one was closed
+        start = exit_at
+
+    if trades:
+        columns = list(zip(*trades))
+    else:
+        columns = [()] * 6
+    return (np.asarray(columns[0], dtype=np.int64), np.asarray(columns[1], dtype=np.int64),
+            np.asarray(columns[2], dtype=np.float64), np.asarray(columns[3], dtype=np.float64),
+            np.asarray(columns[4], dtype=np.float64), np.asarray(columns[5], dtype=np.int8),
+            balance, open_entry)
+
+
+def _touch_order(stop_hit, target_hit, bar, open_price, stop_price, target_price, sub_start, sub_end, sub_high,
+                 sub_low, pessimistic):
+    """
+    True when the stop-loss is the level reached first on a bar that touched both:
+    a gap at the open decides, then the 1m sub-bars when given, then the tie-break.
+    """
+    if not (stop_hit and target_hit):
+        return stop_hit
+    if open_price.shape[0]:
+        if open_price[bar] <= stop_price:
+            return True
+        if open_price[bar] >= target_price:
+            return False
+    if sub_start.shape[0]:
+        for k in range(sub_start[bar], sub_end[bar]):
+            sub_stop = sub_low[k] <= stop_price
+            sub_target = sub_high[k] >= target_price
+            if sub_stop and sub_target:
+                return pessimistic
+            if sub_stop or sub_target:
+                return sub_stop
+    return pessimistic
+
+
+def _fill_price(bar, is_stop, open_price, stop_price, target_price):
+    """Stop and target orders fill at their level, or at the open when it gapped through."""
+    if is_stop:
+        return min(stop_price, open_price[bar]) if open_price.shape[0] else stop_price
+    return max(target_price, open_price[bar]) if open_price.shape[0] else target_price
+
+
+def _simulate_intrabar_loop(close, high, low, open_price, atr, signal, target_profit, stoploss, fees, atr_multiplier,
+                            initial_balance, pessimistic, sub_start, sub_end, sub_high, sub_low):
+    """
+    _simulate_loop with exits checked against each bar's low (stop-loss) and high
+    (target), filled at the level itself. The levels resting during bar i use atr[i - 1],
+    the last value known when it opens (atr[i] already includes bar i's range). Empty
+    open_price / sub_* arrays disable the gap and 1m sub-bar refinements.
+    """
+    n = close.shape[0]
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    exit_price = np.empty(n, dtype=np.float64)
+    balance_before = np.empty(n, dtype=np.float64)
+    profit = np.empty(n, dtype=np.float64)
+    exit_reason = np.empty(n, dtype=np.int8)
+
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+
+    balance = initial_balance
+    in_position = False
+    buy_price = 0.0
+    entry = -1
+    count = 0
+    for i in range(1, n):
+        if in_position:
+            stop_price = buy_price * stop_factor - atr[i - 1] * atr_multiplier
+            target_price = buy_price * target_factor + atr[i - 1] * atr_multiplier
+            stop_hit = low[i] <= stop_price
+            target_hit = high[i] >= target_price
+            if stop_hit or target_hit:
+                is_stop = _touch_order(stop_hit, target_hit, i, open_price, stop_price, target_price,
+                                       sub_start, sub_end, sub_high, sub_low, pessimistic)
+                price = _fill_price(i, is_stop, open_price, stop_price, target_price)
+                pnl = (price - buy_price) * (balance / buy_price)
+                entry_idx[count] = entry
+                exit_idx[count] = i
+                exit_price[count] = price
+                balance_before[count] = balance
+                profit[count] = pnl
+                exit_reason[count] = EXIT_STOP_LOSS if is_stop else EXIT_TARGET_PROFIT
+                count += 1
+                balance += pnl
+                in_position = False
+
+        if not in_position and signal[i]:
+            buy_price = close[i]
+            entry = i
+            in_position = True
+
+    open_entry = entry if in_position else -1
+    return (entry_idx[:count], exit_idx[:count], exit_price[:count], balance_before[:count],
+            profit[:count], exit_reason[:count], balance, open_entry)
+
+
+if njit is not None:
+    _touch_order = njit(cache=True, nogil=True)(_touch_order)
+    _fill_price = njit(cache=True, nogil=True)(_fill_price)
+    _simulate_intrabar_jit = njit(cache=True, nogil=True)(_simulate_intrabar_loop)
+else:
+    _simulate_intrabar_jit = None
+
+
+def _first_exit_intrabar(high, low, atr, start, buy_price, stop_factor, target_factor, atr_multiplier):
+    """
+    _first_exit on the bar ranges: first bar at or after `start` (>= 1) whose low/high reach
+    a level, the levels of bar i using atr[i - 1].
+    """
+    n = high.shape[0]
+    window = 256
+    while start < n:
+        stop = min(start + window, n)
+        band = atr[start - 1:stop - 1] * atr_multiplier
+        stop_hit = low[start:stop] <= buy_price * stop_factor - band
+        target_hit = high[start:stop] >= buy_price * target_factor + band
+        hits = np.flatnonzero(stop_hit | target_hit)
+        if hits.size:
+            j = hits[0]
+            return start + j, bool(stop_hit[j]), bool(target_hit[j])
+        start = stop
+        window *= 4
+    return -1, False, False
+
+
+def _simulate_intrabar_numpy(close, high, low, open_price, atr, signal, target_profit, stoploss, fees, atr_multiplier,
+                             initial_balance, pessimistic, sub_start, sub_end, sub_high, sub_low):
+    """Same results as _simulate_intrabar_loop with the first-touch scans of _simulate_numpy."""
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+    entries = np.flatnonzero(signal)
+
+    trades = []
+    balance = initial_balance
+    open_entry = -1
+    start = 1
+    while True:
+        k = np.searchsorted(entries, start)
+        if k == entries.size:
+            break
+        entry = int(entries[k])
+        buy_price = close[entry]
+        exit_at, stop_hit, target_hit = _first_exit_intrabar(
+            high, low, atr, entry + 1, buy_price, stop_factor, target_factor, atr_multiplier
+        )
+        if exit_at < 0:
+            open_entry = entry
+            break
+        stop_price = buy_price * stop_factor - atr[exit_at - 1] * atr_multiplier
+        target_price = buy_price * target_factor + atr[exit_at - 1] * atr_multiplier
+        is_stop = _touch_order(stop_hit, target_hit, exit_at, open_price, stop_price, target_price,
+                               sub_start, sub_end, sub_high, sub_low, pessimistic)
+        price = _fill_price(exit_at, is_stop, open_price, stop_price, target_price)
+        pnl = (price - buy_price) * (balance / buy_price)
+        trades.append((entry, exit_at, price, balance, pnl, EXIT_STOP_LOSS if is_stop else EXIT_TARGET_PROFIT))
+        balance += pnl
+        start = exit_at
+
+    if trades:
+        columns = list(zip(*trades))
+    else:
+        columns = [()] * 6
+    return (np.asarray(columns[0], dtype=np.int64), np.asarray(columns[1], dtype=np.int64),
+            np.asarray(columns[2], dtype=np.float64), np.asarray(columns[3], dtype=np.float64),
+            np.asarray(columns[4], dtype=np.float64), np.asarray(columns[5], dtype=np.int8),
+            balance, open_entry)
+
+
+def sub_bar_ranges(open_time, close_time, sub_open_time):
+    """
+    For every bar, the [start, end) range of the finer bars (e.g. 1m) whose open_time
+    falls inside it, found with searchsorted on the sorted sub-bar times.
+    """
+    sub_open_time = np.asarray(sub_open_time, dtype="datetime64[ns]")
+    start = np.searchsorted(sub_open_time, np.asarray(open_time, dtype="datetime64[ns]"), side="left")
+    end = np.searchsorted(sub_open_time, np.asarray(close_time, dtype="datetime64[ns]"), side="right")
+    return start.astype(np.int64), end.astype(np.int64)
+
+
+class BacktestResult:
+    """Trade arrays produced by VectorizedBacktester, indexed by trade number."""
+
+    def __init__(self, entry_idx, exit_idx, entry_price, exit_price, balance_before, profit,
+                 exit_reason, initial_balance, final_balance, open_entry, open_time=None, close_time=None, close=None):
+        self.entry_idx = entry_idx
+        self.exit_idx = exit_idx
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.balance_before = balance_before
+        self.profit = profit
+        self.exit_reason = exit_reason
+        self.initial_balance = initial_balance
+        self.final_balance = final_balance
+        self.open_entry = open_entry  # Bar index of a position still open at the end, or -1
+        self.open_time = open_time
+        self.close_time = close_time
+        self.close = close  # Close prices of the run, for the equity curve
+        self._equity = None
+
+    @property
+    def in_position(self):
+        return self.open_entry >= 0
+
+    def __len__(self):
+        return self.entry_idx.shape[0]
+
+    @property
+    def equity(self):
+        """Account value marked to market on every bar (computed on first access)."""
+        if self._equity is None:
+            if self.close is None:
+                raise ValueError("The equity curve needs the close prices of the run.")
+            self._equity = equity_curve(self.close, self.entry_idx, self.exit_idx, self.balance_before, self.profit,
+                                        self.initial_balance, self.open_entry, self.final_balance)
+        return self._equity
+
+    @property
+    def bars_in_market(self):
+        """Bars spent holding a position, from each entry bar up to its exit bar."""
+        bars = int((self.exit_idx - self.entry_idx).sum())
+        if self.in_position and self.close is not None:
+            bars += self.close.shape[0] - self.open_entry
+        return bars
+
+    def metrics(self, interval="1m"):
+        """app.strategies.metrics.performance_metrics of this run."""
+        return performance_metrics(self.equity, interval, self.profit, self.balance_before, self.bars_in_market)
+
+    def to_trade_cycles(self):
+        """Returns the trades in the same dict layout as TradingSystem.trade_cycles."""
+        buy_dates = self.open_time[self.entry_idx] if self.open_time is not None else self.entry_idx
+        sell_dates = self.close_time[self.exit_idx] if self.close_time is not None else self.exit_idx
+        return [
+            {
+                'Buy Date': buy_dates[k],
+                'Buy Price': float(self.entry_price[k]),
+                'Buy Dollar': float(self.balance_before[k]),
+                'Sell Date': sell_dates[k],
+                'Sell Price': float(self.exit_price[k]),
+                'Sell dollar': float(self.balance_before[k] + self.profit[k]),
+                'Profit/Loss': float(self.profit[k]),
+            }
+            for k in range(len(self))
+        ]
+
+
+class VectorizedBacktester:
+    """
+    Array-based replacement for the bar-by-bar loop in TradingSystem.run_trading_cycle.
+    Entries come from the strategy's Signal column, exits follow RiskManagement
+    (ATR-adjusted stop-loss and target profit, fees on the target).
+    By default exits are checked on the close like RiskManagement.should_exit(). With
+    `intrabar`, the stop-loss is checked against each bar's low and the target against
+    its high, with the ATR of the previous bar, filled at the level. When one bar reaches
+    both, the open, then the 1m sub-bars (if given), then `tie_break` ("pessimistic":
+    stop first) decide.
+    """
+
+    def __init__(self, target_profit=5, stoploss=30, fees=0.1, initial_investment=100, atr_multiplier=0.5, use_jit=True,
+                 intrabar=False, tie_break="pessimistic"):
+        if tie_break not in TIE_BREAKS:
+            raise ValueError(f"tie_break must be one of {TIE_BREAKS}.")
+        self.target_profit = target_profit
+        self.stoploss = stoploss
+        self.fees = fees
+        self.initial_investment = initial_investment
+        self.atr_multiplier = atr_multiplier  # Same 0.5 x ATR adjustment as RiskManagement
+        self.use_jit = use_jit and _simulate_jit is not None
+        self.intrabar = intrabar
+        self.tie_break = tie_break
+
+    def run_arrays(self, close, atr, signal, open_time=None, close_time=None, high=None, low=None, open_price=None,
+                   sub_bars=None):
+        """
+        Runs the backtest on plain arrays of equal length. Intrabar runs need `high` and
+        `low`, optionally `open_price` (gaps through a level) and `sub_bars`, a
+        (sub_start, sub_end, sub_high, sub_low) tuple from sub_bar_ranges() and the 1m bars.
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        atr = np.ascontiguousarray(atr, dtype=np.float64)
+        signal = np.ascontiguousarray(signal, dtype=np.bool_)
+        if not (close.shape == atr.shape == signal.shape):
+            raise ValueError("close, atr and signal must have the same length.")
+
+        risk = (float(self.target_profit), float(self.stoploss), float(self.fees),
+                float(self.atr_multiplier), float(self.initial_investment))
+        if self.intrabar:
+            if high is None or low is None:
+                raise ValueError("Intrabar exits need the high and low prices.")
+            high = np.ascontiguousarray(high, dtype=np.float64)
+            low = np.ascontiguousarray(low, dtype=np.float64)
+            open_price = np.ascontiguousarray(open_price if open_price is not None else (), dtype=np.float64)
+            if sub_bars is None:
+                sub_bars = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+            sub_start, sub_end = (np.ascontiguousarray(bounds, dtype=np.int64) for bounds in sub_bars[:2])
+            sub_high, sub_low = (np.ascontiguousarray(prices, dtype=np.float64) for prices in sub_bars[2:])
+            if not (high.shape == low.shape == close.shape) or open_price.shape[0] not in (0, close.shape[0]):
+                raise ValueError("high, low and open_price must have the same length as close.")
+
+            simulate = _simulate_intrabar_jit if self.use_jit else _simulate_intrabar_numpy
+            simulated = simulate(close, high, low, open_price, atr, signal, *risk, self.tie_break == "pessimistic",
+                                 sub_start, sub_end, sub_high, sub_low)
         else:
-            print(f"Not enough USDT balance. You only have {usdt_balance} USDT, but you need {usdt_amount} USDT.")
-            return None
+            simulate = _simulate_jit if self.use_jit else _simulate_numpy
+            simulated = simulate(close, atr, signal, *risk)
+        entry_idx, exit_idx, exit_price, balance_before, profit, exit_reason, final_balance, open_entry = simulated
+        return BacktestResult(
+            entry_idx=entry_idx,
+            exit_idx=exit_idx,
+            entry_price=close[entry_idx],
+            exit_price=exit_price,
+            balance_before=balance_before,
+            profit=profit,
+            exit_reason=exit_reason,
+            initial_balance=float(self.initial_investment),
+            final_balance=float(final_balance),
+            open_entry=int(open_entry),
+            open_time=open_time,
+            close_time=close_time,
+            close=close,
+        )
+
+    def run(self, data, sub_data=None):
+        """
+        Runs the backtest on a DataFrame prepared by Strategy
+        (logic_strategy, preprocessing and get_decision). For intrabar runs on a coarse
+        interval, `sub_data` holds the 1m klines of the same period.
+        """
+        if 'Signal' in data.columns:
+            signal = (data['Signal'] == 1).to_numpy()
+        else:
+            signal = np.zeros(len(data), dtype=np.bool_)
+
+        intrabar = {}
+        if self.intrabar:
+            intrabar = {
+                "high": data['high_price'].to_numpy(),
+                "low": data['low_price'].to_numpy(),
+                "open_price": data['open_price'].to_numpy() if 'open_price' in data.columns else None,
+            }
+            if sub_data is not None:
+                sub_start, sub_end = sub_bar_ranges(data['open_time'], data['close_time'], sub_data['open_time'])
+                intrabar["sub_bars"] = (sub_start, sub_end, sub_data['high_price'].to_numpy(),
+                                        sub_data['low_price'].to_numpy())
 
-    except BinanceAPIException as e:
-        print(f"Binance API Exception: {e}")
-    except Exception as e:
-        print(f"Other Exception: {e}")
+        result = self.run_arrays(
+            data['close_price'].to_numpy(),
+            data['ATR'].to_numpy(),
+            signal,
+            open_time=data['open_time'].array if 'open_time' in data.columns else None,
+            close_time=data['close_time'].array if 'close_time' in data.columns else None,
+            **intrabar,
+        )
+        logger.info(f"Backtest finished: {len(result)} trades, final balance {result.final_balance:.2f}")
+        return result
 
-# Example usage
-usdt_amount_to_invest = 1000  # Specify the amount of USDT you want to invest in Bitcoin
-buy_bitcoin_with_usdt(usdt_amount_to_invest)
\ No newline at end of file
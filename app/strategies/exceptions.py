@@ -27,3 +27,20 @@ class SymbolChecking(Exception):
         
         if symbol not in VALID_SYMBOLS:
             raise SymbolChecking(symbol)
+
+
+class InsufficientBalanceError(StrategyError):
+    """Exception raised when the cached balance can't cover an order."""
+    def __init__(self, asset, required, available):
+        self.asset = asset
+        self.required = required
+        self.available = available
+        super().__init__(f"Insufficient {asset} balance: {required} required, {available} available.")
+
+
+class OrderRejectedError(StrategyError):
+    """Exception raised when the exchange (or its filters) rejects an order."""
+    def __init__(self, symbol, reason):
+        self.symbol = symbol
+        self.reason = reason
+        super().__init__(f"Order on {symbol} rejected: {reason}")
@@ -0,0 +1,214 @@
+import asyncio
+import math
+import os
+import time
+
+from loguru import logger
+
+from app.strategies.exceptions import InsufficientBalanceError, OrderRejectedError
+
+
+def round_step(quantity, step):
+    """Rounds a quantity down to the exchange step size (LOT_SIZE stepSize, PRICE_FILTER tickSize)."""
+    if not step:
+        return quantity
+    return math.floor(quantity / step + 1e-9) * step
+
+
+class Fill:
+    """Result of an executed order."""
+
+    __slots__ = ("order_id", "symbol", "side", "quantity", "price", "quote_quantity", "fee", "fee_asset", "time")
+
+    def __init__(self, order_id, symbol, side, quantity, price, quote_quantity, fee=0.0, fee_asset=None, time=None):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side  # "BUY" or "SELL"
+        self.quantity = quantity  # Base asset executed
+        self.price = price  # Average execution price
+        self.quote_quantity = quote_quantity  # Quote asset spent or received, before fees
+        self.fee = fee
+        self.fee_asset = fee_asset
+        self.time = time
+
+    def __repr__(self):
+        return f"Fill({self.side} {self.quantity} {self.symbol} @ {self.price}, fee {self.fee} {self.fee_asset})"
+
+
+class ExchangeAdapter:
+    """
+    What the live engine needs from an exchange. Balances and prices are cached locally:
+    adapters keep `balances` current from the account stream or their own fills, and
+    `prices` from the bars the engine feeds in, so placing an order never waits on a
+    balance or ticker request.
+    """
+
+    def __init__(self, quote_asset="USDT"):
+        self.quote_asset = quote_asset
+        self.balances = {}  # asset -> free amount
+        self.prices = {}  # symbol -> last price
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def free(self, asset):
+        return self.balances.get(asset, 0.0)
+
+    def update_price(self, symbol, price):
+        self.prices[symbol] = price
+
+    def base_asset(self, symbol):
+        return symbol[:-len(self.quote_asset)] if symbol.endswith(self.quote_asset) else symbol
+
+    async def market_buy(self, symbol, quote_amount):
+        """Buys `symbol` for `quote_amount` of the quote asset, returns a Fill."""
+        raise NotImplementedError
+
+    async def market_sell(self, symbol, quantity):
+        """Sells `quantity` of the base asset, returns a Fill."""
+        raise NotImplementedError
+
+
+class FakeExchange(ExchangeAdapter):
+    """
+    In-process exchange for end-to-end tests: market orders fill instantly at the last
+    price given to update_price(), with a percentage fee taken from what is received.
+    """
+
+    def __init__(self, balances=None, fee_rate=0.1, quote_asset="USDT", latency=0.0):
+        super().__init__(quote_asset)
+        self.balances = dict(balances or {quote_asset: 1000.0})
+        self.fee_rate = fee_rate / 100
+        self.latency = latency  # Simulated round trip in seconds
+        self.orders = []
+        self._next_id = 1
+
+    def _fill(self, symbol, side, quantity, price):
+        quote_quantity = quantity * price
+        if side == "BUY":
+            fee, fee_asset = quantity * self.fee_rate, self.base_asset(symbol)
+            self.balances[self.quote_asset] = self.free(self.quote_asset) - quote_quantity
+            self.balances[fee_asset] = self.free(fee_asset) + quantity - fee
+        else:
+            fee, fee_asset = quote_quantity * self.fee_rate, self.quote_asset
+            base = self.base_asset(symbol)
+            self.balances[base] = self.free(base) - quantity
+            self.balances[self.quote_asset] = self.free(self.quote_asset) + quote_quantity - fee
+        fill = Fill(self._next_id, symbol, side, quantity, price, quote_quantity, fee, fee_asset, time.time())
+        self._next_id += 1
+        self.orders.append(fill)
+        return fill
+
+    async def market_buy(self, symbol, quote_amount):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        price = self.prices.get(symbol)
+        if price is None:
+            raise OrderRejectedError(symbol, "no price")
+        if quote_amount > self.free(self.quote_asset) + 1e-9:
+            raise InsufficientBalanceError(self.quote_asset, quote_amount, self.free(self.quote_asset))
+        return self._fill(symbol, "BUY", quote_amount / price, price)
+
+    async def market_sell(self, symbol, quantity):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        price = self.prices.get(symbol)
+        if price is None:
+            raise OrderRejectedError(symbol, "no price")
+        base = self.base_asset(symbol)
+        if quantity > self.free(base) + 1e-12:
+            raise InsufficientBalanceError(base, quantity, self.free(base))
+        return self._fill(symbol, "SELL", quantity, price)
+
+
+class BinanceSpotExchange(ExchangeAdapter):
+    """
+    Binance spot through python-binance's AsyncClient. Balances are loaded once, then kept
+    current by the user data stream (outboundAccountPosition events); symbol filters are
+    loaded once per symbol. Credentials come from BINANCE_API_KEY / BINANCE_API_SECRET.
+    """
+
+    def __init__(self, api_key=None, api_secret=None, quote_asset="USDT", testnet=False):
+        super().__init__(quote_asset)
+        self.api_key = api_key or os.getenv("BINANCE_API_KEY")
+        self.api_secret = api_secret or os.getenv("BINANCE_API_SECRET")
+        self.testnet = testnet
+        self.client = None
+        self.step_sizes = {}
+        self._user_stream = None
+
+    async def start(self):
+        from binance import AsyncClient
+
+        if not self.api_key or not self.api_secret:
+            raise ValueError("BINANCE_API_KEY and BINANCE_API_SECRET must be set.")
+        self.client = await AsyncClient.create(self.api_key, self.api_secret, testnet=self.testnet)
+        account = await self.client.get_account()
+        self.balances = {balance["asset"]: float(balance["free"]) for balance in account["balances"]}
+        self._user_stream = asyncio.create_task(self._consume_user_stream())
+
+    async def close(self):
+        if self._user_stream is not None:
+            self._user_stream.cancel()
+        if self.client is not None:
+            await self.client.close_connection()
+
+    async def _consume_user_stream(self):
+        from binance import BinanceSocketManager
+
+        while True:
+            try:
+                async with BinanceSocketManager(self.client).user_socket() as stream:
+                    while True:
+                        event = await stream.recv()
+                        if event.get("e") == "outboundAccountPosition":
+                            for balance in event["B"]:
+                                self.balances[balance["a"]] = float(balance["f"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"User data stream interrupted ({e}), reconnecting")
+                await asyncio.sleep(1)
+
+    async def step_size(self, symbol):
+        if symbol not in self.step_sizes:
+            info = await self.client.get_symbol_info(symbol)
+            lot_size = next(f for f in info["filters"] if f["filterType"] == "LOT_SIZE")
+            self.step_sizes[symbol] = float(lot_size["stepSize"])
+        return self.step_sizes[symbol]
+
+    def _to_fill(self, symbol, side, order):
+        fills = order.get("fills", [])
+        quantity = float(order["executedQty"])
+        quote_quantity = float(order["cummulativeQuoteQty"])
+        fee = sum(float(fill["commission"]) for fill in fills)
+        fee_asset = fills[0]["commissionAsset"] if fills else None
+        price = quote_quantity / quantity if quantity else 0.0
+        return Fill(order["orderId"], symbol, side, quantity, price, quote_quantity, fee, fee_asset,
+                    order.get("transactTime", 0) / 1000)
+
+    async def market_buy(self, symbol, quote_amount):
+        from binance.exceptions import BinanceAPIException
+
+        if quote_amount > self.free(self.quote_asset):
+            raise InsufficientBalanceError(self.quote_asset, quote_amount, self.free(self.quote_asset))
+        try:
+            order = await self.client.order_market_buy(symbol=symbol, quoteOrderQty=f"{quote_amount:.2f}",
+                                                       newOrderRespType="FULL")
+        except BinanceAPIException as e:
+            raise OrderRejectedError(symbol, e.message)
+        return self._to_fill(symbol, "BUY", order)
+
+    async def market_sell(self, symbol, quantity):
+        from binance.exceptions import BinanceAPIException
+
+        quantity = round_step(quantity, await self.step_size(symbol))
+        try:
+            order = await self.client.order_market_sell(symbol=symbol, quantity=f"{quantity:.8f}".rstrip("0").rstrip("."),
+                                                        newOrderRespType="FULL")
+        except BinanceAPIException as e:
+            raise OrderRejectedError(symbol, e.message)
+        return self._to_fill(symbol, "SELL", order)
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from loguru import logger
+
+
+# Columns hashed into dataset_key(), the inputs of every indicator
+PRICE_COLUMNS = ('high_price', 'low_price', 'close_price', 'volume')
+
+
+def dataset_key(data, symbol=None, interval=None):
+    """
+    Identifies a kline dataset by symbol, interval, the open_time range it covers and a
+    digest of its prices, so another symbol (or corrected bars) over the same range never
+    gets served the indicators of a different dataset, even from cache_dir.
+    """
+    if data.empty:
+        return (symbol, interval, None, None, 0, None)
+    open_time = data['open_time']
+    digest = hashlib.blake2b(digest_size=16)
+    for column in PRICE_COLUMNS:
+        if column in data.columns:
+            digest.update(np.ascontiguousarray(data[column].to_numpy(dtype=np.float64)))
+    return (symbol, interval, str(open_time.iloc[0]), str(open_time.iloc[-1]), len(data), digest.hexdigest())
+
+
+class IndicatorCache:
+    """
+    Memoizes indicator series per (dataset, indicator, params).
+    Entries are kept in memory under an LRU byte budget and, when `cache_dir` is set,
+    written to disk as .npy files so a restart or a later sweep can reload them.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dataset, indicator, params):
+        return (dataset, indicator, tuple(sorted(params.items())))
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key[1]}_{digest}.npy")
+
+    def get(self, key):
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return values
+
+        if self.cache_dir:
+            path = self._path(key)
+            if os.path.exists(path):
+                values = np.load(path, mmap_mode='r')
+                self._store(key, values)
+                with self._lock:
+                    self.hits += 1
+                return values
+        return None
+
+    def _store(self, key, values):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = values
+            self.current_bytes += values.nbytes
+            # Evict least recently used entries until we are back under budget
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def put(self, key, values):
+        values = np.ascontiguousarray(values)
+        values.setflags(write=False)  # Cached series are shared between consumers
+        self._store(key, values)
+        if self.cache_dir:
+            path = self._path(key)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, values)
+                os.replace(tmp_path, path)
+        return values
+
+    def get_or_compute(self, dataset, indicator, params, compute):
+        """Returns the cached series for the key, computing and storing it on a miss."""
+        key = self.make_key(dataset, indicator, params)
+        values = self.get(key)
+        if values is not None:
+            return values
+        with self._lock:
+            self.misses += 1
+        logger.debug(f"Computing {indicator} {params} for {dataset}")
+        return self.put(key, compute())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
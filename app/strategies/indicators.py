@@ -1,8 +1,13 @@
-import pandas_ta as ta
+import numpy as np
 from loguru import logger
+from app.strategies import native_indicators as ni
+from app.strategies.indicator_cache import dataset_key as indicator_dataset_key
+from app.strategies.registry import IndicatorArrays, SignalSet, get_spec
+from app.strategies.schemas import StrategyIndicator
+from app.strategies.streaming import StreamingIndicators
 
 class Strategy:
-    def __init__(self, data, rsi_length=14, bollinger_length=20, bollinger_std_dev=2, atr_length=14, adx_length=30, sma_short_length=50, sma_long_length=200):
+    def __init__(self, data, rsi_length=14, bollinger_length=20, bollinger_std_dev=2, atr_length=14, adx_length=30, sma_short_length=50, sma_long_length=200, cache=None, symbol=None, interval=None, indicator=StrategyIndicator.RSI_BB_ATR, indicator_params=None, dataset_key=None):
         self.data = data  # DataFrame containing historical price data
         self.rsi_length = rsi_length  # RSI period
         self.bollinger_length = bollinger_length  # Bollinger Bands period
@@ -12,27 +17,82 @@ class Strategy:
         self.sma_short_length=sma_short_length
         self.sma_long_length=sma_long_length
         self.window=10
+        self.cache = cache  # Optional IndicatorCache shared between Strategy instances
+        self.symbol = symbol
+        self.interval = interval
+        self.stream = None  # StreamingIndicators state for live bars, created on first update()
+        # dataset_key() of self.data: given by callers that reuse the same bars (sweep workers),
+        # otherwise computed on the first cached indicator of each logic_strategy() run
+        self.dataset_key = dataset_key
+        self._dataset = dataset_key
+        # Buy rule from the strategy registry (a StrategyIndicator member, a registered key or a SignalSpec)
+        self.signal_spec = get_spec(indicator)
+        self.signals = SignalSet([self.signal_spec])
+        self.indicator_params = indicator_params or {}  # Other native_indicators parameters (macd_fast, stoch_k, ...)
+
+    def _indicator(self, name, params, compute):
+        """Computes an indicator, or serves it from the cache when one is configured."""
+        if self.cache is None:
+            return compute()
+        if self._dataset is None:
+            # Hashes the prices once per logic_strategy() run rather than once per indicator
+            self._dataset = indicator_dataset_key(self.data, self.symbol, self.interval)
+        return self.cache.get_or_compute(self._dataset, name, params, compute)
 
-    
     def logic_strategy(self):
+        self._dataset = self.dataset_key
+        close = self.data['close_price'].to_numpy(dtype=np.float64)
+        high = self.data['high_price'].to_numpy(dtype=np.float64)
+        low = self.data['low_price'].to_numpy(dtype=np.float64)
+
         # Key indicators for the strategy
-        self.data['RSI'] = ta.rsi(self.data['close_price'], length=self.rsi_length)
+        self.data['RSI'] = self._indicator(
+            'rsi', {'length': self.rsi_length},
+            lambda: ni.rsi(close, self.rsi_length),
+        )
 
-        # Calculate Bollinger Bands
-        bbands = ta.bbands(self.data['close_price'], length=self.bollinger_length, std=self.bollinger_std_dev)
-        self.data['upper_band'], self.data['middle_band'], self.data['lower_band'] = bbands.iloc[:, 0], bbands.iloc[:, 1], bbands.iloc[:, 2]
+        # Calculate Bollinger Bands (lower, middle, upper)
+        bands = self._indicator(
+            'bbands', {'length': self.bollinger_length, 'std': self.bollinger_std_dev},
+            lambda: np.column_stack(ni.bbands(close, self.bollinger_length, self.bollinger_std_dev)),
+        )
+        self.data['lower_band'], self.data['middle_band'], self.data['upper_band'] = bands[:, 0], bands[:, 1], bands[:, 2]
 
         # Calculate ATR for dynamic target profit
-        self.data['ATR'] = ta.atr(self.data['high_price'], self.data['low_price'], self.data['close_price'], length=self.atr_length)
+        self.data['ATR'] = self._indicator(
+            'atr', {'length': self.atr_length},
+            lambda: ni.atr(high, low, close, self.atr_length),
+        )
 
         # Calculate ADX
-        adx_result = ta.adx(self.data['high_price'], self.data['low_price'], self.data['close_price'], length=self.adx_length)
-        self.data['ADX'] = adx_result[f'ADX_{self.adx_length}']
+        self.data['ADX'] = self._indicator(
+            'adx', {'length': self.adx_length},
+            lambda: ni.adx(high, low, close, self.adx_length)[0],
+        )
 
         # Moving Averages
         logger.info(f"Using SMA lengths: short={self.sma_short_length}, long={self.sma_long_length}")
-        self.data['SMA_short'] = ta.sma(self.data['close_price'], length=self.sma_short_length)
-        self.data['SMA_long'] = ta.sma(self.data['close_price'], length=self.sma_long_length)
+        self.data['SMA_short'] = self._indicator(
+            'sma', {'length': self.sma_short_length},
+            lambda: ni.sma(close, self.sma_short_length),
+        )
+        self.data['SMA_long'] = self._indicator(
+            'sma', {'length': self.sma_long_length},
+            lambda: ni.sma(close, self.sma_long_length),
+        )
+
+        # Other columns the signal spec needs (MACD, Stochastic, volume, ...)
+        missing = sorted(self.signal_spec.columns - set(self.data.columns))
+        if missing:
+            params = {
+                'rsi_length': self.rsi_length, 'bollinger_length': self.bollinger_length,
+                'bollinger_std_dev': self.bollinger_std_dev, 'atr_length': self.atr_length,
+                'adx_length': self.adx_length, 'sma_short_length': self.sma_short_length,
+                'sma_long_length': self.sma_long_length, 'pattern_length': self.window, **self.indicator_params,
+            }
+            arrays = IndicatorArrays(self.data, **params)
+            for column in missing:
+                self.data[column] = self._indicator(column, params, lambda column=column: arrays[column])
 
         # Calculates support and resistance levels using rolling min and max.
         return self.data
@@ -45,11 +105,41 @@ class Strategy:
     def get_decision(self):
         # Default no action
 
-        # Buy signal: RSI < 40 and close > lower Bollinger Band
-        self.data.loc[
-            (self.data['RSI'] < 30) & (self.data['close_price'] > self.data['lower_band']),
-            'Signal'
-        ] = 1  # Buy signal
-
+        # Buy signal from the registry spec (by default RSI < 30 and close > lower Bollinger Band)
+        self.data.loc[self.signals.evaluate(self.data)[0], 'Signal'] = 1  # Buy signal
 
         return self.data
+
+    def _streaming_indicators(self):
+        return StreamingIndicators(
+            rsi_length=self.rsi_length,
+            bollinger_length=self.bollinger_length,
+            bollinger_std_dev=self.bollinger_std_dev,
+            atr_length=self.atr_length,
+            adx_length=self.adx_length,
+            sma_short_length=self.sma_short_length,
+            sma_long_length=self.sma_long_length,
+        )
+
+    def warm_up(self, data):
+        """Feeds historical bars to the streaming indicators before going live."""
+        self.stream = self._streaming_indicators()
+        for high, low, close in zip(data['high_price'].to_numpy(), data['low_price'].to_numpy(), data['close_price'].to_numpy()):
+            self.stream.update(float(high), float(low), float(close))
+        return self.stream.values()
+
+    def update(self, bar):
+        """
+        Updates the indicators with one closed bar (mapping with high_price, low_price
+        and close_price) in O(1) and returns its signal: 1 for buy, 0 otherwise.
+        Only specs on the streaming columns without previous-bar rules can run live.
+        """
+        if self.signal_spec.uses_history or not self.signal_spec.columns <= set(StreamingIndicators.COLUMNS):
+            raise ValueError(f"Signal spec {self.signal_spec.name} can't be evaluated on streaming bars.")
+        if self.stream is None:
+            self.stream = self._streaming_indicators()
+        self.stream.update(float(bar['high_price']), float(bar['low_price']), float(bar['close_price']))
+
+        # Same buy rule as get_decision()
+        values = {name: np.array([value]) for name, value in self.stream.values().items()}
+        return int(self.signals.evaluate(values)[0, 0])
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+from loguru import logger
+
+from app.strategies.backtester import EXIT_STOP_LOSS, EXIT_TARGET_PROFIT
+from app.strategies.exceptions import StrategyError
+from app.strategies.risk_management import RiskManagement
+
+
+class LiveTradingEngine:
+    """
+    Event-driven counterpart of VectorizedBacktester for one symbol. Closed bars (from
+    LiveKlineService, through on_bar) are queued and handled one at a time: the Strategy's
+    streaming indicators give the signal, RiskManagement.exit_levels the ATR-adjusted
+    stop-loss/target, and orders go to the ExchangeAdapter. Same rules as the backtester:
+    exits are checked first, a signal on the exit bar can re-enter, and every trade
+    reinvests the balance of the previous one.
+    """
+
+    def __init__(self, exchange, strategy, symbol="BTCUSDT", target_profit=5, stoploss=30, fees=0.1,
+                 initial_investment=100, atr_multiplier=0.5, on_trade=None, strategy_id=None):
+        self.exchange = exchange
+        self.strategy = strategy
+        self.symbol = symbol
+        self.target_profit = target_profit
+        self.stoploss = stoploss
+        self.fees = fees
+        self.atr_multiplier = atr_multiplier
+        self.on_trade = on_trade  # Optional callback(event, details) for journaling, e.g. TradeJournal.on_trade
+        self.strategy_id = strategy_id
+
+        self.balance = initial_investment  # Quote amount committed to the strategy
+        self.in_position = False
+        self.entry_price = None
+        self.entry_time = None
+        self.quantity = 0.0
+        self.trade_cycles = []
+        self.last_close_time = None  # Epoch ms of the newest bar warmed up on or queued
+
+        self.bars = asyncio.Queue()
+        self.latencies_ms = deque(maxlen=10_000)  # Bar received -> order filled
+        self.decision_ms = deque(maxlen=10_000)  # Bar received -> order submitted
+
+    def warm_up(self, data):
+        """Feeds historical bars to the strategy before the first live bar."""
+        if "close_time" in data.columns and not data.empty:
+            close_time = data["close_time"].to_numpy()
+            if np.issubdtype(close_time.dtype, np.datetime64):
+                close_time = close_time.astype("datetime64[ms]").astype(np.int64)
+            self.last_close_time = int(close_time.max())
+        return self.strategy.warm_up(data)
+
+    def on_bar(self, symbol, buffer, closed):
+        """
+        LiveKlineService subscriber: queues the newest bar once it is closed. Bars closing at
+        or before the last one warmed up on or queued are dropped, so none is counted twice.
+        """
+        if not closed or symbol != self.symbol:
+            return
+        index = (buffer.count - 1) % buffer.capacity
+        close_time = int(buffer.close_time[index])
+        if self.last_close_time is not None and close_time <= self.last_close_time:
+            return
+        self.last_close_time = close_time
+        self.bars.put_nowait({
+            "open_time": int(buffer.open_time[index]),
+            "close_time": close_time,
+            "high_price": float(buffer.values[index, 1]),
+            "low_price": float(buffer.values[index, 2]),
+            "close_price": float(buffer.values[index, 3]),
+            "received": time.perf_counter(),
+        })
+
+    async def run(self):
+        """Handles queued bars until cancelled. A failing bar is logged and skipped, never fatal."""
+        while True:
+            bar = await self.bars.get()
+            try:
+                await self.on_closed_bar(bar)
+            except StrategyError as e:
+                logger.error(f"Order failed on {self.symbol}: {e}")
+            except Exception:
+                logger.exception(f"Failed to handle the {self.symbol} bar closing at {bar['close_time']}")
+
+    async def on_closed_bar(self, bar):
+        received = bar.get("received", time.perf_counter())
+        close = bar["close_price"]
+        self.exchange.update_price(self.symbol, close)
+        signal = self.strategy.update(bar)
+        atr = self.strategy.stream.values()["ATR"]
+
+        if self.in_position and np.isfinite(atr):
+            stop_price, target_price = RiskManagement.exit_levels(
+                self.entry_price, atr, self.target_profit, self.stoploss, self.fees, self.atr_multiplier
+            )
+            if close <= stop_price:
+                await self._exit(bar, EXIT_STOP_LOSS, received)
+            elif close >= target_price:
+                await self._exit(bar, EXIT_TARGET_PROFIT, received)
+
+        if not self.in_position and signal == 1:
+            await self._enter(bar, received)
+
+    def _record_latency(self, received, submitted):
+        self.decision_ms.append((submitted - received) * 1000)
+        self.latencies_ms.append((time.perf_counter() - received) * 1000)
+
+    async def _enter(self, bar, received):
+        quote_amount = min(self.balance, self.exchange.free(self.exchange.quote_asset))
+        submitted = time.perf_counter()
+        fill = await self.exchange.market_buy(self.symbol, quote_amount)
+        self._record_latency(received, submitted)
+
+        self.in_position = True
+        self.entry_price = fill.price
+        self.entry_time = bar["close_time"]
+        # Fees in the base asset reduce what can be sold back
+        self.quantity = fill.quantity - (fill.fee if fill.fee_asset == self.exchange.base_asset(self.symbol) else 0.0)
+        self.balance = fill.quote_quantity
+        logger.info(f"Bought {fill.quantity} {self.symbol} at {fill.price} for {fill.quote_quantity:.2f}")
+        if self.on_trade is not None:
+            self.on_trade("buy", {"symbol": self.symbol, "strategy_id": self.strategy_id, "fill": fill,
+                                  "time": bar["close_time"]})
+
+    async def _exit(self, bar, reason, received):
+        submitted = time.perf_counter()
+        fill = await self.exchange.market_sell(self.symbol, self.quantity)
+        self._record_latency(received, submitted)
+
+        proceeds = fill.quote_quantity - (fill.fee if fill.fee_asset == self.exchange.quote_asset else 0.0)
+        profit = proceeds - self.balance
+        self.trade_cycles.append({
+            'Buy Date': self.entry_time,
+            'Buy Price': self.entry_price,
+            'Buy Dollar': self.balance,
+            'Sell Date': bar["close_time"],
+            'Sell Price': fill.price,
+            'Sell dollar': proceeds,
+            'Profit/Loss': profit,
+        })
+        logger.info(f"Sold {fill.quantity} {self.symbol} at {fill.price} ({'stop-loss' if reason == EXIT_STOP_LOSS else 'target'}), P/L {profit:.2f}")
+        if self.on_trade is not None:
+            self.on_trade("sell", {"symbol": self.symbol, "strategy_id": self.strategy_id, "fill": fill,
+                                   "time": bar["close_time"],
+                                   "reason": reason, "profit": profit})
+
+        self.balance = proceeds
+        self.in_position = False
+        self.entry_price = None
+        self.quantity = 0.0
+
+    def latency_stats(self):
+        """Median / p99 / max in ms of bar-to-submit (decision) and bar-to-fill."""
+        stats = {}
+        for name, samples in (("decision", self.decision_ms), ("fill", self.latencies_ms)):
+            if samples:
+                values = np.fromiter(samples, dtype=np.float64)
+                stats[name] = {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99)),
+                               "max": float(values.max())}
+        return stats
@@ -0,0 +1,167 @@
+import math
+
+import numpy as np
+
+from app.data.schemas import KlineIntervals
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path below is used instead
+    njit = None
+
+YEAR_MS = 365 * 86_400_000  # Crypto trades around the clock
+
+
+def periods_per_year(interval):
+    """Number of bars of `interval` in a year, used to annualize bar-level returns."""
+    return YEAR_MS / KlineIntervals.to_milliseconds(interval)
+
+
+def equity_curve(close, entry_idx, exit_idx, balance_before, profit, initial_balance,
+                 open_entry=-1, final_balance=None):
+    """
+    Marks the account to market on every bar: after the entry bar a trade is worth
+    balance_before * close / entry close, from its exit bar on the account holds the
+    booked balance until the bar after the next entry. Trades must not overlap (one
+    position at a time); a position still open at the end is given by `open_entry`.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = close.shape[0]
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    exit_idx = np.asarray(exit_idx, dtype=np.int64)
+    balance_before = np.asarray(balance_before, dtype=np.float64)
+    cash = initial_balance + np.concatenate(([0.0], np.cumsum(profit)))  # Before each trade, then after the last
+
+    if open_entry >= 0:
+        entry_idx = np.append(entry_idx, open_entry)
+        exit_idx = np.append(exit_idx, n)
+        balance_before = np.append(balance_before, cash[-1] if final_balance is None else final_balance)
+        cash = np.append(cash, 0.0)  # Never used: the open trade runs to the end
+    trades = entry_idx.shape[0]
+    if trades == 0:
+        return np.full(n, float(initial_balance))
+
+    # Alternating flat / held segments: [.., entry + 1) flat, [entry + 1, exit) held
+    bounds = np.empty(2 * trades + 2, dtype=np.int64)
+    bounds[0] = 0
+    bounds[1:-1:2] = entry_idx + 1
+    bounds[2:-1:2] = exit_idx
+    bounds[-1] = n
+    lengths = np.diff(np.minimum(bounds, n))
+
+    flat = np.zeros(2 * trades + 1)
+    flat[0::2] = cash[:trades + 1]
+    units = np.zeros(2 * trades + 1)
+    units[1::2] = balance_before / close[entry_idx]
+    return np.repeat(flat, lengths) + np.repeat(units, lengths) * close
+
+
+def _equity_stats_loop(equity):
+    """
+    One pass over the equity curve: mean, sample std and downside deviation of the bar
+    returns, max drawdown (fraction of the peak) and the longest time under water in bars.
+    """
+    n = equity.shape[0]
+    mean = 0.0
+    m2 = 0.0
+    downside = 0.0
+    peak = equity[0]
+    peak_at = 0
+    max_drawdown = 0.0
+    duration = 0
+    for i in range(1, n):
+        r = equity[i] / equity[i - 1] - 1.0
+        delta = r - mean
+        mean += delta / i
+        m2 += delta * (r - mean)
+        if r < 0.0:
+            downside += r * r
+        if equity[i] >= peak:
+            peak = equity[i]
+            peak_at = i
+        else:
+            depth = 1.0 - equity[i] / peak
+            if depth > max_drawdown:
+                max_drawdown = depth
+            if i - peak_at > duration:
+                duration = i - peak_at
+    std = math.sqrt(m2 / (n - 2)) if n > 2 else 0.0
+    return mean, std, math.sqrt(downside / (n - 1)) if n > 1 else 0.0, max_drawdown, duration
+
+
+_equity_stats_jit = njit(cache=True, nogil=True)(_equity_stats_loop) if njit is not None else None
+
+
+def _equity_stats_numpy(equity):
+    """Same results as _equity_stats_loop with array operations."""
+    n = equity.shape[0]
+    returns = equity[1:] / equity[:-1] - 1.0
+    downside = np.minimum(returns, 0.0)
+    peak = np.maximum.accumulate(equity)
+    highs = np.flatnonzero(equity >= peak)
+    duration = int(np.diff(np.append(highs, n)).max()) - 1
+    return (float(returns.mean()) if n > 1 else 0.0, float(returns.std(ddof=1)) if n > 2 else 0.0,
+            math.sqrt(downside @ downside / (n - 1)) if n > 1 else 0.0, float((1.0 - equity / peak).max()), duration)
+
+
+def drawdown(equity):
+    """Max drawdown (fraction of the peak) and the longest time under water, in bars."""
+    equity = np.ascontiguousarray(equity, dtype=np.float64)
+    stats = _equity_stats_jit(equity) if _equity_stats_jit is not None else _equity_stats_numpy(equity)
+    return stats[3], stats[4]
+
+
+def performance_metrics(equity, interval="1m", profit=None, balance_before=None, bars_in_market=None, use_jit=True):
+    """
+    Performance and risk metrics from an equity curve (one value per bar) and, optionally,
+    the per-trade profit / invested balance arrays and the number of bars spent in a
+    position. Sharpe, Sortino and volatility use bar-level returns annualized with the bar
+    frequency of `interval`. Cheap enough to run for every combination of a sweep.
+    """
+    equity = np.ascontiguousarray(equity, dtype=np.float64)
+    n = equity.shape[0]
+    if n == 0:
+        raise ValueError("Empty equity curve.")
+    per_year = periods_per_year(interval)
+    stats = _equity_stats_jit if use_jit and _equity_stats_jit is not None else _equity_stats_numpy
+    mean, std, downside, max_drawdown, drawdown_bars = stats(equity)
+
+    annualize = math.sqrt(per_year)
+    initial, final = float(equity[0]), float(equity[-1])
+    years = (n - 1) / per_year
+    cagr = (final / initial) ** (1.0 / years) - 1.0 if years > 0 and initial > 0 and final > 0 else math.nan
+
+    metrics = {
+        'Sharpe Ratio': mean / std * annualize if std > 0 else math.nan,
+        'Sortino Ratio': mean / downside * annualize if downside > 0 else math.nan,
+        'Volatility (%)': std * annualize * 100,
+        'Max Drawdown (%)': max_drawdown * 100,
+        'Max Drawdown Duration (bars)': int(drawdown_bars),
+        'CAGR (%)': cagr * 100,
+        'Calmar Ratio': cagr / max_drawdown if max_drawdown > 0 else math.nan,
+        'ROI (%)': (final - initial) / initial * 100,
+        'Net Profit ($)': final - initial,
+    }
+
+    if profit is not None:
+        profit = np.asarray(profit, dtype=np.float64)
+        total_trades = profit.shape[0]
+        wins = profit > 0
+        win_count = int(np.count_nonzero(wins))
+        gross_profit = float(profit[wins].sum())
+        gross_loss = gross_profit - float(profit.sum())
+        metrics['Total Trades'] = total_trades
+        metrics['Win Rate (%)'] = win_count / total_trades * 100 if total_trades else 0.0
+        metrics['Profit Factor'] = gross_profit / gross_loss if gross_loss > 0 else math.inf if gross_profit > 0 else math.nan
+        metrics['Expectancy ($)'] = float(profit.mean()) if total_trades else 0.0
+        if balance_before is not None:
+            trade_returns = profit / np.asarray(balance_before, dtype=np.float64) * 100
+            metrics['Average Profit (%)'] = float(trade_returns[wins].mean()) if win_count else 0.0
+            metrics['Average Loss (%)'] = float(trade_returns[~wins].mean()) if win_count < total_trades else 0.0
+            # Bought plus sold notional over the average account value
+            metrics['Turnover'] = float(2.0 * np.sum(balance_before) + profit.sum()) / float(equity.mean())
+
+    if bars_in_market is not None:
+        metrics['Exposure (%)'] = bars_in_market / n * 100
+
+    return metrics
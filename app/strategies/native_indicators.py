@@ -0,0 +1,649 @@
+import math
+
+import numpy as np
+
+from app.strategies.schemas import StrategyIndicator
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path below is used instead
+    njit = None
+
+# Indicators on contiguous float64 arrays, with the definitions of pandas_ta 0.3.14b
+# (rma = Wilder ewm with adjust=True, EMA seeded with the SMA of its first `length` values,
+# population std for the Bollinger Bands). Each result is NaN until its window is full.
+# Recursive filters and rolling extremes run as numba loops when numba is installed,
+# otherwise as block-wise array operations giving the same values.
+
+FIB_RATIOS = (0.236, 0.382, 0.5, 0.618, 0.786)
+
+# Support / resistance group of RSI_TRENDLINES_PRICEPATTERNS, not a StrategyIndicator member
+PRICE_PATTERNS = 'price_patterns'
+
+# Parameters of compute(), named as the Strategy constructor arguments
+DEFAULT_PARAMS = {
+    'rsi_length': 14,
+    'bollinger_length': 20,
+    'bollinger_std_dev': 2,
+    'atr_length': 14,
+    'adx_length': 30,
+    'sma_short_length': 50,
+    'sma_long_length': 200,
+    'ema_length': 20,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'stoch_k': 14,
+    'stoch_d': 3,
+    'stoch_smooth_k': 3,
+    'volume_length': 20,
+    'fib_length': 100,
+    'trendline_length': 20,
+    'pattern_length': 10,
+}
+
+
+def _array(values):
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+# Recursive filters
+
+def _linear_filter_numpy(x, decay):
+    """
+    y[i] = x[i] + decay * y[i - 1] without a Python loop: a scaled cumulative sum inside
+    blocks of up to 64 values, plus the value carried from the previous blocks, which is
+    the same recurrence over the block ends (decay ** block) solved recursively.
+    """
+    n = x.shape[0]
+    if decay == 0.0 or n < 2:
+        return x.copy()
+    block = int(min(64.0, max(2.0, 200.0 / -math.log10(decay))))  # decay ** -block stays finite
+    blocks = np.concatenate((x, np.zeros(-n % block))).reshape(-1, block)
+    powers = decay ** np.arange(block + 1, dtype=np.float64)
+    partial = np.cumsum(blocks / powers[:-1], axis=1) * powers[:-1]
+    carry = _linear_filter_numpy(np.ascontiguousarray(partial[:, -1]), float(powers[-1]))
+    partial[1:] += carry[:-1, None] * powers[1:]
+    return partial.ravel()[:n]
+
+
+def _rma_loop(x, length):
+    """
+    Wilder moving average, pandas ewm(alpha=1/length, adjust=True, min_periods=length):
+    starts at the first finite value, a NaN later on only decays the weights.
+    """
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    decay = 1.0 - 1.0 / length
+    numerator = 0.0
+    denominator = 0.0
+    count = 0
+    for i in range(n):
+        if x[i] == x[i]:
+            numerator = x[i] + decay * numerator
+            denominator = 1.0 + decay * denominator
+            count += 1
+        else:
+            numerator *= decay
+            denominator *= decay
+        if count >= length:
+            out[i] = numerator / denominator
+    return out
+
+
+_rma_jit = njit(cache=True, nogil=True)(_rma_loop) if njit is not None else None
+
+
+def _rma_numpy(x, length):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    finite = np.isfinite(x)
+    if not finite.any():
+        return out
+    start = int(np.argmax(finite))
+    finite = finite[start:]
+    decay = 1.0 - 1.0 / length
+    numerator = _linear_filter_numpy(np.where(finite, x[start:], 0.0), decay)
+    denominator = _linear_filter_numpy(finite.astype(np.float64), decay)
+    out[start:] = np.where(np.cumsum(finite) >= length, numerator / denominator, np.nan)
+    return out
+
+
+def _ema_loop(x, length):
+    """pandas_ta ema: the SMA of the first `length` values, then ewm(span=length, adjust=False)."""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    start = 0
+    while start < n and x[start] != x[start]:
+        start += 1
+    seed_at = start + length - 1
+    if seed_at >= n:
+        return out
+    total = 0.0
+    for i in range(start, seed_at + 1):
+        total += x[i]
+    alpha = 2.0 / (length + 1)
+    value = total / length
+    out[seed_at] = value
+    for i in range(seed_at + 1, n):
+        value = alpha * x[i] + (1.0 - alpha) * value
+        out[i] = value
+    return out
+
+
+_ema_jit = njit(cache=True, nogil=True)(_ema_loop) if njit is not None else None
+
+
+def _ema_numpy(x, length):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    finite = np.flatnonzero(np.isfinite(x))
+    if not finite.size or finite[0] + length > n:
+        return out
+    start = int(finite[0])
+    seed_at = start + length - 1
+    alpha = 2.0 / (length + 1)
+    values = x[seed_at:].copy()
+    values[0] = x[start:seed_at + 1].mean() / alpha  # y = alpha * z with z[i] = x[i] + (1 - alpha) * z[i - 1]
+    out[seed_at:] = alpha * _linear_filter_numpy(values, 1.0 - alpha)
+    return out
+
+
+# Rolling windows
+
+def _sma_numpy(x, length):
+    """Rolling mean with pandas min_periods=length: NaN while the window holds a NaN."""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if n < length:
+        return out
+    finite = np.isfinite(x)
+    reference = x[np.argmax(finite)] if finite.any() else 0.0  # Summing deviations keeps the cumsum small
+    sums = np.concatenate(([0.0], np.cumsum(np.where(finite, x - reference, 0.0))))
+    gaps = np.concatenate(([0], np.cumsum(~finite)))
+    complete = gaps[length:] == gaps[:-length]
+    out[length - 1:] = np.where(complete, (sums[length:] - sums[:-length]) / length + reference, np.nan)
+    return out
+
+
+def _rolling_std_numpy(x, length, chunk=65536):
+    """Population std of every window, in chunks so the deviations never take n * length memory."""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if n < length:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(x, length)
+    for start in range(0, windows.shape[0], chunk):
+        out[length - 1 + start:length - 1 + start + chunk] = windows[start:start + chunk].std(axis=1)
+    return out
+
+
+def _rolling_max_loop(x, length):
+    """Rolling max with a monotonic deque of indices, O(n) for any window length."""
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    queue = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(n):
+        while tail > head and x[queue[tail - 1]] <= x[i]:
+            tail -= 1
+        queue[tail] = i
+        tail += 1
+        if queue[head] <= i - length:
+            head += 1
+        if i >= length - 1:
+            out[i] = x[queue[head]]
+    return out
+
+
+_rolling_max_jit = njit(cache=True, nogil=True)(_rolling_max_loop) if njit is not None else None
+
+
+def _rolling_max_numpy(x, length):
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if n >= length:
+        out[length - 1:] = np.lib.stride_tricks.sliding_window_view(x, length).max(axis=1)
+    return out
+
+
+def _rolling_max(x, length, use_jit):
+    if use_jit and _rolling_max_jit is not None:
+        return _rolling_max_jit(x, length)
+    return _rolling_max_numpy(x, length)
+
+
+def _rolling_min(x, length, use_jit):
+    return -_rolling_max(-x, length, use_jit)
+
+
+def _previous(x):
+    """x shifted by one bar, NaN first."""
+    shifted = np.empty_like(x)
+    shifted[0] = np.nan
+    shifted[1:] = x[:-1]
+    return shifted
+
+
+# Indicators
+
+def sma(x, length, use_jit=True):
+    return _sma_numpy(_array(x), length)
+
+
+def rma(x, length, use_jit=True):
+    x = _array(x)
+    return _rma_jit(x, length) if use_jit and _rma_jit is not None else _rma_numpy(x, length)
+
+
+def ema(x, length, use_jit=True):
+    x = _array(x)
+    return _ema_jit(x, length) if use_jit and _ema_jit is not None else _ema_numpy(x, length)
+
+
+def rsi(close, length=14, use_jit=True):
+    """Wilder RSI, same definition as pandas_ta.rsi."""
+    close = _array(close)
+    change = close - _previous(close)
+    gains = rma(np.where(change < 0, 0.0, change), length, use_jit)
+    losses = rma(np.where(change > 0, 0.0, -change), length, use_jit)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * gains / (gains + losses)
+
+
+def bbands(close, length=20, std=2, use_jit=True):
+    """Bollinger Bands (population std, as pandas_ta): lower, middle, upper."""
+    close = _array(close)
+    middle = _sma_numpy(close, length)
+    deviation = std * _rolling_std_numpy(close, length)
+    return middle - deviation, middle, middle + deviation
+
+
+def true_range(high, low, close):
+    previous = _previous(_array(close))
+    high, low = _array(high), _array(low)
+    ranges = np.maximum(high - low, np.maximum(np.abs(high - previous), np.abs(low - previous)))
+    ranges[0] = np.nan
+    return ranges
+
+
+def atr(high, low, close, length=14, use_jit=True):
+    """Wilder ATR over the true range, same definition as pandas_ta.atr."""
+    return rma(true_range(high, low, close), length, use_jit)
+
+
+def adx(high, low, close, length=14, use_jit=True):
+    """ADX, +DI and -DI as pandas_ta.adx: DM smoothed with rma, scaled by ATR."""
+    high, low = _array(high), _array(low)
+    up = high - _previous(high)
+    down = _previous(low) - low
+    plus = np.where((up > down) & (up > 0), up, 0.0)
+    minus = np.where((down > up) & (down > 0), down, 0.0)
+    plus[0] = minus[0] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = 100.0 / atr(high, low, close, length, use_jit)
+        plus_di = scale * rma(plus, length, use_jit)
+        minus_di = scale * rma(minus, length, use_jit)
+        dx = 100.0 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    return rma(dx, length, use_jit), plus_di, minus_di
+
+
+def macd(close, fast=12, slow=26, signal=9, use_jit=True):
+    """MACD line, histogram and signal line, as pandas_ta.macd."""
+    if slow < fast:
+        fast, slow = slow, fast
+    close = _array(close)
+    line = ema(close, fast, use_jit) - ema(close, slow, use_jit)
+    signal_line = ema(line, signal, use_jit)
+    return line, line - signal_line, signal_line
+
+
+def stoch(high, low, close, k=14, d=3, smooth_k=3, use_jit=True):
+    """Stochastic %K and %D, as pandas_ta.stoch with SMA smoothing."""
+    highest = _rolling_max(_array(high), k, use_jit)
+    lowest = _rolling_min(_array(low), k, use_jit)
+    spread = highest - lowest
+    spread[spread == 0] = np.finfo(np.float64).eps
+    stoch_k = _sma_numpy(100.0 * (_array(close) - lowest) / spread, smooth_k)
+    return stoch_k, _sma_numpy(stoch_k, d)
+
+
+def volume(volume, length=20, use_jit=True):
+    """Volume SMA and the volume relative to it."""
+    volume = _array(volume)
+    average = _sma_numpy(volume, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return average, volume / average
+
+
+def fibonacci(high, low, length=100, ratios=FIB_RATIOS, use_jit=True):
+    """
+    Retracement levels of the swing over the last `length` bars: swing high, swing low and
+    one row per ratio, swing high - ratio * (swing high - swing low).
+    """
+    swing_high = _rolling_max(_array(high), length, use_jit)
+    swing_low = _rolling_min(_array(low), length, use_jit)
+    levels = swing_high - np.asarray(ratios, dtype=np.float64)[:, None] * (swing_high - swing_low)
+    return swing_high, swing_low, levels
+
+
+def trendline(close, length=20, use_jit=True):
+    """Least squares line over the last `length` closes: its value on the last bar and its slope, as pandas_ta.linreg."""
+    close = _array(close)
+    n = close.shape[0]
+    value = np.full(n, np.nan)
+    slope = np.full(n, np.nan)
+    if n >= length > 1:
+        x = np.arange(length) - (length - 1) / 2.0
+        windows = np.lib.stride_tricks.sliding_window_view(close, length)
+        slope[length - 1:] = windows @ (x / (x @ x))
+        value[length - 1:] = windows @ np.full(length, 1.0 / length) + slope[length - 1:] * x[-1]
+    return value, slope
+
+
+def support_resistance(high, low, length=10, use_jit=True):
+    """Support and resistance levels as the rolling min of the lows and max of the highs."""
+    return _rolling_min(_array(low), length, use_jit), _rolling_max(_array(high), length, use_jit)
+
+
+# Fused sets: one pass over the bars for every indicator of the set
+
+def _rsi_bb_atr_loop(high, low, close, rsi_length, bollinger_length, bollinger_std_dev, atr_length):
+    n = close.shape[0]
+    rsi_values = np.full(n, np.nan)
+    lower = np.full(n, np.nan)
+    middle = np.full(n, np.nan)
+    upper = np.full(n, np.nan)
+    atr_values = np.full(n, np.nan)
+    rsi_decay = 1.0 - 1.0 / rsi_length
+    atr_decay = 1.0 - 1.0 / atr_length
+    gains = 0.0
+    losses = 0.0
+    rsi_weights = 0.0
+    ranges = 0.0
+    atr_weights = 0.0
+    total = 0.0
+    for i in range(n):
+        price = close[i]
+
+        total += price
+        if i >= bollinger_length:
+            total -= close[i - bollinger_length]
+        if i % bollinger_length == bollinger_length - 1:
+            # Re-sum once per lap so floating point drift never accumulates
+            total = 0.0
+            for j in range(i - bollinger_length + 1, i + 1):
+                total += close[j]
+        if i >= bollinger_length - 1:
+            mean = total / bollinger_length
+            m2 = 0.0
+            for j in range(i - bollinger_length + 1, i + 1):
+                m2 += (close[j] - mean) * (close[j] - mean)
+            deviation = bollinger_std_dev * math.sqrt(m2 / bollinger_length)
+            lower[i] = mean - deviation
+            middle[i] = mean
+            upper[i] = mean + deviation
+
+        if i == 0:
+            continue
+        previous = close[i - 1]
+        change = price - previous
+        gains = (change if change > 0.0 else 0.0) + rsi_decay * gains
+        losses = (-change if change < 0.0 else 0.0) + rsi_decay * losses
+        rsi_weights = 1.0 + rsi_decay * rsi_weights
+        if i >= rsi_length:
+            gain = gains / rsi_weights
+            loss = losses / rsi_weights
+            rsi_values[i] = 100.0 * gain / (gain + loss) if gain + loss > 0.0 else np.nan
+
+        bar_range = max(high[i] - low[i], abs(high[i] - previous), abs(low[i] - previous))
+        ranges = bar_range + atr_decay * ranges
+        atr_weights = 1.0 + atr_decay * atr_weights
+        if i >= atr_length:
+            atr_values[i] = ranges / atr_weights
+    return rsi_values, lower, middle, upper, atr_values
+
+
+_rsi_bb_atr_jit = njit(cache=True, nogil=True)(_rsi_bb_atr_loop) if njit is not None else None
+
+
+def rsi_bb_atr(high, low, close, rsi_length=14, bollinger_length=20, bollinger_std_dev=2, atr_length=14, use_jit=True):
+    """RSI, lower, middle and upper Bollinger Bands and ATR."""
+    high, low, close = _array(high), _array(low), _array(close)
+    if use_jit and _rsi_bb_atr_jit is not None:
+        return _rsi_bb_atr_jit(high, low, close, rsi_length, bollinger_length, float(bollinger_std_dev), atr_length)
+    return (rsi(close, rsi_length, False), *bbands(close, bollinger_length, bollinger_std_dev, False),
+            atr(high, low, close, atr_length, False))
+
+
+def _rsi_ma_macd_loop(close, rsi_length, sma_short_length, sma_long_length, fast, slow, signal):
+    n = close.shape[0]
+    rsi_values = np.full(n, np.nan)
+    sma_short = np.full(n, np.nan)
+    sma_long = np.full(n, np.nan)
+    line = np.full(n, np.nan)
+    histogram = np.full(n, np.nan)
+    signal_line = np.full(n, np.nan)
+    rsi_decay = 1.0 - 1.0 / rsi_length
+    fast_alpha = 2.0 / (fast + 1)
+    slow_alpha = 2.0 / (slow + 1)
+    signal_alpha = 2.0 / (signal + 1)
+    signal_seed_at = slow + signal - 2
+    gains = 0.0
+    losses = 0.0
+    rsi_weights = 0.0
+    short_total = 0.0
+    long_total = 0.0
+    fast_ema = 0.0
+    slow_ema = 0.0
+    signal_ema = 0.0
+    for i in range(n):
+        price = close[i]
+
+        short_total += price
+        if i >= sma_short_length:
+            short_total -= close[i - sma_short_length]
+        if i % sma_short_length == sma_short_length - 1:
+            short_total = 0.0
+            for j in range(i - sma_short_length + 1, i + 1):
+                short_total += close[j]
+        if i >= sma_short_length - 1:
+            sma_short[i] = short_total / sma_short_length
+        long_total += price
+        if i >= sma_long_length:
+            long_total -= close[i - sma_long_length]
+        if i % sma_long_length == sma_long_length - 1:
+            long_total = 0.0
+            for j in range(i - sma_long_length + 1, i + 1):
+                long_total += close[j]
+        if i >= sma_long_length - 1:
+            sma_long[i] = long_total / sma_long_length
+
+        # EMAs are seeded with the mean of their first values, summed while waiting
+        if i < fast:
+            fast_ema += price
+            if i == fast - 1:
+                fast_ema /= fast
+        else:
+            fast_ema = fast_alpha * price + (1.0 - fast_alpha) * fast_ema
+        if i < slow:
+            slow_ema += price
+            if i == slow - 1:
+                slow_ema /= slow
+        else:
+            slow_ema = slow_alpha * price + (1.0 - slow_alpha) * slow_ema
+        if i >= slow - 1:
+            value = fast_ema - slow_ema
+            line[i] = value
+            if i < signal_seed_at:
+                signal_ema += value
+            elif i == signal_seed_at:
+                signal_ema = (signal_ema + value) / signal
+            else:
+                signal_ema = signal_alpha * value + (1.0 - signal_alpha) * signal_ema
+            if i >= signal_seed_at:
+                signal_line[i] = signal_ema
+                histogram[i] = value - signal_ema
+
+        if i == 0:
+            continue
+        change = price - close[i - 1]
+        gains = (change if change > 0.0 else 0.0) + rsi_decay * gains
+        losses = (-change if change < 0.0 else 0.0) + rsi_decay * losses
+        rsi_weights = 1.0 + rsi_decay * rsi_weights
+        if i >= rsi_length:
+            gain = gains / rsi_weights
+            loss = losses / rsi_weights
+            rsi_values[i] = 100.0 * gain / (gain + loss) if gain + loss > 0.0 else np.nan
+    return rsi_values, sma_short, sma_long, line, histogram, signal_line
+
+
+_rsi_ma_macd_jit = njit(cache=True, nogil=True)(_rsi_ma_macd_loop) if njit is not None else None
+
+
+def rsi_ma_macd(close, rsi_length=14, sma_short_length=50, sma_long_length=200, fast=12, slow=26, signal=9,
+                use_jit=True):
+    """RSI, short and long SMA, MACD line, histogram and signal line."""
+    if slow < fast:
+        fast, slow = slow, fast
+    close = _array(close)
+    if use_jit and _rsi_ma_macd_jit is not None:
+        return _rsi_ma_macd_jit(close, rsi_length, sma_short_length, sma_long_length, fast, slow, signal)
+    return (rsi(close, rsi_length, False), _sma_numpy(close, sma_short_length), _sma_numpy(close, sma_long_length),
+            *macd(close, fast, slow, signal, False))
+
+
+# StrategyIndicator members
+
+def _compute_rsi(data, p, use_jit):
+    return {'RSI': rsi(data['close_price'], p['rsi_length'], use_jit)}
+
+
+def _compute_sma(data, p, use_jit):
+    return {'SMA_short': sma(data['close_price'], p['sma_short_length']),
+            'SMA_long': sma(data['close_price'], p['sma_long_length'])}
+
+
+def _compute_ema(data, p, use_jit):
+    return {'EMA': ema(data['close_price'], p['ema_length'], use_jit)}
+
+
+def _compute_macd(data, p, use_jit):
+    return dict(zip(('MACD', 'MACD_hist', 'MACD_signal'),
+                    macd(data['close_price'], p['macd_fast'], p['macd_slow'], p['macd_signal'], use_jit)))
+
+
+def _compute_bbands(data, p, use_jit):
+    return dict(zip(('lower_band', 'middle_band', 'upper_band'),
+                    bbands(data['close_price'], p['bollinger_length'], p['bollinger_std_dev'])))
+
+
+def _compute_volume(data, p, use_jit):
+    return dict(zip(('volume_sma', 'relative_volume'), volume(data['volume'], p['volume_length'])))
+
+
+def _compute_atr(data, p, use_jit):
+    return {'ATR': atr(data['high_price'], data['low_price'], data['close_price'], p['atr_length'], use_jit)}
+
+
+def _compute_stoch(data, p, use_jit):
+    return dict(zip(('STOCH_k', 'STOCH_d'), stoch(data['high_price'], data['low_price'], data['close_price'],
+                                                  p['stoch_k'], p['stoch_d'], p['stoch_smooth_k'], use_jit)))
+
+
+def _compute_fibonacci(data, p, use_jit):
+    swing_high, swing_low, levels = fibonacci(data['high_price'], data['low_price'], p['fib_length'],
+                                              use_jit=use_jit)
+    values = {'swing_high': swing_high, 'swing_low': swing_low}
+    values.update((f'fib_{ratio}', level) for ratio, level in zip(FIB_RATIOS, levels))
+    return values
+
+
+def _compute_trendline(data, p, use_jit):
+    return dict(zip(('trendline', 'trendline_slope'), trendline(data['close_price'], p['trendline_length'])))
+
+
+def _compute_patterns(data, p, use_jit):
+    return dict(zip(('support', 'resistance'),
+                    support_resistance(data['high_price'], data['low_price'], p['pattern_length'], use_jit)))
+
+
+def _compute_rsi_bb_atr(data, p, use_jit):
+    return dict(zip(('RSI', 'lower_band', 'middle_band', 'upper_band', 'ATR'), rsi_bb_atr(
+        data['high_price'], data['low_price'], data['close_price'], p['rsi_length'], p['bollinger_length'],
+        p['bollinger_std_dev'], p['atr_length'], use_jit)))
+
+
+def _compute_rsi_ma_macd(data, p, use_jit):
+    return dict(zip(('RSI', 'SMA_short', 'SMA_long', 'MACD', 'MACD_hist', 'MACD_signal'), rsi_ma_macd(
+        data['close_price'], p['rsi_length'], p['sma_short_length'], p['sma_long_length'], p['macd_fast'],
+        p['macd_slow'], p['macd_signal'], use_jit)))
+
+
+def _combine(*parts):
+    def compute_all(data, p, use_jit):
+        values = {}
+        for part in parts:
+            values.update(part(data, p, use_jit))
+        return values
+    return compute_all
+
+
+INDICATORS = {
+    StrategyIndicator.RSI: _compute_rsi,
+    StrategyIndicator.SMA: _compute_sma,
+    StrategyIndicator.EMA: _compute_ema,
+    StrategyIndicator.MACD: _compute_macd,
+    StrategyIndicator.BOLLINGER_BANDS: _compute_bbands,
+    StrategyIndicator.VOLUME: _compute_volume,
+    StrategyIndicator.ATR: _compute_atr,
+    StrategyIndicator.STOCHASTIC: _compute_stoch,
+    StrategyIndicator.FIBONACCI: _compute_fibonacci,
+    StrategyIndicator.TRENDLINE: _compute_trendline,
+    StrategyIndicator.RSI_MA_MACD: _compute_rsi_ma_macd,
+    StrategyIndicator.RSI_BB_VOLUME: _combine(_compute_rsi, _compute_bbands, _compute_volume),
+    StrategyIndicator.RSI_TRENDLINES_PRICEPATTERNS: _combine(_compute_rsi, _compute_trendline, _compute_patterns),
+    StrategyIndicator.RSI_BB_ATR: _compute_rsi_bb_atr,
+    StrategyIndicator.RSI_FIB_MA: _combine(_compute_rsi, _compute_fibonacci, _compute_sma),
+    StrategyIndicator.RSI_STOCH_BB: _combine(_compute_rsi, _compute_stoch, _compute_bbands),
+    StrategyIndicator.RSI_VOLUME_MACD: _combine(_compute_rsi, _compute_volume, _compute_macd),
+    PRICE_PATTERNS: _compute_patterns,
+}
+
+# Columns of the single indicator groups, every member above is a union of these
+GROUPS = {
+    StrategyIndicator.RSI: ('RSI',),
+    StrategyIndicator.SMA: ('SMA_short', 'SMA_long'),
+    StrategyIndicator.EMA: ('EMA',),
+    StrategyIndicator.MACD: ('MACD', 'MACD_hist', 'MACD_signal'),
+    StrategyIndicator.BOLLINGER_BANDS: ('lower_band', 'middle_band', 'upper_band'),
+    StrategyIndicator.VOLUME: ('volume_sma', 'relative_volume'),
+    StrategyIndicator.ATR: ('ATR',),
+    StrategyIndicator.STOCHASTIC: ('STOCH_k', 'STOCH_d'),
+    StrategyIndicator.FIBONACCI: ('swing_high', 'swing_low', *(f'fib_{ratio}' for ratio in FIB_RATIOS)),
+    StrategyIndicator.TRENDLINE: ('trendline', 'trendline_slope'),
+    PRICE_PATTERNS: ('support', 'resistance'),
+}
+COLUMN_GROUPS = {column: group for group, columns in GROUPS.items() for column in columns}
+
+# Members with a single-pass kernel and the groups it produces
+FUSED = {
+    StrategyIndicator.RSI_BB_ATR: (StrategyIndicator.RSI, StrategyIndicator.BOLLINGER_BANDS, StrategyIndicator.ATR),
+    StrategyIndicator.RSI_MA_MACD: (StrategyIndicator.RSI, StrategyIndicator.SMA, StrategyIndicator.MACD),
+}
+
+
+def compute(indicator, data, use_jit=True, **params):
+    """
+    Arrays of a StrategyIndicator member (or its value), or PRICE_PATTERNS, on `data`, a DataFrame or mapping
+    with high_price, low_price, close_price and volume columns, keyed by column name.
+    Parameters missing from `params` come from DEFAULT_PARAMS.
+    """
+    if indicator not in INDICATORS:
+        indicator = StrategyIndicator(indicator)
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown indicator parameters: {sorted(unknown)}")
+    return INDICATORS[indicator](data, {**DEFAULT_PARAMS, **params}, use_jit)
+
@@ -0,0 +1,435 @@
+import itertools
+import os
+import random
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from app.strategies.backtester import VectorizedBacktester
+from app.strategies.indicator_cache import IndicatorCache, dataset_key
+from app.strategies.indicators import Strategy
+from app.strategies.metrics import performance_metrics
+
+# Parameters consumed by Strategy, the rest go to the backtester (RiskManagement rules)
+STRATEGY_PARAMS = (
+    "rsi_length", "bollinger_length", "bollinger_std_dev", "atr_length",
+    "adx_length", "sma_short_length", "sma_long_length", "indicator",
+)
+RISK_PARAMS = ("target_profit", "stoploss", "fees")
+
+# Columns added by Strategy.logic_strategy()
+INDICATOR_COLUMNS = ("RSI", "lower_band", "middle_band", "upper_band", "ATR", "ADX", "SMA_short", "SMA_long")
+
+# Kline columns copied into shared memory, datetimes are stored as int64 nanoseconds
+SHARED_COLUMNS = (
+    "open_time", "close_time", "open_price", "high_price", "low_price", "close_price", "volume",
+)
+
+
+def grid(param_grid):
+    """Yields every combination of a {name: [values]} grid as a dict."""
+    names = list(param_grid)
+    for values in itertools.product(*(param_grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_combinations(param_space, n_samples, seed=None):
+    """
+    Yields `n_samples` random combinations. Each entry of `param_space` is either a
+    list of choices or a (low, high) tuple sampled uniformly (int bounds give ints).
+    """
+    rng = random.Random(seed)
+    for _ in range(n_samples):
+        params = {}
+        for name, space in param_space.items():
+            if isinstance(space, tuple):
+                low, high = space
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(list(space))
+        yield params
+
+
+class SharedKlines:
+    """
+    Kline columns stored once in shared memory. Workers attach to the blocks by name
+    instead of receiving a pickled DataFrame.
+    """
+
+    def __init__(self, data):
+        self.blocks = []
+        self.spec = {}
+        for column in SHARED_COLUMNS:
+            if column not in data.columns:
+                continue
+            values = data[column]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                array = values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+                kind = "datetime"
+            else:
+                array = values.to_numpy(dtype=np.float64)
+                kind = "float"
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.spec[column] = (block.name, array.shape, array.dtype.str, kind)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_shared_klines(spec):
+    """Rebuilds a kline DataFrame on top of the shared blocks described by `spec`."""
+    blocks = []
+    columns = {}
+    for column, (name, shape, dtype, kind) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        columns[column] = pd.to_datetime(array) if kind == "datetime" else array
+        blocks.append(block)
+    return pd.DataFrame(columns, copy=False), blocks
+
+
+# Per-process state set by the pool initializer
+_WORKER = {}
+
+
+def _init_worker(spec, base_params, initial_investment, cache_options):
+    logger.remove()  # Keep worker processes quiet, results are reported by the parent
+    data, blocks = attach_shared_klines(spec)
+    _WORKER["data"] = data
+    _WORKER["blocks"] = blocks
+    _WORKER["base_params"] = base_params
+    _WORKER["initial_investment"] = initial_investment
+    # Each worker memoizes the indicator series shared by the combinations it evaluates
+    _WORKER["cache"] = IndicatorCache(max_bytes=cache_options["max_bytes"], cache_dir=cache_options["cache_dir"])
+    _WORKER["symbol"] = cache_options["symbol"]
+    _WORKER["interval"] = cache_options["interval"]
+    # The shared klines never change, hash them once instead of once per combination
+    _WORKER["dataset_key"] = dataset_key(data, cache_options["symbol"], cache_options["interval"])
+
+
+def evaluate_combination(data, params, initial_investment=100, cache=None, symbol=None, interval=None, dataset_key=None):
+    """Runs Strategy + VectorizedBacktester for one parameter combination."""
+    strategy = Strategy(
+        data.copy(deep=False),
+        cache=cache,
+        symbol=symbol,
+        interval=interval,
+        dataset_key=dataset_key,
+        **{name: params[name] for name in STRATEGY_PARAMS if name in params},
+    )
+    strategy.logic_strategy()
+    strategy.preprocessing()
+    strategy.get_decision()
+
+    backtester = VectorizedBacktester(
+        initial_investment=initial_investment,
+        **{name: params[name] for name in RISK_PARAMS if name in params},
+    )
+    result = backtester.run(strategy.data)
+
+    return {
+        **params,
+        **result.metrics(interval or "1m"),
+        "Final Balance": result.final_balance,
+    }
+
+
+def _run_worker(params):
+    return evaluate_combination(
+        _WORKER["data"],
+        {**_WORKER["base_params"], **params},
+        _WORKER["initial_investment"],
+        cache=_WORKER["cache"],
+        symbol=_WORKER["symbol"],
+        interval=_WORKER["interval"],
+        dataset_key=_WORKER["dataset_key"],
+    )
+
+
+class ParameterSweep:
+    """
+    Fans parameter combinations out over a ProcessPoolExecutor. The klines are put in
+    shared memory once, each task only ships its parameter dict.
+    """
+
+    def __init__(self, data, initial_investment=100, fees=0.1, workers=None, rank_by="ROI (%)", max_pending=None,
+                 symbol=None, interval=None, cache_bytes=256 * 1024 * 1024, cache_dir=None):
+        self.data = data
+        # Indicator cache settings for the workers; with cache_dir set, later sweeps reuse the .npy files
+        self.cache_options = {"max_bytes": cache_bytes, "cache_dir": cache_dir, "symbol": symbol, "interval": interval}
+        self.initial_investment = initial_investment
+        self.base_params = {"fees": fees}
+        self.workers = workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        # Bound the number of in-flight tasks so huge grids are not materialized at once
+        self.max_pending = max_pending or self.workers * 4
+        self.results = []
+
+    def run(self, combinations):
+        """
+        Evaluates the combinations and yields each result as soon as it completes.
+        Every result is also kept in self.results for ranked().
+        """
+        combinations = iter(combinations)
+        with SharedKlines(self.data) as shared, ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(shared.spec, self.base_params, self.initial_investment, self.cache_options),
+        ) as executor:
+            pending = {}
+            for params in itertools.islice(combinations, self.max_pending):
+                pending[executor.submit(_run_worker, params)] = params
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    params = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Combination {params} failed: {e}")
+                        result = None
+                    for next_params in itertools.islice(combinations, 1):
+                        pending[executor.submit(_run_worker, next_params)] = next_params
+                    if result is not None:
+                        self.results.append(result)
+                        yield result
+
+    def run_all(self, combinations):
+        """Runs every combination and returns the ranked table."""
+        for count, _ in enumerate(self.run(combinations), start=1):
+            if count % 100 == 0:
+                logger.info(f"{count} combinations evaluated, best {self.rank_by}: {self.best()[self.rank_by]:.2f}")
+        return self.ranked()
+
+    def best(self):
+        return max(self.results, key=lambda result: result[self.rank_by]) if self.results else None
+
+    def ranked(self, top=None):
+        """Results collected so far as a DataFrame, best first."""
+        table = pd.DataFrame(self.results)
+        if table.empty:
+            return table
+        table = table.sort_values(self.rank_by, ascending=False, ignore_index=True)
+        return table.head(top) if top else table
+
+
+def _period(value):
+    """An int is a number of months, anything else a pandas Timedelta ("30D", "12h")."""
+    if isinstance(value, int):
+        return pd.DateOffset(months=value)
+    return pd.Timedelta(value)
+
+
+def walk_forward_windows(open_time, train=3, test=1, anchored=False):
+    """
+    Splits sorted bar times into consecutive (train_start, test_start, test_end) bar index
+    ranges: each test period directly follows its train period and the next window starts
+    one test period later, so the test periods tile the data without overlapping. With
+    `anchored`, every train period starts at the first bar (expanding window).
+    """
+    open_time = pd.DatetimeIndex(open_time)
+    if open_time.empty:
+        return []
+    train, test = _period(train), _period(test)
+    windows = []
+    start = open_time[0]
+    while True:
+        test_start = start + train
+        if test_start > open_time[-1]:
+            break
+        train_start = open_time[0] if anchored else start
+        bounds = open_time.searchsorted([train_start, test_start, test_start + test])
+        if bounds[1] - bounds[0] > 1 and bounds[2] - bounds[1] > 1:
+            windows.append(tuple(int(bound) for bound in bounds))
+        start += test
+    return windows
+
+
+def strategy_signals(data, params, cache=None, symbol=None, interval=None, dataset_key=None):
+    """
+    Close, ATR and buy signal arrays for every bar of `data`. Unlike evaluate_combination
+    no rows are dropped, so the arrays line up with `data` and any window can be sliced out;
+    bars with incomplete indicators just never signal.
+    """
+    strategy = Strategy(
+        data.copy(deep=False),
+        cache=cache,
+        symbol=symbol,
+        interval=interval,
+        dataset_key=dataset_key,
+        **{name: params[name] for name in STRATEGY_PARAMS if name in params},
+    )
+    strategy.logic_strategy()
+    frame = strategy.get_decision()
+    signal = (frame['Signal'] == 1).to_numpy() if 'Signal' in frame.columns else np.zeros(len(frame), dtype=np.bool_)
+    signal = signal & frame[list(INDICATOR_COLUMNS)].notna().all(axis=1).to_numpy()  # Bars preprocessing() keeps
+    return frame['close_price'].to_numpy(dtype=np.float64), frame['ATR'].to_numpy(dtype=np.float64), signal
+
+
+def _init_walk_forward_worker(spec, base_params, cache_options, windows):
+    _init_worker(spec, base_params, 1.0, cache_options)
+    _WORKER["windows"] = windows
+
+
+def _train_worker(params):
+    """Metrics of one combination on every train window (indicators computed once for all)."""
+    params = {**_WORKER["base_params"], **params}
+    close, atr, signal = strategy_signals(_WORKER["data"], params, _WORKER["cache"], _WORKER["symbol"],
+                                          _WORKER["interval"], _WORKER["dataset_key"])
+    backtester = VectorizedBacktester(initial_investment=1.0, **{name: params[name] for name in RISK_PARAMS if name in params})
+    scores = []
+    for train_start, test_start, _ in _WORKER["windows"]:
+        result = backtester.run_arrays(close[train_start:test_start], atr[train_start:test_start],
+                                       signal[train_start:test_start])
+        scores.append(result.metrics(_WORKER["interval"] or "1m"))
+    return scores
+
+
+def _test_worker(task):
+    """Equity curves (starting at 1.0) of one combination on the test windows it was picked for."""
+    params, window_ids = task
+    params = {**_WORKER["base_params"], **params}
+    close, atr, signal = strategy_signals(_WORKER["data"], params, _WORKER["cache"], _WORKER["symbol"],
+                                          _WORKER["interval"], _WORKER["dataset_key"])
+    backtester = VectorizedBacktester(initial_investment=1.0, **{name: params[name] for name in RISK_PARAMS if name in params})
+    curves = {}
+    for window in window_ids:
+        _, test_start, test_end = _WORKER["windows"][window]
+        result = backtester.run_arrays(close[test_start:test_end], atr[test_start:test_end], signal[test_start:test_end])
+        curves[window] = (result.equity, len(result))
+    return curves
+
+
+class WalkForwardResult:
+    """Per-window choices and the stitched out-of-sample equity curve of a walk-forward run."""
+
+    def __init__(self, windows, equity):
+        self.windows = windows  # DataFrame, one row per window
+        self.equity = equity  # Series indexed by open_time, test periods only
+
+    def metrics(self, interval="1m"):
+        return performance_metrics(self.equity.to_numpy(), interval)
+
+
+class WalkForwardOptimizer:
+    """
+    Walk-forward optimization over a long range: on each train window every combination is
+    backtested and the best by `rank_by` is then run on the following test window. Work is
+    spread over a process pool by combination: a task computes the combination's
+    indicators once on the whole range (shared-memory klines, per-worker IndicatorCache)
+    and slices every window out of them, so overlapping windows reuse the same arrays.
+    Test equity curves are chained, each window starting with the previous one's final
+    equity (a position still open at a window end is valued at its last close).
+    """
+
+    def __init__(self, data, train=3, test=1, anchored=False, initial_investment=100, fees=0.1, workers=None,
+                 rank_by="ROI (%)", min_trades=1, symbol=None, interval="1m", cache_bytes=256 * 1024 * 1024,
+                 cache_dir=None):
+        self.data = data.reset_index(drop=True)
+        self.windows = walk_forward_windows(self.data['open_time'], train, test, anchored)
+        self.initial_investment = initial_investment
+        self.base_params = {"fees": fees}
+        self.workers = workers or os.cpu_count() or 1
+        self.rank_by = rank_by
+        self.min_trades = min_trades  # Combinations with fewer train trades are not eligible
+        self.interval = interval
+        self.cache_options = {"max_bytes": cache_bytes, "cache_dir": cache_dir, "symbol": symbol, "interval": interval}
+
+    def _select(self, combinations, scores):
+        """Index of the best combination on each train window, or None."""
+        chosen = []
+        for window in range(len(self.windows)):
+            values = np.array([
+                score[window][self.rank_by] if score[window]["Total Trades"] >= self.min_trades else np.nan
+                for score in scores
+            ], dtype=np.float64)
+            chosen.append(int(np.nanargmax(values)) if np.isfinite(values).any() else None)
+        return chosen
+
+    def run(self, combinations):
+        combinations = list(combinations)
+        if not self.windows:
+            raise ValueError("The data is too short for a single train/test window.")
+        logger.info(f"Walk-forward: {len(self.windows)} windows x {len(combinations)} combinations")
+
+        with SharedKlines(self.data) as shared, ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_walk_forward_worker,
+            initargs=(shared.spec, self.base_params, self.cache_options, self.windows),
+        ) as executor:
+            chunksize = max(1, len(combinations) // (self.workers * 4))
+            scores = list(executor.map(_train_worker, combinations, chunksize=chunksize))
+            chosen = self._select(combinations, scores)
+
+            # One task per distinct winner, covering every test window it was picked for
+            picks = {}
+            for window, index in enumerate(chosen):
+                if index is not None:
+                    picks.setdefault(index, []).append(window)
+            curves = {}
+            for result in executor.map(_test_worker, [(combinations[index], windows) for index, windows in picks.items()]):
+                curves.update(result)
+
+        open_time = self.data['open_time']
+        capital = float(self.initial_investment)
+        rows, segments = [], []
+        for window, ((train_start, test_start, test_end), index) in enumerate(zip(self.windows, chosen)):
+            equity, trades = curves.get(window, (np.ones(test_end - test_start), 0))  # No eligible combination: stay flat
+            equity = capital * equity
+            rows.append({
+                "train_start": open_time.iloc[train_start],
+                "test_start": open_time.iloc[test_start],
+                "test_end": open_time.iloc[test_end - 1],
+                "params": combinations[index] if index is not None else None,
+                f"train {self.rank_by}": scores[index][window][self.rank_by] if index is not None else np.nan,
+                "test trades": trades,
+                "test ROI (%)": (equity[-1] / capital - 1) * 100,
+            })
+            segments.append(pd.Series(equity, index=open_time.iloc[test_start:test_end].to_numpy()))
+            capital = float(equity[-1])
+
+        result = WalkForwardResult(pd.DataFrame(rows), pd.concat(segments))
+        logger.info(f"Walk-forward finished: out-of-sample ROI {(capital / self.initial_investment - 1) * 100:.2f}%")
+        return result
+
+
+# Example usage:
+if __name__ == "__main__":
+    # python -m app.strategies.optimizer klines_data/<symbol>_<interval>.csv
+    klines = pd.read_csv(sys.argv[1], parse_dates=["open_time", "close_time"])
+
+    param_grid = {
+        "rsi_length": [7, 14, 21],
+        "bollinger_length": [20, 30],
+        "bollinger_std_dev": [2, 2.5],
+        "atr_length": [14],
+        "target_profit": [1, 2, 3, 5],
+        "stoploss": [2, 5, 10, 30],
+    }
+    sweep = ParameterSweep(klines, initial_investment=100, fees=0.1)
+    print(sweep.run_all(grid(param_grid)).head(20).to_string())
+
+    # Three months of training, one month out of sample, rolled over the whole file
+    walk_forward = WalkForwardOptimizer(klines, train=3, test=1, initial_investment=100, fees=0.1)
+    result = walk_forward.run(grid(param_grid))
+    print(result.windows.to_string())
+    print(result.metrics("1m"))
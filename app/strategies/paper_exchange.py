@@ -0,0 +1,340 @@
+import time
+
+import numpy as np
+from loguru import logger
+
+from app.strategies.exceptions import InsufficientBalanceError, OrderRejectedError, StrategyError
+from app.strategies.exchange import ExchangeAdapter, Fill, round_step
+
+
+class SymbolFilters:
+    """The Binance exchangeInfo filters an order must pass (LOT_SIZE, PRICE_FILTER, NOTIONAL)."""
+
+    __slots__ = ("step_size", "min_qty", "tick_size", "min_notional")
+
+    def __init__(self, step_size=0.00001, min_qty=0.00001, tick_size=0.01, min_notional=5.0):
+        self.step_size = step_size
+        self.min_qty = min_qty
+        self.tick_size = tick_size
+        self.min_notional = min_notional
+
+    @classmethod
+    def from_exchange_info(cls, symbol_info):
+        """Builds the filters from one symbol of GET /api/v3/exchangeInfo."""
+        filters = {f["filterType"]: f for f in symbol_info["filters"]}
+        notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL") or {}
+        return cls(
+            step_size=float(filters["LOT_SIZE"]["stepSize"]),
+            min_qty=float(filters["LOT_SIZE"]["minQty"]),
+            tick_size=float(filters["PRICE_FILTER"]["tickSize"]),
+            min_notional=float(notional.get("minNotional", 0.0)),
+        )
+
+    def quantity(self, quantity):
+        return round(round_step(quantity, self.step_size), 12)
+
+    def price(self, price):
+        return round(round_step(price, self.tick_size), 12)
+
+    def check(self, symbol, quantity, price):
+        if quantity < self.min_qty:
+            raise OrderRejectedError(symbol, f"LOT_SIZE: quantity {quantity} below {self.min_qty}")
+        if quantity * price < self.min_notional:
+            raise OrderRejectedError(symbol, f"NOTIONAL: {quantity * price:.8f} below {self.min_notional}")
+
+
+class PaperOrder:
+    """A resting order of the simulator."""
+
+    __slots__ = ("order_id", "symbol", "side", "type", "quantity", "price", "stop_price", "executed_qty",
+                 "quote_qty", "status", "order_list_id", "triggered")
+
+    def __init__(self, order_id, symbol, side, type, quantity, price, stop_price=None, order_list_id=None):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.type = type  # "LIMIT", "LIMIT_MAKER" or "STOP_LOSS_LIMIT"
+        self.quantity = quantity
+        self.price = price
+        self.stop_price = stop_price
+        self.executed_qty = 0.0
+        self.quote_qty = 0.0
+        self.status = "NEW"  # NEW, PARTIALLY_FILLED, FILLED, CANCELED
+        self.order_list_id = order_list_id  # Shared by the two legs of an OCO
+        self.triggered = stop_price is None
+
+    @property
+    def remaining(self):
+        return self.quantity - self.executed_qty
+
+    def __repr__(self):
+        return f"PaperOrder({self.order_id} {self.type} {self.side} {self.quantity} {self.symbol} @ {self.price}, {self.status})"
+
+
+class PaperExchange(ExchangeAdapter):
+    """
+    Local stand-in for Binance spot driven by replayed klines or trades. Supports market,
+    limit and OCO orders with LOT_SIZE / PRICE_FILTER / NOTIONAL checks, fees taken from
+    the received asset, and locked balances for resting orders.
+    Market orders fill at the last price (plus `slippage_bps`). Resting orders are matched
+    by process_bar()/process_trade(): a limit fills when the bar trades through its price
+    (at the open if it gaps past), up to `participation` of the bar volume per bar, so large
+    orders fill partially over several bars. When both OCO legs could fill in one bar the
+    stop wins (pessimistic=True) or the limit does.
+    """
+
+    def __init__(self, balances=None, fee_rate=0.1, quote_asset="USDT", filters=None, participation=None,
+                 slippage_bps=0.0, pessimistic=True):
+        super().__init__(quote_asset)
+        self.balances = dict(balances or {quote_asset: 1000.0})
+        self.locked = {}
+        self.fee_rate = fee_rate / 100
+        self.filters = filters or {}  # symbol -> SymbolFilters, defaults apply to the others
+        self.participation = participation  # Max share of a bar's volume one order can take
+        self.slippage = slippage_bps / 10_000
+        self.pessimistic = pessimistic
+        self.open_orders = {}  # order_id -> PaperOrder
+        self.fills = []
+        self.listeners = []  # callback(fill, order) after each execution
+        self.clock = 0  # Time (ms) of the event being processed
+        self._next_id = 1
+
+    def symbol_filters(self, symbol):
+        if symbol not in self.filters:
+            self.filters[symbol] = SymbolFilters()
+        return self.filters[symbol]
+
+    def _new_id(self):
+        order_id = self._next_id
+        self._next_id += 1
+        return order_id
+
+    # Balances
+
+    def _lock(self, asset, amount):
+        if amount > self.free(asset) + 1e-9:
+            raise InsufficientBalanceError(asset, amount, self.free(asset))
+        self.balances[asset] = self.free(asset) - amount
+        self.locked[asset] = self.locked.get(asset, 0.0) + amount
+
+    def _unlock(self, asset, amount):
+        self.locked[asset] = self.locked.get(asset, 0.0) - amount
+        self.balances[asset] = self.free(asset) + amount
+
+    def _settle(self, order_id, symbol, side, quantity, price, from_locked=False):
+        """Moves balances for an execution and records the fill."""
+        base = self.base_asset(symbol)
+        quote_quantity = quantity * price
+        if side == "BUY":
+            fee, fee_asset = quantity * self.fee_rate, base
+            if from_locked:
+                self.locked[self.quote_asset] -= quote_quantity
+            else:
+                self.balances[self.quote_asset] = self.free(self.quote_asset) - quote_quantity
+            self.balances[base] = self.free(base) + quantity - fee
+        else:
+            fee, fee_asset = quote_quantity * self.fee_rate, self.quote_asset
+            if from_locked:
+                self.locked[base] -= quantity
+            else:
+                self.balances[base] = self.free(base) - quantity
+            self.balances[self.quote_asset] = self.free(self.quote_asset) + quote_quantity - fee
+        fill = Fill(order_id, symbol, side, quantity, price, quote_quantity, fee, fee_asset, self.clock / 1000)
+        self.fills.append(fill)
+        return fill
+
+    # Orders
+
+    def market_order(self, symbol, side, quantity=None, quote_amount=None):
+        """Market order sized in base `quantity` or, for buys, in `quote_amount`."""
+        price = self.prices.get(symbol)
+        if price is None:
+            raise OrderRejectedError(symbol, "no price")
+        price *= (1 + self.slippage) if side == "BUY" else (1 - self.slippage)
+        filters = self.symbol_filters(symbol)
+        if quantity is None:
+            quantity = quote_amount / price
+        quantity = filters.quantity(quantity)
+        filters.check(symbol, quantity, price)
+
+        if side == "BUY" and quantity * price > self.free(self.quote_asset) + 1e-9:
+            raise InsufficientBalanceError(self.quote_asset, quantity * price, self.free(self.quote_asset))
+        if side == "SELL" and quantity > self.free(self.base_asset(symbol)) + 1e-12:
+            raise InsufficientBalanceError(self.base_asset(symbol), quantity, self.free(self.base_asset(symbol)))
+        fill = self._settle(self._new_id(), symbol, side, quantity, price)
+        for listener in self.listeners:
+            listener(fill, None)
+        return fill
+
+    def limit_order(self, symbol, side, quantity, price, order_type="LIMIT", stop_price=None, order_list_id=None):
+        """Places a resting order, locking the balance it needs. Returns the PaperOrder."""
+        filters = self.symbol_filters(symbol)
+        quantity = filters.quantity(quantity)
+        price = filters.price(price)
+        stop_price = filters.price(stop_price) if stop_price is not None else None
+        filters.check(symbol, quantity, price)
+        if order_type == "LIMIT_MAKER" and symbol in self.prices:
+            last = self.prices[symbol]
+            if (side == "BUY" and price >= last) or (side == "SELL" and price <= last):
+                raise OrderRejectedError(symbol, "LIMIT_MAKER would immediately match")
+
+        if order_list_id is None:
+            # The legs of an OCO share the balance locked by the first one
+            if side == "BUY":
+                self._lock(self.quote_asset, quantity * price)
+            else:
+                self._lock(self.base_asset(symbol), quantity)
+        order = PaperOrder(self._new_id(), symbol, side, order_type, quantity, price, stop_price, order_list_id)
+        self.open_orders[order.order_id] = order
+        return order
+
+    def oco_sell(self, symbol, quantity, price, stop_price, stop_limit_price):
+        """
+        Sell OCO: a LIMIT_MAKER take-profit at `price` and a STOP_LOSS_LIMIT that becomes a
+        limit at `stop_limit_price` once the price trades at or below `stop_price`.
+        Returns (limit_order, stop_order); executing either cancels the other.
+        """
+        if not stop_price < self.prices.get(symbol, stop_price + 1) < price:
+            raise OrderRejectedError(symbol, "OCO prices must be stop < last price < limit")
+        quantity = self.symbol_filters(symbol).quantity(quantity)
+        self._lock(self.base_asset(symbol), quantity)
+        list_id = self._new_id()
+        try:
+            limit = self.limit_order(symbol, "SELL", quantity, price, "LIMIT_MAKER", order_list_id=list_id)
+            stop = self.limit_order(symbol, "SELL", quantity, stop_limit_price, "STOP_LOSS_LIMIT", stop_price,
+                                    order_list_id=list_id)
+        except OrderRejectedError:
+            self._unlock(self.base_asset(symbol), quantity)
+            raise
+        return limit, stop
+
+    def cancel(self, order_id):
+        order = self.open_orders.pop(order_id, None)
+        if order is None:
+            return None
+        order.status = "CANCELED"
+        if order.order_list_id is not None:
+            # Canceling an OCO leg cancels the list, both legs share one lock
+            for sibling in [o for o in self.open_orders.values() if o.order_list_id == order.order_list_id]:
+                del self.open_orders[sibling.order_id]
+                sibling.status = "CANCELED"
+        self._release(order)
+        return order
+
+    def _release(self, order):
+        if order.side == "BUY":
+            self._unlock(self.quote_asset, order.remaining * order.price)
+        else:
+            self._unlock(self.base_asset(order.symbol), order.remaining)
+
+    # Matching
+
+    def _executable(self, order, open_price, high_price, low_price):
+        """Execution price of a resting order within a bar, or None."""
+        if not order.triggered:
+            if low_price > order.stop_price:
+                return None
+            order.triggered = True
+            # Triggered stop-limit: fills if the bar still trades at the limit
+            return order.price if high_price >= order.price else None
+        if order.side == "BUY":
+            return min(order.price, open_price) if low_price <= order.price else None
+        return max(order.price, open_price) if high_price >= order.price else None
+
+    def _execute(self, order, price, volume):
+        quantity = order.remaining
+        if volume is not None:
+            quantity = min(quantity, self.symbol_filters(order.symbol).quantity(volume))
+            if quantity <= 0:
+                return None
+        if order.side == "BUY":
+            # The lock was made at the limit price, give back any price improvement
+            self._unlock(self.quote_asset, quantity * (order.price - price))
+        fill = self._settle(order.order_id, order.symbol, order.side, quantity, price, from_locked=True)
+        order.executed_qty += quantity
+        order.quote_qty += quantity * price
+        order.status = "FILLED" if order.remaining <= 1e-12 else "PARTIALLY_FILLED"
+        if order.status == "FILLED":
+            del self.open_orders[order.order_id]
+        if order.order_list_id is not None:
+            # One OCO leg executing cancels the other, its lock is the one being filled
+            for sibling in [o for o in self.open_orders.values() if o.order_list_id == order.order_list_id and o is not order]:
+                del self.open_orders[sibling.order_id]
+                sibling.status = "CANCELED"
+        for listener in self.listeners:
+            listener(fill, order)
+        return fill
+
+    def process_bar(self, symbol, open_time, open_price, high_price, low_price, close_price, volume):
+        """Matches the resting orders of `symbol` against one kline, then moves the last price to its close."""
+        self.clock = open_time
+        if self.open_orders:
+            available = volume * self.participation if self.participation else None
+            orders = [order for order in self.open_orders.values() if order.symbol == symbol]
+            if self.pessimistic:
+                # Stops first, so an OCO whose both legs are touched ends on the stop
+                orders.sort(key=lambda order: order.triggered)
+            else:
+                orders.sort(key=lambda order: not order.triggered)
+            for order in orders:
+                if order.order_id not in self.open_orders:
+                    continue  # Canceled by its OCO sibling
+                price = self._executable(order, open_price, high_price, low_price)
+                if price is None:
+                    continue
+                fill = self._execute(order, price, available)
+                if fill is not None and available is not None:
+                    available -= fill.quantity
+        self.prices[symbol] = close_price
+
+    def process_trade(self, symbol, trade_time, price, quantity):
+        """Matches the resting orders against one trade, which can fill at most its quantity."""
+        participation, self.participation = self.participation, 1.0
+        try:
+            self.process_bar(symbol, trade_time, price, price, price, price, quantity)
+        finally:
+            self.participation = participation
+
+    # ExchangeAdapter
+
+    async def market_buy(self, symbol, quote_amount):
+        return self.market_order(symbol, "BUY", quote_amount=quote_amount)
+
+    async def market_sell(self, symbol, quantity):
+        return self.market_order(symbol, "SELL", quantity=quantity)
+
+    async def replay_klines(self, symbol, data, engine=None):
+        """
+        Replays a kline DataFrame (or dict of arrays) bar by bar: resting orders are matched,
+        then `engine.on_closed_bar` decides on the closed bar. Returns the events per second.
+        """
+        open_time = np.asarray(data["open_time"])
+        if np.issubdtype(open_time.dtype, np.datetime64):
+            open_time = open_time.astype("datetime64[ms]").astype(np.int64)
+        columns = [np.asarray(data[name], dtype=np.float64).tolist()
+                   for name in ("open_price", "high_price", "low_price", "close_price", "volume")]
+        close_time = open_time
+        if "close_time" in data:
+            close_time = np.asarray(data["close_time"])
+            if np.issubdtype(close_time.dtype, np.datetime64):
+                close_time = close_time.astype("datetime64[ms]").astype(np.int64)
+        open_time, close_time = open_time.tolist(), close_time.tolist()
+
+        started = time.perf_counter()
+        for i, (open_price, high_price, low_price, close_price, volume) in enumerate(zip(*columns)):
+            self.process_bar(symbol, open_time[i], open_price, high_price, low_price, close_price, volume)
+            if engine is not None:
+                try:
+                    await engine.on_closed_bar({
+                        "open_time": open_time[i],
+                        "close_time": close_time[i],
+                        "high_price": high_price,
+                        "low_price": low_price,
+                        "close_price": close_price,
+                    })
+                except StrategyError as e:
+                    logger.warning(f"Order failed during replay at {open_time[i]}: {e}")
+        elapsed = time.perf_counter() - started
+        rate = len(open_time) / max(elapsed, 1e-9)
+        logger.info(f"Replayed {len(open_time)} {symbol} bars in {elapsed:.2f}s ({rate * 60:,.0f} events/min)")
+        return rate
@@ -0,0 +1,406 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from app.strategies.backtester import EXIT_STOP_LOSS, EXIT_TARGET_PROFIT, _first_exit
+from app.strategies.exceptions import SymbolChecking
+from app.strategies.metrics import performance_metrics
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the NumPy path below is used instead
+    njit = None
+
+ALIGNED_COLUMNS = ("open_price", "high_price", "low_price", "close_price", "volume")
+
+
+class AlignedKlines:
+    """
+    Klines of several symbols on one time axis: every column is a (symbols, bars) array,
+    NaN where a symbol has no bar (not listed yet, exchange gap); `valid` marks real bars.
+    """
+
+    def __init__(self, symbols, open_time, columns, valid):
+        self.symbols = list(symbols)
+        self.open_time = open_time  # datetime64[ns], shared by every symbol
+        self.columns = columns
+        self.valid = valid
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __len__(self):
+        return self.open_time.shape[0]
+
+    @classmethod
+    def from_frames(cls, frames):
+        """Aligns {symbol: kline DataFrame} on the union of their open_time values."""
+        symbols = list(frames)
+        times = [frames[symbol]['open_time'].to_numpy(dtype="datetime64[ns]") for symbol in symbols]
+        open_time = np.unique(np.concatenate(times)) if times else np.empty(0, dtype="datetime64[ns]")
+        shape = (len(symbols), open_time.shape[0])
+
+        columns = {column: np.full(shape, np.nan) for column in ALIGNED_COLUMNS}
+        valid = np.zeros(shape, dtype=np.bool_)
+        for row, (symbol, time) in enumerate(zip(symbols, times)):
+            index = np.searchsorted(open_time, time)
+            valid[row, index] = True
+            for column in ALIGNED_COLUMNS:
+                columns[column][row, index] = frames[symbol][column].to_numpy(dtype=np.float64)
+        return cls(symbols, open_time, columns, valid)
+
+    def frame(self, symbol):
+        """Real bars of one symbol as a kline DataFrame."""
+        row = self.symbols.index(symbol)
+        mask = self.valid[row]
+        data = {column: values[row, mask] for column, values in self.columns.items()}
+        return pd.DataFrame({'open_time': self.open_time[mask], **data})
+
+
+def load_aligned_klines(repository, symbols, interval="1m", start=None, end=None):
+    """Fetches the klines of every symbol from a KlineRepository and aligns them."""
+    for symbol in symbols:
+        SymbolChecking.check_symbol(symbol)
+    return AlignedKlines.from_frames({symbol: repository.fetch(symbol, interval, start, end) for symbol in symbols})
+
+
+def strategy_arrays(aligned, **strategy_params):
+    """
+    Runs Strategy (indicators + get_decision) on every symbol and returns its ATR and buy
+    signal as (symbols, bars) arrays on the aligned time axis.
+    """
+    from app.strategies.indicators import Strategy
+
+    atr = np.full(aligned['close_price'].shape, np.nan)
+    signal = np.zeros(aligned['close_price'].shape, dtype=np.bool_)
+    for row, symbol in enumerate(aligned.symbols):
+        strategy = Strategy(aligned.frame(symbol), symbol=symbol, **strategy_params)
+        strategy.logic_strategy()
+        data = strategy.get_decision()
+        mask = aligned.valid[row]
+        atr[row, mask] = data['ATR'].to_numpy(dtype=np.float64)
+        if 'Signal' in data.columns:
+            signal[row, mask] = (data['Signal'] == 1).to_numpy()
+    # Bars with incomplete indicators never trade, like Strategy.preprocessing() dropping them
+    signal &= np.isfinite(atr)
+    return atr, signal
+
+
+def _portfolio_loop(close, atr, signal, cap, target_profit, stoploss, fees, atr_multiplier, initial_balance,
+                    min_order, max_trades):
+    """
+    Bar loop over the (symbols, bars) arrays with the single-symbol rules of
+    _simulate_loop: on every bar the exits of all symbols are booked first, then the
+    entries, in symbol order, each taking min(cap * (cash + committed), cash).
+    """
+    n_symbols, n = close.shape
+    symbol_idx = np.empty(max_trades, dtype=np.int64)
+    entry_idx = np.empty(max_trades, dtype=np.int64)
+    exit_idx = np.empty(max_trades, dtype=np.int64)
+    exit_price = np.empty(max_trades, dtype=np.float64)
+    allocation = np.empty(max_trades, dtype=np.float64)
+    profit = np.empty(max_trades, dtype=np.float64)
+    exit_reason = np.empty(max_trades, dtype=np.int8)
+
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+
+    in_position = np.zeros(n_symbols, dtype=np.bool_)
+    buy_price = np.zeros(n_symbols)
+    invested = np.zeros(n_symbols)
+    entry = np.full(n_symbols, -1, dtype=np.int64)
+    cash = initial_balance
+    committed = 0.0
+    count = 0
+    for i in range(1, n):
+        for s in range(n_symbols):
+            if not in_position[s]:
+                continue
+            price = close[s, i]
+            stop_price = buy_price[s] * stop_factor - atr[s, i] * atr_multiplier
+            target_price = buy_price[s] * target_factor + atr[s, i] * atr_multiplier
+            reason = -1
+            booked = 0.0
+            if price <= stop_price:
+                booked = price
+                reason = EXIT_STOP_LOSS
+            elif price >= target_price:
+                booked = target_price
+                reason = EXIT_TARGET_PROFIT
+            if reason >= 0:
+                pnl = (booked - buy_price[s]) * (invested[s] / buy_price[s])
+                symbol_idx[count] = s
+                entry_idx[count] = entry[s]
+                exit_idx[count] = i
+                exit_price[count] = price
+                allocation[count] = invested[s]
+                profit[count] = pnl
+                exit_reason[count] = reason
+                count += 1
+                cash += invested[s] + pnl
+                committed -= invested[s]
+                in_position[s] = False
+
+        for s in range(n_symbols):
+            if in_position[s] or not signal[s, i]:
+                continue
+            amount = min(cap[s] * (cash + committed), cash)
+            if amount <= max(min_order, 1e-9):
+                continue
+            buy_price[s] = close[s, i]
+            invested[s] = amount
+            entry[s] = i
+            cash -= amount
+            committed += amount
+            in_position[s] = True
+
+    open_symbols = np.flatnonzero(in_position)
+    return (symbol_idx[:count], entry_idx[:count], exit_idx[:count], exit_price[:count], allocation[:count],
+            profit[:count], exit_reason[:count], cash, open_symbols, entry[open_symbols], invested[open_symbols])
+
+
+_portfolio_jit = njit(cache=True, nogil=True)(_portfolio_loop) if njit is not None else None
+
+
+def _portfolio_numpy(close, atr, signal, cap, target_profit, stoploss, fees, atr_multiplier, initial_balance,
+                     min_order, max_trades):
+    """
+    Same results as _portfolio_loop without touching every bar: entries and exits are
+    processed as events in (bar, exits first, symbol) order, each position's exit is found
+    at entry with _first_exit's vectorized scans, the next entry with searchsorted.
+    """
+    n_symbols, n = close.shape
+    stop_factor = 1.0 - stoploss / 100.0
+    target_factor = (1.0 + target_profit / 100.0) * (1.0 + fees / 100.0)
+    entries = [np.flatnonzero(signal[s]) for s in range(n_symbols)]
+
+    events = []  # (bar, 0 = exit / 1 = entry, symbol)
+
+    def schedule_entry(s, start):
+        k = np.searchsorted(entries[s], start)
+        if k < entries[s].size:
+            heapq.heappush(events, (int(entries[s][k]), 1, s))
+
+    for s in range(n_symbols):
+        schedule_entry(s, 1)
+
+    positions = {}  # symbol -> (entry, buy price, invested, booked price, reason)
+    trades = []
+    cash = initial_balance
+    committed = 0.0
+    while events:
+        i, kind, s = heapq.heappop(events)
+        if kind == 0:
+            entry, buy_price, invested, booked, reason = positions.pop(s)
+            pnl = (booked - buy_price) * (invested / buy_price)
+            trades.append((s, entry, i, close[s, i], invested, pnl, reason))
+            cash += invested + pnl
+            committed -= invested
+            # A new position may be opened on the same bar the previous one was closed
+            schedule_entry(s, i)
+            continue
+
+        amount = min(cap[s] * (cash + committed), cash)
+        if amount <= max(min_order, 1e-9):
+            schedule_entry(s, i + 1)
+            continue
+        buy_price = close[s, i]
+        exit_at, reason, booked = _first_exit(close[s], atr[s], i + 1, buy_price, stop_factor, target_factor,
+                                              atr_multiplier)
+        positions[s] = (i, buy_price, amount, booked, reason)
+        cash -= amount
+        committed += amount
+        if exit_at >= 0:
+            heapq.heappush(events, (exit_at, 0, s))
+
+    columns = list(zip(*trades)) if trades else [()] * 7
+    open_symbols = np.array(sorted(positions), dtype=np.int64)
+    return (np.asarray(columns[0], dtype=np.int64), np.asarray(columns[1], dtype=np.int64),
+            np.asarray(columns[2], dtype=np.int64), np.asarray(columns[3], dtype=np.float64),
+            np.asarray(columns[4], dtype=np.float64), np.asarray(columns[5], dtype=np.float64),
+            np.asarray(columns[6], dtype=np.int8), cash, open_symbols,
+            np.array([positions[s][0] for s in open_symbols], dtype=np.int64),
+            np.array([positions[s][2] for s in open_symbols], dtype=np.float64))
+
+
+class PortfolioResult:
+    """Trades of a PortfolioBacktester run, in exit order, with their symbol index."""
+
+    def __init__(self, symbols, symbol_idx, entry_idx, exit_idx, entry_price, exit_price, allocation, profit,
+                 exit_reason, initial_balance, cash, open_symbol, open_entry, open_allocation, close, open_time=None):
+        self.symbols = symbols
+        self.symbol_idx = symbol_idx
+        self.entry_idx = entry_idx
+        self.exit_idx = exit_idx
+        self.entry_price = entry_price
+        self.exit_price = exit_price
+        self.allocation = allocation  # Quote amount put in the position
+        self.profit = profit
+        self.exit_reason = exit_reason
+        self.initial_balance = initial_balance
+        self.cash = cash  # Quote balance not committed to open positions at the end
+        self.open_symbol = open_symbol
+        self.open_entry = open_entry
+        self.open_allocation = open_allocation
+        self.close = close
+        self.open_time = open_time
+        self._equity = None
+
+    def __len__(self):
+        return self.entry_idx.shape[0]
+
+    @property
+    def final_balance(self):
+        """Cash plus the cost of the positions still open (their P/L is not booked yet)."""
+        return float(self.cash + self.open_allocation.sum())
+
+    def _holdings(self):
+        """Base quantity held per (symbol, bar), from each entry bar up to its exit bar."""
+        n_symbols, n = self.close.shape
+        symbols = np.concatenate((self.symbol_idx, self.open_symbol))
+        entries = np.concatenate((self.entry_idx, self.open_entry))
+        exits = np.concatenate((self.exit_idx, np.full(self.open_entry.shape[0], n)))
+        invested = np.concatenate((self.allocation, self.open_allocation))
+        units = invested / self.close[symbols, entries]
+
+        # Rows laid end to end: alternating empty / held segments along the flattened axis
+        starts = symbols * n + entries
+        order = np.argsort(starts)
+        bounds = np.empty(2 * starts.shape[0] + 2, dtype=np.int64)
+        bounds[0] = 0
+        bounds[1:-1:2] = starts[order]
+        bounds[2:-1:2] = (symbols * n + exits)[order]
+        bounds[-1] = n_symbols * n
+        values = np.zeros(2 * starts.shape[0] + 1)
+        values[1::2] = units[order]
+        return np.repeat(values, np.diff(bounds)).reshape(n_symbols, n)
+
+    @property
+    def equity(self):
+        """Cash plus every open position marked at its last close, on every bar."""
+        if self._equity is None:
+            n = self.close.shape[1]
+            cash_steps = np.zeros(n + 1)
+            np.add.at(cash_steps, self.entry_idx, -self.allocation)
+            np.add.at(cash_steps, self.exit_idx, self.allocation + self.profit)
+            np.add.at(cash_steps, self.open_entry, -self.open_allocation)
+            cash = self.initial_balance + np.cumsum(cash_steps[:n])
+            # Missing bars keep the previous close, bars before a listing hold nothing
+            holdings = self._holdings()
+            prices = self.close
+            valid = np.isfinite(prices)
+            if not valid.all():
+                last_bar = np.maximum.accumulate(np.where(valid, np.arange(n), 0), axis=1)
+                prices = np.take_along_axis(prices, last_bar, axis=1)
+                prices = np.where(holdings > 0, prices, 0.0)
+            self._equity = cash + np.einsum("sb,sb->b", holdings, prices)
+        return self._equity
+
+    def metrics(self, interval="1m"):
+        """app.strategies.metrics.performance_metrics of the combined equity curve."""
+        bars_in_market = int(np.count_nonzero(self._holdings().any(axis=0)))
+        return performance_metrics(self.equity, interval, self.profit, self.allocation, bars_in_market)
+
+    def per_symbol(self):
+        """Trades, wins and net profit per symbol."""
+        counts = np.bincount(self.symbol_idx, minlength=len(self.symbols))
+        wins = np.bincount(self.symbol_idx, weights=self.profit > 0, minlength=len(self.symbols))
+        profit = np.bincount(self.symbol_idx, weights=self.profit, minlength=len(self.symbols))
+        return pd.DataFrame({'Total Trades': counts, 'Wins': wins.astype(np.int64), 'Net Profit ($)': profit},
+                            index=pd.Index(self.symbols, name='Symbol'))
+
+    def to_trade_cycles(self):
+        """Trades in the TradingSystem.trade_cycles layout, with a 'Symbol' key."""
+        buy_dates = self.open_time[self.entry_idx] if self.open_time is not None else self.entry_idx
+        sell_dates = self.open_time[self.exit_idx] if self.open_time is not None else self.exit_idx
+        return [
+            {
+                'Symbol': self.symbols[self.symbol_idx[k]],
+                'Buy Date': buy_dates[k],
+                'Buy Price': float(self.entry_price[k]),
+                'Buy Dollar': float(self.allocation[k]),
+                'Sell Date': sell_dates[k],
+                'Sell Price': float(self.exit_price[k]),
+                'Sell dollar': float(self.allocation[k] + self.profit[k]),
+                'Profit/Loss': float(self.profit[k]),
+            }
+            for k in range(len(self))
+        ]
+
+
+class PortfolioBacktester:
+    """
+    VectorizedBacktester for several symbols sharing one quote balance. Every entry takes
+    at most `max_allocation` (fraction of cash + committed capital, per symbol: a float or
+    {symbol: fraction}) and never more than the free cash; exits follow the same
+    RiskManagement rules as the single-symbol backtester.
+    """
+
+    def __init__(self, target_profit=5, stoploss=30, fees=0.1, initial_investment=100, atr_multiplier=0.5,
+                 max_allocation=None, min_order=0.0, use_jit=True):
+        self.target_profit = target_profit
+        self.stoploss = stoploss
+        self.fees = fees
+        self.initial_investment = initial_investment
+        self.atr_multiplier = atr_multiplier
+        self.max_allocation = max_allocation  # Default: an equal 1 / N share per symbol
+        self.min_order = min_order  # Smallest order in quote asset, e.g. the exchange min notional
+        self.use_jit = use_jit and _portfolio_jit is not None
+
+    def _caps(self, symbols):
+        if self.max_allocation is None:
+            return np.full(len(symbols), 1.0 / len(symbols))
+        if isinstance(self.max_allocation, dict):
+            return np.array([self.max_allocation.get(symbol, 0.0) for symbol in symbols], dtype=np.float64)
+        return np.full(len(symbols), float(self.max_allocation))
+
+    def run_arrays(self, close, atr, signal, symbols=None, open_time=None):
+        """
+        Runs the backtest on (symbols, bars) arrays. `close` is NaN where a symbol has no
+        bar; positions are neither opened nor closed on those bars.
+        """
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        atr = np.ascontiguousarray(atr, dtype=np.float64)
+        signal = np.ascontiguousarray(signal, dtype=np.bool_) & np.isfinite(close)
+        if close.ndim != 2 or not (close.shape == atr.shape == signal.shape):
+            raise ValueError("close, atr and signal must be (symbols, bars) arrays of the same shape.")
+        symbols = list(symbols) if symbols is not None else [str(row) for row in range(close.shape[0])]
+
+        simulate = _portfolio_jit if self.use_jit else _portfolio_numpy
+        (symbol_idx, entry_idx, exit_idx, exit_price, allocation, profit, exit_reason, cash,
+         open_symbol, open_entry, open_allocation) = simulate(
+            close, atr, signal, self._caps(symbols),
+            float(self.target_profit), float(self.stoploss), float(self.fees), float(self.atr_multiplier),
+            float(self.initial_investment), float(self.min_order), int(np.count_nonzero(signal)),
+        )
+        return PortfolioResult(
+            symbols, symbol_idx, entry_idx, exit_idx, close[symbol_idx, entry_idx], exit_price, allocation, profit,
+            exit_reason, float(self.initial_investment), float(cash), open_symbol, open_entry, open_allocation,
+            close, open_time,
+        )
+
+    def run(self, aligned, atr, signal):
+        """Runs the backtest on AlignedKlines with strategy_arrays() output."""
+        result = self.run_arrays(aligned['close_price'], atr, signal, aligned.symbols, aligned.open_time)
+        logger.info(f"Portfolio backtest finished: {len(result)} trades on {len(aligned.symbols)} symbols, "
+                    f"final balance {result.final_balance:.2f}")
+        return result
+
+
+# Example usage:
+if __name__ == "__main__":
+    # python -m app.strategies.portfolio 2024-01
+    import sys
+
+    from app.data.connection import engine
+    from app.data.repository import KlineRepository, month_range
+
+    start, end = month_range(sys.argv[1] if len(sys.argv) > 1 else "2024-01")
+    symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "LTCUSDT", "XRPUSDT"]
+    aligned = load_aligned_klines(KlineRepository(engine), symbols, "1m", start, end)
+    atr, signal = strategy_arrays(aligned)
+    result = PortfolioBacktester(target_profit=2, stoploss=30, initial_investment=1000).run(aligned, atr, signal)
+    print(result.per_symbol().to_string())
+    print(result.metrics("1m"))
@@ -0,0 +1,283 @@
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from app.strategies import native_indicators as ni
+from app.strategies.backtester import VectorizedBacktester
+from app.strategies.schemas import StrategyIndicator
+
+KLINE_COLUMNS = ("open_price", "high_price", "low_price", "close_price", "volume")
+COMPARISONS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+CROSSES = ('crosses_above', 'crosses_below')
+ARITHMETIC = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide}
+
+
+def _operand_columns(operand):
+    """Column names used by an operand, validating it on the way."""
+    if isinstance(operand, str):
+        return {operand}
+    if isinstance(operand, (int, float)) and not isinstance(operand, bool):
+        return set()
+    if isinstance(operand, tuple) and operand:
+        operator, *args = operand
+        if operator == 'prev' and len(args) == 1 or operator in ARITHMETIC and len(args) == 2:
+            return set().union(*(_operand_columns(arg) for arg in args))
+    raise ValueError(f"Invalid operand: {operand!r}")
+
+
+def _uses_history(operand):
+    return isinstance(operand, tuple) and (operand[0] == 'prev' or any(_uses_history(arg) for arg in operand[1:]))
+
+
+class SignalSpec:
+    """
+    Declarative buy rule: (left, operator, right) conditions that must all hold on a bar.
+    Operands are column names, numbers, ('prev', operand) for the previous bar's value or
+    ('+' | '-' | '*' | '/', operand, operand). Operators are '<', '<=', '>', '>=',
+    'crosses_above' and 'crosses_below'.
+    """
+
+    def __init__(self, name, conditions, description=None):
+        conditions = tuple(tuple(condition) for condition in conditions)
+        if not conditions:
+            raise ValueError(f"Signal spec {name} has no conditions.")
+        columns = set()
+        for condition in conditions:
+            if len(condition) != 3 or condition[1] not in COMPARISONS and condition[1] not in CROSSES:
+                raise ValueError(f"Invalid condition in {name}: {condition!r}")
+            columns |= _operand_columns(condition[0]) | _operand_columns(condition[2])
+        self.name = name
+        self.conditions = conditions
+        self.description = description
+        self.columns = frozenset(columns)
+        # Rules that look at the previous bar can't be evaluated on a single streaming bar
+        self.uses_history = any(condition[1] in CROSSES or _uses_history(condition[0]) or _uses_history(condition[2])
+                                for condition in conditions)
+
+    def __repr__(self):
+        return f"SignalSpec({self.name!r}, {list(self.conditions)!r})"
+
+
+def _previous(values):
+    """Values shifted by one bar, NaN first (scalars are constant)."""
+    if np.ndim(values) == 0:
+        return values
+    shifted = np.empty_like(values)
+    shifted[:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+class SignalSet:
+    """
+    Specs compiled into one evaluation: every distinct operand and condition is computed
+    once even when several specs share it, then the conditions of each spec are and-ed
+    into a row of a (specs, bars) boolean array.
+    """
+
+    def __init__(self, specs):
+        self.specs = list(specs)
+        self.names = [spec.name for spec in self.specs]
+        self.columns = frozenset().union(*(spec.columns for spec in self.specs))
+        self.conditions = list(dict.fromkeys(condition for spec in self.specs for condition in spec.conditions))
+        position = {condition: row for row, condition in enumerate(self.conditions)}
+        self.rows = [[position[condition] for condition in spec.conditions] for spec in self.specs]
+
+    def evaluate(self, arrays):
+        """
+        Masks of every spec on `arrays`, a DataFrame, mapping of equal-length arrays or
+        IndicatorArrays holding the referenced columns.
+        """
+        operands = {}
+
+        def operand(term):
+            if isinstance(term, (int, float)):
+                return float(term)
+            if term not in operands:
+                if isinstance(term, str):
+                    operands[term] = np.asarray(arrays[term], dtype=np.float64)
+                elif term[0] == 'prev':
+                    operands[term] = _previous(operand(term[1]))
+                else:
+                    operands[term] = ARITHMETIC[term[0]](operand(term[1]), operand(term[2]))
+            return operands[term]
+
+        n = len(np.asarray(arrays['close_price']))
+        truth = np.empty((len(self.conditions), n), dtype=np.bool_)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for row, (left, operator, right) in enumerate(self.conditions):
+                if operator in COMPARISONS:
+                    truth[row] = COMPARISONS[operator](operand(left), operand(right))
+                    continue
+                spread = np.broadcast_to(operand(left) - operand(right), n)
+                before = _previous(spread)
+                if operator == 'crosses_above':
+                    truth[row] = (spread > 0) & (before <= 0)
+                else:
+                    truth[row] = (spread < 0) & (before >= 0)
+
+        masks = np.empty((len(self.specs), n), dtype=np.bool_)
+        for row, conditions in enumerate(self.rows):
+            np.logical_and.reduce(truth[conditions], axis=0, out=masks[row])
+        return masks
+
+
+class IndicatorArrays:
+    """
+    Indicator columns of one dataset computed on first use and shared by every spec
+    evaluated on it. Each indicator group is computed at most once; prepare() uses the
+    fused kernels when all the groups of one are needed.
+    """
+
+    def __init__(self, data, use_jit=True, **params):
+        unknown = set(params) - set(ni.DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown indicator parameters: {sorted(unknown)}")
+        self.data = data
+        self.use_jit = use_jit
+        self.params = params
+        self.arrays = {}
+        self.computed = []  # Indicator keys passed to native_indicators.compute(), in order
+
+    def _compute(self, indicator):
+        self.arrays.update(ni.compute(indicator, self.data, self.use_jit, **self.params))
+        self.computed.append(indicator)
+
+    def __getitem__(self, column):
+        if column not in self.arrays:
+            if column in KLINE_COLUMNS:
+                self.arrays[column] = np.ascontiguousarray(self.data[column], dtype=np.float64)
+            elif column in ni.COLUMN_GROUPS:
+                self._compute(ni.COLUMN_GROUPS[column])
+            else:
+                raise KeyError(f"Unknown indicator column: {column}")
+        return self.arrays[column]
+
+    def __contains__(self, column):
+        return column in self.arrays or column in KLINE_COLUMNS or column in ni.COLUMN_GROUPS
+
+    def prepare(self, columns):
+        """Computes the groups of `columns` that are still missing."""
+        groups = {ni.COLUMN_GROUPS[column] for column in columns
+                  if column in ni.COLUMN_GROUPS and column not in self.arrays}
+        for fused, parts in ni.FUSED.items():
+            if groups.issuperset(parts):
+                self._compute(fused)
+                groups.difference_update(parts)
+        for group in ni.GROUPS:
+            if group in groups:
+                self._compute(group)
+        return self
+
+
+# Buy rules of the StrategyIndicator members; exits are left to RiskManagement (ATR targets)
+SIGNAL_SPECS = {
+    StrategyIndicator.RSI: SignalSpec('RSI', [('RSI', '<', 30)], "RSI oversold"),
+    StrategyIndicator.SMA: SignalSpec('SMA', [('SMA_short', 'crosses_above', 'SMA_long')], "Golden cross"),
+    StrategyIndicator.EMA: SignalSpec('EMA', [('close_price', 'crosses_above', 'EMA')], "Close crosses above the EMA"),
+    StrategyIndicator.MACD: SignalSpec('MACD', [('MACD', 'crosses_above', 'MACD_signal')],
+                                       "MACD crosses above its signal line"),
+    StrategyIndicator.BOLLINGER_BANDS: SignalSpec('BollingerBands', [('close_price', 'crosses_above', 'lower_band')],
+                                                  "Close back above the lower band"),
+    StrategyIndicator.VOLUME: SignalSpec('Volume', [('relative_volume', '>', 2), ('close_price', '>', 'open_price')],
+                                         "Up bar on twice the average volume"),
+    StrategyIndicator.ATR: SignalSpec('ATR', [(('-', 'close_price', ('prev', 'close_price')), '>', 'ATR')],
+                                      "Close up more than one ATR"),
+    StrategyIndicator.STOCHASTIC: SignalSpec('Stochastic', [('STOCH_k', 'crosses_above', 'STOCH_d'),
+                                                            ('STOCH_k', '<', 20)],
+                                             "%K crosses above %D while oversold"),
+    StrategyIndicator.FIBONACCI: SignalSpec('Fibonacci', [('low_price', '<=', 'fib_0.618'),
+                                                          ('close_price', '>', 'fib_0.618')],
+                                            "Bounce on the 61.8% retracement"),
+    StrategyIndicator.TRENDLINE: SignalSpec('Trendline', [('trendline_slope', '>', 0),
+                                                          ('close_price', 'crosses_above', 'trendline')],
+                                            "Close crosses above a rising trendline"),
+    StrategyIndicator.RSI_MA_MACD: SignalSpec('rsi_ma_macd', [('RSI', '<', 50), ('SMA_short', '>', 'SMA_long'),
+                                                              ('MACD', 'crosses_above', 'MACD_signal')],
+                                              "MACD cross in an uptrend before RSI is stretched"),
+    StrategyIndicator.RSI_BB_VOLUME: SignalSpec('rsi_bb_volume', [('RSI', '<', 30), ('close_price', '<', 'lower_band'),
+                                                                  ('relative_volume', '>', 1.5)],
+                                                "Oversold below the lower band on high volume"),
+    StrategyIndicator.RSI_TRENDLINES_PRICEPATTERNS: SignalSpec(
+        'rsi_trendlines_pricepatterns',
+        [('RSI', '<', 70), ('trendline_slope', '>', 0), ('close_price', '>', ('prev', 'resistance'))],
+        "Breakout above resistance in an uptrend"),
+    # Strategy's historical rule
+    StrategyIndicator.RSI_BB_ATR: SignalSpec('rsi_bb_atr', [('RSI', '<', 30), ('close_price', '>', 'lower_band')],
+                                             "Oversold RSI while the close holds the lower band"),
+    StrategyIndicator.RSI_FIB_MA: SignalSpec('rsi_fib_ma', [('RSI', '<', 40), ('SMA_short', '>', 'SMA_long'),
+                                                            ('low_price', '<=', 'fib_0.618'),
+                                                            ('close_price', '>', 'fib_0.618')],
+                                             "Bounce on the 61.8% retracement in an uptrend"),
+    StrategyIndicator.RSI_STOCH_BB: SignalSpec('rsi_stoch_bb', [('RSI', '<', 35), ('STOCH_k', 'crosses_above', 'STOCH_d'),
+                                                                ('STOCH_k', '<', 30), ('close_price', '<', 'middle_band')],
+                                               "Stochastic cross while oversold in the lower half of the bands"),
+    StrategyIndicator.RSI_VOLUME_MACD: SignalSpec('rsi_volume_macd', [('RSI', '<', 50), ('relative_volume', '>', 1.5),
+                                                                      ('MACD', 'crosses_above', 'MACD_signal')],
+                                                  "MACD cross on high volume"),
+}
+
+
+def register(key, spec):
+    """Adds or replaces a spec, e.g. register('my_rsi', SignalSpec('my_rsi', [('RSI', '<', 25)]))."""
+    if not isinstance(spec, SignalSpec):
+        raise ValueError("spec must be a SignalSpec.")
+    SIGNAL_SPECS[key] = spec
+    return spec
+
+
+def get_spec(key):
+    """Spec registered under `key`: a StrategyIndicator member, its value or a custom key."""
+    if isinstance(key, SignalSpec):
+        return key
+    if key in SIGNAL_SPECS:
+        return SIGNAL_SPECS[key]
+    try:
+        return SIGNAL_SPECS[StrategyIndicator(key)]
+    except (ValueError, KeyError):
+        raise ValueError(f"No signal spec registered for {key!r}.") from None
+
+
+def rank_strategies(data, specs=None, backtester=None, interval="1m", rank_by="ROI (%)", use_jit=True, **params):
+    """
+    Backtests every spec (all registered ones by default) on the same klines and returns
+    one row of metrics per spec, best first. Indicators are computed once for all specs
+    and the signals come from a single SignalSet evaluation.
+    """
+    specs = [get_spec(spec) for spec in (SIGNAL_SPECS.values() if specs is None else specs)]
+    signals = SignalSet(specs)
+    arrays = IndicatorArrays(data, use_jit, **params).prepare(signals.columns | {'ATR'})
+    masks = signals.evaluate(arrays)
+    masks &= np.isfinite(arrays['ATR'])  # The exits need the ATR, like Strategy.preprocessing() dropping those bars
+
+    backtester = backtester or VectorizedBacktester(use_jit=use_jit)
+    prices = {}
+    if backtester.intrabar:
+        prices = {name: arrays[column] for name, column in
+                  (("high", "high_price"), ("low", "low_price"), ("open_price", "open_price"))}
+    rows = []
+    for spec, mask in zip(specs, masks):
+        result = backtester.run_arrays(arrays['close_price'], arrays['ATR'], mask, **prices)
+        rows.append({
+            "Strategy": spec.name,
+            "Signals": int(np.count_nonzero(mask)),
+            **result.metrics(interval),
+            "Final Balance": result.final_balance,
+        })
+    logger.info(f"Ranked {len(specs)} strategies with {len(arrays.computed)} indicator computations")
+    return pd.DataFrame(rows).sort_values(rank_by, ascending=False, ignore_index=True)
+
+
+# Example usage:
+if __name__ == "__main__":
+    # python -m app.strategies.registry BTCUSDT 2024-01
+    import sys
+
+    from app.data.connection import engine
+    from app.data.repository import KlineRepository, month_range
+
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "BTCUSDT"
+    start, end = month_range(sys.argv[2] if len(sys.argv) > 2 else "2024-01")
+    data = KlineRepository(engine).fetch(symbol, "1m", start, end)
+    table = rank_strategies(data, backtester=VectorizedBacktester(target_profit=2, stoploss=30, initial_investment=1000))
+    print(table[["Strategy", "Signals", "ROI (%)", "Sharpe Ratio", "Max Drawdown (%)", "Total Trades"]].to_string())
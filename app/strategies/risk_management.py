@@ -74,6 +74,16 @@ class RiskManagement:
 
         return False  # No exit condition met, hold the position
 
+    @staticmethod
+    def exit_levels(priceorder, atr, target_profit, stoploss, fees=0.1, atr_multiplier=0.5):
+        """
+        (stop-loss price, target price) of a position, the thresholds should_exit() compares
+        the current price to, without logging. Used where exits are checked on every bar.
+        """
+        stop_price = priceorder * (1 - stoploss / 100) - atr * atr_multiplier
+        target_price = priceorder * (1 + target_profit / 100) * (1 + fees / 100) + atr * atr_multiplier
+        return stop_price, target_price
+
 
 
 
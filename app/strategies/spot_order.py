@@ -0,0 +1,43 @@
+import asyncio
+
+from loguru import logger
+
+from app.strategies.exceptions import InsufficientBalanceError, OrderRejectedError
+from app.strategies.exchange import BinanceSpotExchange
+
+
+# Function to buy BTC using USDT amount
+async def buy_bitcoin_with_usdt(exchange, usdt_amount, symbol="BTCUSDT"):
+    """
+    Places a market buy of `usdt_amount` USDT worth of BTC. The balance check uses the
+    exchange's cached balances and the order is sized in quote quantity, so no balance
+    or ticker request is made per order.
+    """
+    try:
+        fill = await exchange.market_buy(symbol, usdt_amount)
+        logger.info(f"Market buy order placed for {fill.quantity} BTC using {fill.quote_quantity} USDT at a price of {fill.price} USDT/BTC")
+        return fill
+    except InsufficientBalanceError as e:
+        logger.warning(f"Not enough USDT balance. You only have {e.available} USDT, but you need {e.required} USDT.")
+    except OrderRejectedError as e:
+        logger.error(f"Binance API Exception: {e}")
+    return None
+
+
+async def main(usdt_amount):
+    # Credentials come from BINANCE_API_KEY / BINANCE_API_SECRET
+    exchange = BinanceSpotExchange()
+    await exchange.start()
+    try:
+        return await buy_bitcoin_with_usdt(exchange, usdt_amount)
+    finally:
+        await exchange.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    # python -m app.strategies.spot_order 1000
+    import sys
+
+    usdt_amount_to_invest = float(sys.argv[1]) if len(sys.argv) > 1 else 1000  # Amount of USDT to invest in Bitcoin
+    asyncio.run(main(usdt_amount_to_invest))
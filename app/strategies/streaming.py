@@ -0,0 +1,203 @@
+import math
+
+NAN = math.nan
+
+
+class WilderAverage:
+    """
+    Incremental form of pandas_ta's rma(): ewm(alpha=1/length, adjust=True, min_periods=length).
+    Keeps the weighted sum and the sum of weights so each update is O(1).
+    """
+    __slots__ = ('length', 'decay', 'numerator', 'denominator', 'count', 'value')
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.count = 0
+        self.value = NAN
+
+    def update(self, x):
+        self.numerator = x + self.decay * self.numerator
+        self.denominator = 1.0 + self.decay * self.denominator
+        self.count += 1
+        if self.count >= self.length:
+            self.value = self.numerator / self.denominator
+        return self.value
+
+
+class StreamingSMA:
+    """Simple moving average over a fixed-size window with a running sum."""
+    __slots__ = ('length', 'window', 'index', 'count', 'total', 'value')
+
+    def __init__(self, length):
+        self.length = length
+        self.window = [0.0] * length
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        self.total += x - self.window[self.index]
+        self.window[self.index] = x
+        self.index += 1
+        if self.index == self.length:
+            self.index = 0
+            # Re-sum once per lap so floating point drift never accumulates
+            self.total = math.fsum(self.window)
+        if self.count < self.length:
+            self.count += 1
+        if self.count == self.length:
+            self.value = self.total / self.length
+        return self.value
+
+
+class StreamingBollinger:
+    """Bollinger Bands (population std, as pandas_ta) with a rolling Welford mean/variance."""
+    __slots__ = ('length', 'std_dev', 'window', 'index', 'count', 'mean', 'm2', 'lower', 'middle', 'upper')
+
+    def __init__(self, length, std_dev=2):
+        self.length = length
+        self.std_dev = std_dev
+        self.window = [0.0] * length
+        self.index = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.lower = self.middle = self.upper = NAN
+
+    def update(self, x):
+        if self.count < self.length:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.window[self.index]
+            old_mean = self.mean
+            self.mean += (x - old) / self.length
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        self.window[self.index] = x
+        self.index = (self.index + 1) % self.length
+
+        if self.count == self.length:
+            std = math.sqrt(max(self.m2, 0.0) / self.length)
+            self.middle = self.mean
+            self.lower = self.mean - self.std_dev * std
+            self.upper = self.mean + self.std_dev * std
+        return self.lower, self.middle, self.upper
+
+
+class StreamingRSI:
+    """Wilder RSI, same definition as pandas_ta.rsi."""
+    __slots__ = ('previous_close', 'gains', 'losses', 'value')
+
+    def __init__(self, length=14):
+        self.previous_close = None
+        self.gains = WilderAverage(length)
+        self.losses = WilderAverage(length)
+        self.value = NAN
+
+    def update(self, close):
+        if self.previous_close is not None:
+            change = close - self.previous_close
+            gain = self.gains.update(change if change > 0 else 0.0)
+            loss = self.losses.update(-change if change < 0 else 0.0)
+            if self.gains.count >= self.gains.length:
+                total = gain + loss
+                self.value = 100.0 * gain / total if total else NAN
+        self.previous_close = close
+        return self.value
+
+
+class StreamingATR:
+    """Wilder ATR over the true range, same definition as pandas_ta.atr."""
+    __slots__ = ('previous_close', 'average', 'value')
+
+    def __init__(self, length=14):
+        self.previous_close = None
+        self.average = WilderAverage(length)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        if self.previous_close is not None:
+            true_range = max(high - low, abs(high - self.previous_close), abs(low - self.previous_close))
+            self.value = self.average.update(true_range)
+        self.previous_close = close
+        return self.value
+
+
+class StreamingADX:
+    """Wilder ADX, same definition as pandas_ta.adx (DM smoothed with rma, scaled by ATR)."""
+    __slots__ = ('length', 'atr', 'previous_high', 'previous_low', 'plus_dm', 'minus_dm', 'adx',
+                 'plus_di', 'minus_di', 'value')
+
+    def __init__(self, length=14):
+        self.length = length
+        self.atr = StreamingATR(length)
+        self.previous_high = None
+        self.previous_low = None
+        self.plus_dm = WilderAverage(length)
+        self.minus_dm = WilderAverage(length)
+        self.adx = WilderAverage(length)
+        self.plus_di = self.minus_di = NAN
+        self.value = NAN
+
+    def update(self, high, low, close):
+        atr = self.atr.update(high, low, close)
+        if self.previous_high is not None:
+            up = high - self.previous_high
+            down = self.previous_low - low
+            plus = self.plus_dm.update(up if up > down and up > 0 else 0.0)
+            minus = self.minus_dm.update(down if down > up and down > 0 else 0.0)
+            if self.plus_dm.count >= self.length and atr > 0:
+                self.plus_di = 100.0 * plus / atr
+                self.minus_di = 100.0 * minus / atr
+                total = self.plus_di + self.minus_di
+                if total:
+                    self.value = self.adx.update(100.0 * abs(self.plus_di - self.minus_di) / total)
+        self.previous_high = high
+        self.previous_low = low
+        return self.value
+
+
+class StreamingIndicators:
+    """All indicators used by Strategy, updated one closed bar at a time."""
+    __slots__ = ('rsi', 'bollinger', 'atr', 'adx', 'sma_short', 'sma_long', 'close')
+    # Keys of values()
+    COLUMNS = ('close_price', 'RSI', 'upper_band', 'middle_band', 'lower_band', 'ATR', 'ADX', 'SMA_short', 'SMA_long')
+
+    def __init__(self, rsi_length=14, bollinger_length=20, bollinger_std_dev=2, atr_length=14, adx_length=30,
+                 sma_short_length=50, sma_long_length=200):
+        self.rsi = StreamingRSI(rsi_length)
+        self.bollinger = StreamingBollinger(bollinger_length, bollinger_std_dev)
+        self.atr = StreamingATR(atr_length)
+        self.adx = StreamingADX(adx_length)
+        self.sma_short = StreamingSMA(sma_short_length)
+        self.sma_long = StreamingSMA(sma_long_length)
+        self.close = NAN
+
+    def update(self, high, low, close):
+        self.close = close
+        self.rsi.update(close)
+        self.bollinger.update(close)
+        self.atr.update(high, low, close)
+        self.adx.update(high, low, close)
+        self.sma_short.update(close)
+        self.sma_long.update(close)
+
+    def values(self):
+        """Latest values under the same names as the Strategy DataFrame columns."""
+        return {
+            'close_price': self.close,
+            'RSI': self.rsi.value,
+            'upper_band': self.bollinger.upper,
+            'middle_band': self.bollinger.middle,
+            'lower_band': self.bollinger.lower,
+            'ATR': self.atr.value,
+            'ADX': self.adx.value,
+            'SMA_short': self.sma_short.value,
+            'SMA_long': self.sma_long.value,
+        }
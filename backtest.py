@@ -1,7 +1,7 @@
 import pandas as pd
-from calendar import monthrange
-from app.data.connection import engine
-from sqlalchemy.sql import text
+from app.data.repository import KlineRepository, month_range
+from app.strategies.backtester import TIE_BREAKS
+from app.strategies.risk_management import RiskManagement
 import backtrader as bt
 
 
@@ -20,9 +20,13 @@ class TradingStrategy(bt.Strategy):
         ("stoploss", 30),
         ("fees", 0.1),
         ("initial_investment", 100),
+        ("atr_multiplier", 0.5),
+        ("tie_break", "pessimistic"),  # Bar reaching both levels: "pessimistic" (stop first) or "optimistic"
     )
 
     def __init__(self):
+        if self.params.tie_break not in TIE_BREAKS:
+            raise ValueError(f"tie_break must be one of {TIE_BREAKS}.")
         # Define indicators
         self.rsi = bt.indicators.RSI(period=self.params.rsi_length)
         self.bollinger = bt.indicators.BollingerBands(period=self.params.bollinger_length, dev=self.params.bollinger_std_dev)
@@ -41,12 +45,33 @@ class TradingStrategy(bt.Strategy):
         """Main logic for each bar"""
         # If in position, manage the trade (risk management)
         if self.in_position:
-            # Calculate profit/loss based on strategy conditions (target profit, stop-loss, ATR, ADX)
-            current_price = self.data.close[0]
-            profit_loss = (current_price - self.buy_price) / self.buy_price * 100
-
-            # Check target profit or stop-loss
-            if profit_loss >= self.params.target_profit or profit_loss <= -self.params.stoploss:
+            # Check the ATR/fee-adjusted stop-loss against the bar's low and target against its
+            # high, as VectorizedBacktester(intrabar=True): levels from the previous bar's ATR,
+            # a gap at the open decides a bar reaching both, then tie_break
+            stop_price, target_price = RiskManagement.exit_levels(
+                self.buy_price, self.atr[-1], self.params.target_profit, self.params.stoploss, self.params.fees,
+                self.params.atr_multiplier
+            )
+            stop_hit = self.data.low[0] <= stop_price
+            target_hit = self.data.high[0] >= target_price
+            if stop_hit and target_hit:
+                if self.data.open[0] <= stop_price:
+                    target_hit = False
+                elif self.data.open[0] >= target_price:
+                    stop_hit = False
+                elif self.params.tie_break == "pessimistic":
+                    target_hit = False
+                else:
+                    stop_hit = False
+            if stop_hit:
+                current_price = min(stop_price, self.data.open[0])
+            elif target_hit:
+                current_price = max(target_price, self.data.open[0])
+            else:
+                current_price = None
+
+            if current_price is not None:
+                profit_loss = (current_price - self.buy_price) / self.buy_price * 100
                 self.sell()
                 self.in_position = False
                 self.trade_cycles.append({
@@ -84,12 +109,12 @@ class TradingStrategy(bt.Strategy):
 
 
 # Create the Backtrader Engine (Cerebro)
-def run_backtest(month=None):
+def run_backtest(month=None, store=None):
     # Create an instance of Cerebro
     cerebro = bt.Cerebro()
 
     # Set up the data feed (you can replace this with real historical data from a database)
-    data = bt.feeds.PandasData(dataname=fetch_data_from_db(month))  # Fetch data function
+    data = bt.feeds.PandasData(dataname=fetch_data_from_db(month, store=store))  # Fetch data function
 
     # Add the data feed to the engine
     cerebro.adddata(data)
@@ -117,57 +142,20 @@ def run_backtest(month=None):
     print(f"Ending Portfolio Value: ${cerebro.broker.get_value()}")
 
 
-def fetch_data_from_db(month=None):
+def fetch_data_from_db(month=None, store=None, symbol="BTCUSDT", interval="1m"):
     """
     Fetch data from the database or external source for the specified month
     and return it as a pandas DataFrame.
+    When a ParquetKlineStore is given the month is read from it instead of Postgres.
     """
     if month:
         try:
-            # Parse month input (assumes 'YYYY-MM' format)
-            year, month_num = map(int, month.split("-"))
-            _, last_day = monthrange(year, month_num)
-            start_open_time = pd.Timestamp(f"{year}-{month_num:02d}-01")
-            end_close_time = pd.Timestamp(f"{year}-{month_num:02d}-{last_day} 23:59:59")
+            start_open_time, end_close_time = month_range(month)
         except ValueError:
             raise Exception("Invalid month format. Use YYYY-MM.")
 
-        base_query = """
-        SELECT open_time, close_time, open_price, high_price, low_price, close_price
-        FROM klines
-        """
-
-        filters = []
-        params = {}
-
-        # Add filters only if they are provided
-        if start_open_time:
-            filters.append("open_time >= :start_open_time")
-            params["start_open_time"] = start_open_time
-        if end_close_time:
-            filters.append("close_time <= :end_close_time")
-            params["end_close_time"] = end_close_time
-
-        # Add WHERE clause dynamically
-        if filters:
-            base_query += " WHERE " + " AND ".join(filters)
-        
-        # Add ordering
-        base_query += " ORDER BY open_time ASC"
-
-        # Fetch data
-        with engine.connect() as connection:
-            df = pd.read_sql_query(
-                text(base_query),
-                con=connection,
-                params=params,
-            )
-
-        # Convert 'open_time' and 'close_time' to datetime
-        df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')  # Adjust 'unit' as per database format
-        df['close_time'] = pd.to_datetime(df['close_time'], unit='ms')  # If applicable
-
-        return df
+        repository = KlineRepository(store=store) if store is not None else KlineRepository()
+        return repository.fetch(symbol, interval, start_open_time, end_close_time)
 
 
 
@@ -14,7 +14,11 @@ from calendar import monthrange
 from fastapi import HTTPException
 import numpy as np
 from app.strategies.indicators import Strategy
-from app.strategies.risk_management import RiskManagement
+from app.strategies.backtester import VectorizedBacktester
+from app.data.bulk import KlineBulkLoader
+from app.data.repository import KlineRepository, month_range
+from app.data.journal import record_trade_cycles
+from app.data.schemas import KlineIntervals
 # Fetch and Save to the csv .
 """"
 # Convert start_time and end_time from datetime to milliseconds
@@ -93,46 +97,17 @@ print(f"Merged CSV saved to {output_file} in order.")
 """
 
 """
-# Reads the CSV file and saves each row to the Kline table in the database.
-db_manager = Database()
-
-def save_csv_to_db(csv_file: str, db: Session):
-
-    # Step 1: Read the CSV file into a pandas DataFrame
-    df = pd.read_csv(csv_file)
-
-    # Step 2: Iterate through each row and save it into the database
-    for _, row in df.iterrows():
-        # Create each Kline object and insert it into the database
-        db_manager.create(
-            db,
-            Kline,
-            open_time=row["open_time"],
-            close_time=row["close_time"],
-            open_price=row["open_price"],
-            high_price=row["high_price"],
-            low_price=row["low_price"],
-            close_price=row["close_price"],
-            volume=row["volume"],
-        )
-
-    # Step 3: Commit the transaction to save the data
-    db.commit()
-
-    # Step 4: Success message
-    print(f"Successfully saved data from {csv_file} to the database!")
-
-# Get a session directly using get_db()
-db = get_db()
+# Reads the CSV file and saves it to the Kline table in the database with COPY batches.
+def save_csv_to_db(csv_file: str):
+    loader = KlineBulkLoader(engine)
+    rows = loader.load_csv(csv_file, symbol="BTCUSDT", interval="1m")
+    print(f"Successfully saved {rows} rows from {csv_file} to the database!")
 
 # CSV file to save
 csv_file = 'app/klines_data/10-months-btc-kliens.csv'
 
 # Save the CSV data to the database
-save_csv_to_db(csv_file, db)
-
-# Close the session after operations
-db.close()
+save_csv_to_db(csv_file)
 
 
 """
@@ -153,57 +128,42 @@ class TradingSystem:
         self.fees = kwargs.get('fees', 0.1)
         self.current_balance = kwargs.get('initial_investment', 100)  # Set the initial balance
         self.initial_investment = self.current_balance  # Store initial investment for ROI calculation
-        self.trade_cycles = []
+        self.trade_cycles = []  # Every run's cycles, for save_trade_cycles()
+        self.result = None  # BacktestResult of the last run
         self.in_position = False
         self.buy_price = 0
         self.buy_date = None
+        self.symbol = kwargs.get('symbol', 'BTCUSDT')
+        self.interval = kwargs.get('interval', '1m')
+        # Optional ParquetKlineStore, read instead of Postgres when given
+        self.store = kwargs.get('store')
+        # Check stop-loss/target against each bar's low/high instead of the close
+        self.intrabar = kwargs.get('intrabar', False)
+        self.tie_break = kwargs.get('tie_break', 'pessimistic')  # When a bar reaches both levels
 
     def fetch_data_from_db(self):
         if self.month:
             try:
                 # Parse month input
-                year, month_num = map(int, self.month.split("-"))
-                _, last_day = monthrange(year, month_num)
-                start_open_time = pd.Timestamp(f"{year}-{month_num:02d}-01")
-                end_close_time = pd.Timestamp(f"{year}-{month_num:02d}-{last_day} 23:59:59")
+                start_open_time, end_close_time = month_range(self.month)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.")
 
             try:
-                # Initialize the base query
-                base_query = """
-                SELECT open_time, close_time, open_price, high_price, low_price, close_price
-                FROM klines
-                """
-                filters = []
-                params = {}
-
-                # Add filters for start and end times
-                if start_open_time:
-                    filters.append("open_time >= :start_open_time")
-                    params["start_open_time"] = start_open_time
-                if end_close_time:
-                    filters.append("close_time <= :end_close_time")
-                    params["end_close_time"] = end_close_time
-
-                # Add WHERE clause dynamically if filters exist
-                if filters:
-                    base_query += " WHERE " + " AND ".join(filters)
-
-                # Add ordering
-                base_query += " ORDER BY open_time ASC"
-
-                # Fetch data
-                with engine.connect() as connection:
-                    df = pd.read_sql_query(
-                        text(base_query),
-                        con=connection,
-                        params=params,
-                    )
-                return df
+                return self._repository().fetch(self.symbol, self.interval, start_open_time, end_close_time)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    def _repository(self):
+        return KlineRepository(store=self.store) if self.store is not None else KlineRepository(engine)
+
+    def fetch_sub_bars(self):
+        """1m klines of the month, to settle intrabar exits on coarser intervals."""
+        if not self.intrabar or self.interval == '1m':
+            return None
+        start_open_time, end_close_time = month_range(self.month)
+        return self._repository().fetch(self.symbol, '1m', start_open_time, end_close_time)
+
 
 
     def run_trading_cycle(self):
@@ -214,142 +174,66 @@ class TradingSystem:
             return
 
         # Calculate strategy indicators (RSI, Bollinger Bands)
-        self.strategy = Strategy(data)
+        self.strategy = Strategy(
+            data,
+            rsi_length=self.rsi_length,
+            bollinger_length=self.bollinger_length,
+            bollinger_std_dev=self.bollinger_std_dev,
+            atr_length=self.atr_length,
+            adx_length=self.adx_length,
+            sma_short_length=self.sma_short_length,
+            sma_long_length=self.sma_long_length,
+        )
         data = self.strategy.logic_strategy()  # Add logic to calculate strategy indicators
         logger.info("Indicators calculated successfully")
 
         # Preprocess data to remove NaN values after applying indicators
         self.strategy.preprocessing()
 
-        # Loop through the data for buy/sell signals
-        for i in range(1, len(self.strategy.data)):
-            current_row = self.strategy.data.iloc[i]
-
-            # If in position, check if we should sell based on both static and dynamic profit
-            if self.in_position:
-                risk_management = RiskManagement(
-                    priceorder=self.buy_price,
-                    currentprice=current_row['close_price'],
-                    target_profit=self.target_profit,
-                    stoploss=self.stoploss,
-                    dollar_investment=self.current_balance,
-                    atr=current_row['ATR'],
-                    fees=self.fees
-                )
-
-                # Check static profit and dynamic profit conditions
-                # Check if we should exit
-                if risk_management.should_exit():
-                    if risk_management.stop_loss_exit():
-                        logger.info("Exited position based on stop loss.")
-                        dollar_profit = risk_management.profit_or_loss
-                    elif risk_management.target_profit_exit():
-                        dollar_profit = risk_management.profit_or_loss
-                        logger.info("Exited position based on profit target.")
-                    logger.info(
-                        f"Sell at {current_row['close_price']} on {current_row['close_time']}, with the amount of : {dollar_profit:.2f}%"
-                    )
-
-                    # Record the trade cycle
-                    self.trade_cycles.append({
-                        'Buy Date': self.buy_date,
-                        'Buy Price': self.buy_price,
-                        'Buy Dollar': self.current_balance,
-                        'Sell Date': current_row['close_time'],
-                        'Sell Price': current_row['close_price'],
-                        'Sell dollar': self.current_balance + dollar_profit,  # Account for fees
-                        'Profit/Loss': dollar_profit,
-                    })
-                    self.current_balance += dollar_profit
-
-                    self.in_position = False  # Exit position
-                else:
-                    logger.info("No Exited position.")
-
-            # If not in position, check for buy signal using strategy
-            if not self.in_position:
-                self.strategy.data.loc[:, 'Signal'] = self.strategy.get_decision()  # Get buy signal
-                
-                if self.strategy.data['Signal'].iloc[i]:  # Buy condition detected
-                    logger.info(f"Buy at {current_row['close_price']} on {current_row.name}")
-                    self.buy_price = current_row['close_price']
-                    self.buy_date = current_row['open_time']
-                    self.in_position = True  # Enter position
+        # Buy signals for every bar at once
+        self.strategy.get_decision()
+
+        # Run entries, stop-loss/target exits and balance updates in one pass over the arrays
+        backtester = VectorizedBacktester(
+            target_profit=self.target_profit,
+            stoploss=self.stoploss,
+            fees=self.fees,
+            initial_investment=self.current_balance,
+            intrabar=self.intrabar,
+            tie_break=self.tie_break,
+        )
+        result = backtester.run(self.strategy.data, sub_data=self.fetch_sub_bars())
+
+        self.result = result
+        self.trade_cycles.extend(result.to_trade_cycles())
+        self.current_balance = result.final_balance
+        self.in_position = result.in_position
+        if result.in_position:
+            self.buy_price = self.strategy.data['close_price'].iloc[result.open_entry]
+            self.buy_date = self.strategy.data['open_time'].iloc[result.open_entry]
+
+    def save_trade_cycles(self, strategy_id=None):
+        """Journals the completed cycles in the cycles table (one transaction)."""
+        return record_trade_cycles(engine, self.trade_cycles, self.symbol, strategy_id)
 
     def calculate_metrics(self):
-        """Calculate the requested performance and risk metrics."""
-        if not self.trade_cycles:
+        """Performance and risk metrics of the last run, from its equity curve and trade arrays."""
+        if self.result is None or not len(self.result):
             logger.error("No trades to analyze.")
             return {}
 
-        trade_df = pd.DataFrame(self.trade_cycles)
+        # Sharpe/Sortino on bar returns annualized for self.interval, drawdown, Calmar, profit factor, ...
+        metrics = self.result.metrics(self.interval)
 
-        # Calculate profits and losses
-        trade_df['Profit (%)'] = (
-            (trade_df['Sell dollar'] - trade_df['Buy Dollar']) / trade_df['Buy Dollar'] * 100
-        )
-        trade_df['Cycle Time'] = (
-            pd.to_datetime(trade_df['Sell Date']) - pd.to_datetime(trade_df['Buy Date'])
-        ).dt.total_seconds() / 60
-
-        # Sharpe Ratio
-        daily_returns = trade_df['Profit (%)'] / 100
-        sharpe_ratio = daily_returns.mean() / daily_returns.std() * np.sqrt(252) if daily_returns.std() != 0 else np.nan
-
-        # Volatility
-        volatility = daily_returns.std()
-
-        # Correlation and Covariance (dummy example with self.data as a DataFrame)
-        if hasattr(self, 'strategy') and hasattr(self.strategy, 'data'):
-            price_data = self.strategy.data[['close_price']]
-            correlation = price_data.corr().iloc[0, 0] if not price_data.empty else np.nan
-            covariance = price_data.cov().iloc[0, 0] if not price_data.empty else np.nan
-        else:
-            correlation = covariance = np.nan
-
-        # Total Trades, Win Rate, Loss Rate
-        total_trades = len(trade_df)
-        wins = trade_df[trade_df['Profit (%)'] > 0]
-        losses = trade_df[trade_df['Profit (%)'] <= 0]
-        win_rate = len(wins) / total_trades * 100 if total_trades > 0 else 0
-        loss_rate = len(losses) / total_trades * 100 if total_trades > 0 else 0
-
-        # Average Profit, Average Loss
-        avg_profit = wins['Profit (%)'].mean() if not wins.empty else 0
-        avg_loss = losses['Profit (%)'].mean() if not losses.empty else 0
-
-        # ROI, Net Profit
-        roi = (self.current_balance - self.initial_investment) / self.initial_investment * 100
-        net_profit = self.current_balance - self.initial_investment
-
-        # Variance and Standard Deviation
-        variance = daily_returns.var()
-        std_deviation = daily_returns.std()
-
-        # Average Time per Cycle
-        avg_time_per_cycle = trade_df['Cycle Time'].mean() if not trade_df['Cycle Time'].empty else 0
-
-        # Metrics Dictionary
-        metrics = {
-            'Sharpe Ratio': sharpe_ratio,
-            'Volatility': volatility,
-            'Correlation': correlation,
-            'Covariance': covariance,
-            'Total Trades': total_trades,
-            'Win Rate (%)': win_rate,
-            'Loss Rate (%)': loss_rate,
-            'Average Profit (%)': avg_profit,
-            'Average Loss (%)': avg_loss,
-            'ROI (%)': roi,
-            'Net Profit ($)': net_profit,
-            'Variance': variance,
-            'Standard Deviation': std_deviation,
-            'Average Time per Cycle (minutes)': avg_time_per_cycle,
-        }
-
-        # Include profitable and loss trades for detailed display
-        metrics['Profitable Trades'] = wins.to_dict(orient='records')
-        metrics['Loss Trades'] = losses.to_dict(orient='records')
+        # Bought at the entry bar close, sold at the exit bar close
+        bars_per_cycle = self.result.exit_idx - self.result.entry_idx
+        interval_minutes = KlineIntervals.to_milliseconds(self.interval) / 60_000
+        metrics['Average Time per Cycle (minutes)'] = float(bars_per_cycle.mean() * interval_minutes)
+
+        # Include profitable and loss trades for detailed display (same run as the metrics)
+        cycles = self.result.to_trade_cycles()
+        metrics['Profitable Trades'] = [cycle for cycle in cycles if cycle['Profit/Loss'] > 0]
+        metrics['Loss Trades'] = [cycle for cycle in cycles if cycle['Profit/Loss'] <= 0]
         metrics['Current Balance'] = self.current_balance
 
         return metrics
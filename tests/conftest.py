@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The module-level engine of app.data.connection is built on import; tests that touch the
+# database create their own engines, so don't require a Postgres driver for it
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def random_walk_klines(n=3000, seed=7, start=1_700_000_000_000, interval_ms=60_000):
+    """Kline frame with the repository's columns on a seeded random walk."""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_price = np.concatenate(([close[0]], close[:-1]))
+    open_time = start + np.arange(n, dtype=np.int64) * interval_ms
+    return pd.DataFrame({
+        'open_time': open_time,
+        'open_price': open_price,
+        'high_price': np.maximum(open_price, close) * (1 + rng.uniform(0, 0.002, n)),
+        'low_price': np.minimum(open_price, close) * (1 - rng.uniform(0, 0.002, n)),
+        'close_price': close,
+        'volume': rng.lognormal(0, 1, n),
+        'close_time': open_time + interval_ms - 1,
+    })
+
+
+@pytest.fixture
+def klines():
+    return random_walk_klines()
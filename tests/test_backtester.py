@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from app.strategies import backtester as bt
+from app.strategies import native_indicators as ni
+from app.strategies.backtester import EXIT_STOP_LOSS, EXIT_TARGET_PROFIT, VectorizedBacktester
+
+from tests.conftest import random_walk_klines
+
+USE_JIT = [
+    pytest.param(True, id="jit", marks=pytest.mark.skipif(bt.njit is None, reason="numba is not installed")),
+    pytest.param(False, id="numpy"),
+]
+
+# 10% stop and target around an entry at 100, no fees, one ATR of adjustment
+RISK = dict(target_profit=10, stoploss=10, fees=0, initial_investment=100, atr_multiplier=1)
+
+
+@pytest.fixture(scope="module")
+def market():
+    klines = random_walk_klines(n=20_000, seed=11)
+    high, low, close = (klines[name].to_numpy() for name in ("high_price", "low_price", "close_price"))
+    signal = np.random.default_rng(3).random(len(klines)) < 0.02
+    return {
+        "close": close,
+        "high": high,
+        "low": low,
+        "open_price": klines["open_price"].to_numpy(),
+        "atr": ni.atr(high, low, close, 14),
+        "signal": signal,
+    }
+
+
+def assert_same_trades(a, b):
+    for name in ("entry_idx", "exit_idx", "exit_reason"):
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+    for name in ("exit_price", "balance_before", "profit"):
+        np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-12)
+    assert a.final_balance == pytest.approx(b.final_balance, rel=1e-12)
+    assert a.open_entry == b.open_entry
+
+
+def one_trade(use_jit, open_price, high, low, atr=(1.0, 1.0, 1.0), tie_break="pessimistic", sub_bars=None):
+    """Entry on bar 1 at 100, bar 2 given by the arguments; returns (exit bar, reason, price)."""
+    backtester = VectorizedBacktester(**RISK, use_jit=use_jit, intrabar=True, tie_break=tie_break)
+    result = backtester.run_arrays(
+        close=[100.0, 100.0, 100.0], atr=list(atr), signal=[False, True, False],
+        high=[100.0, 100.0, high], low=[100.0, 100.0, low], open_price=[100.0, 100.0, open_price],
+        sub_bars=sub_bars,
+    )
+    assert len(result) == 1
+    return int(result.exit_idx[0]), int(result.exit_reason[0]), round(float(result.exit_price[0]), 9)
+
+
+@pytest.mark.skipif(bt.njit is None, reason="numba is not installed")
+@pytest.mark.parametrize("tie_break", bt.TIE_BREAKS)
+@pytest.mark.parametrize("gaps", [True, False], ids=["open", "no-open"])
+def test_intrabar_jit_and_numpy_give_the_same_trades(market, tie_break, gaps):
+    arrays = dict(market) if gaps else {k: v for k, v in market.items() if k != "open_price"}
+    runs = [
+        VectorizedBacktester(target_profit=0.2, stoploss=0.2, use_jit=use_jit, intrabar=True,
+                             tie_break=tie_break).run_arrays(**arrays)
+        for use_jit in (True, False)
+    ]
+    assert len(runs[0]) > 100
+    assert_same_trades(*runs)
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_intrabar_levels_use_the_atr_known_at_the_open(use_jit):
+    # Bar 2's own range lifts its ATR to 20, which would move the stop to 70 and miss the low
+    assert one_trade(use_jit, open_price=99.0, high=101.0, low=88.0, atr=(1.0, 1.0, 20.0)) == (2, EXIT_STOP_LOSS, 89.0)
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+@pytest.mark.parametrize("open_price, expected", [
+    (85.0, (2, EXIT_STOP_LOSS, 85.0)),  # Gapped through the stop: filled at the open
+    (115.0, (2, EXIT_TARGET_PROFIT, 115.0)),  # Gapped through the target
+])
+def test_gaps_decide_bars_reaching_both_levels(use_jit, open_price, expected):
+    assert one_trade(use_jit, open_price, high=120.0, low=80.0) == expected
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+@pytest.mark.parametrize("tie_break, expected", [
+    ("pessimistic", (2, EXIT_STOP_LOSS, 89.0)),
+    ("optimistic", (2, EXIT_TARGET_PROFIT, 111.0)),
+])
+def test_tie_break_settles_bars_reaching_both_levels(use_jit, tie_break, expected):
+    assert one_trade(use_jit, 100.0, high=120.0, low=80.0, tie_break=tie_break) == expected
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_sub_bars_settle_a_tie(use_jit):
+    # The first 1m bar of bar 2 reaches the target only, the second one the stop
+    sub_bars = ([0, 0, 0], [0, 0, 2], [112.0, 100.0], [99.0, 80.0])
+    assert one_trade(use_jit, 100.0, high=120.0, low=80.0, sub_bars=sub_bars) == (2, EXIT_TARGET_PROFIT, 111.0)
+
+
+@pytest.mark.skipif(bt.njit is None, reason="numba is not installed")
+def test_close_only_jit_and_numpy_give_the_same_trades(market):
+    arrays = {name: market[name] for name in ("close", "atr", "signal")}
+    runs = [VectorizedBacktester(target_profit=0.2, stoploss=0.2, use_jit=use_jit).run_arrays(**arrays)
+            for use_jit in (True, False)]
+    assert len(runs[0]) > 100
+    assert_same_trades(*runs)
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_close_only_exits_and_reentry_on_the_exit_bar(use_jit):
+    # Entry at 100 (bar 1): the close of bar 3 crosses the target (booked at 111), bar 3 signals again
+    # at 115 and bar 5 closes under that trade's stop (103.5 - 1); bar 6 opens a trade left open
+    close = [100.0, 100.0, 105.0, 115.0, 110.0, 102.0, 100.0, 101.0]
+    signal = [False, True, False, True, False, False, True, False]
+    result = VectorizedBacktester(**RISK, use_jit=use_jit).run_arrays(close, np.ones(8), signal)
+
+    np.testing.assert_array_equal(result.entry_idx, [1, 3])
+    np.testing.assert_array_equal(result.exit_idx, [3, 5])
+    np.testing.assert_array_equal(result.exit_reason, [EXIT_TARGET_PROFIT, EXIT_STOP_LOSS])
+    np.testing.assert_allclose(result.exit_price, [115.0, 102.0])
+    np.testing.assert_allclose(result.profit, [11.0, 111.0 * (102 / 115 - 1)])
+    assert result.open_entry == 6
+    assert result.final_balance == pytest.approx(111.0 * 102 / 115)
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.data.broadcast import CandleBroadcaster
+from app.data.live import KlineRingBuffer
+from app.strategies.indicators import Strategy
+
+from tests.conftest import random_walk_klines
+
+MINUTE = 60_000
+
+
+def write(buffer, bar, closed=True):
+    buffer.update(int(bar.open_time), int(bar.close_time), bar.open_price, bar.high_price, bar.low_price,
+                  bar.close_price, bar.volume, closed)
+
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(json.loads(queue.get_nowait()))
+    return messages
+
+
+def test_each_update_is_fanned_out_to_the_viewers_of_its_symbol():
+    broadcaster = CandleBroadcaster(queue_size=2)
+    bars = random_walk_klines(n=5, start=0)
+    buffer = KlineRingBuffer(capacity=10)
+    first, second, other = broadcaster.connect("BTCUSDT"), broadcaster.connect("BTCUSDT"), broadcaster.connect("ETHUSDT")
+    assert broadcaster.viewers("BTCUSDT") == 2 and broadcaster.viewers() == 3
+
+    bar = next(bars.itertuples())
+    write(buffer, bar, closed=False)
+    broadcaster.on_bar("BTCUSDT", buffer, False)
+    assert first.get_nowait() is second.get_nowait()  # Serialized once for every viewer
+    assert other.empty()
+
+    write(buffer, bar)
+    broadcaster.on_bar("BTCUSDT", buffer, True)
+    late = broadcaster.connect("BTCUSDT")
+    [message] = drain(late)  # New viewers start from the latest update
+    assert message == {"symbol": "BTCUSDT", "candle": {
+        "open_time": int(bar.open_time), "open_price": bar.open_price, "high_price": bar.high_price,
+        "low_price": bar.low_price, "close_price": bar.close_price, "volume": bar.volume, "closed": True}}
+
+    broadcaster.disconnect("BTCUSDT", second)
+    for bar in bars.iloc[1:].itertuples():
+        write(buffer, bar)
+        broadcaster.on_bar("BTCUSDT", buffer, True)
+    # A full queue drops its oldest updates, a disconnected one gets nothing more
+    assert [message["candle"]["open_time"] for message in drain(first)] == [3 * MINUTE, 4 * MINUTE]
+    assert [message["candle"]["open_time"] for message in drain(second)] == [0]
+    assert broadcaster.viewers("BTCUSDT") == 2
+
+
+def test_closed_bars_carry_the_streaming_indicators_and_signal():
+    broadcaster = CandleBroadcaster(strategy_factory=lambda symbol: Strategy(None, symbol=symbol, interval="1m"))
+    bars = random_walk_klines(n=300, seed=5)
+    buffer = KlineRingBuffer(capacity=500)
+    queue = broadcaster.connect("BTCUSDT")
+    for bar in bars.iloc[:250].itertuples():
+        write(buffer, bar)  # History backfilled before the broadcaster sees a bar
+    broadcaster.on_bar("BTCUSDT", buffer, True)
+
+    reference = Strategy(None, symbol="BTCUSDT", interval="1m")
+    reference.warm_up(bars.iloc[:249])
+    signals = [reference.update(bars.iloc[249])]
+    for bar in bars.iloc[250:].itertuples():
+        write(buffer, bar, closed=False)
+        broadcaster.on_bar("BTCUSDT", buffer, False)  # Bars in progress don't move the indicators
+        write(buffer, bar)
+        broadcaster.on_bar("BTCUSDT", buffer, True)
+        signals.append(reference.update(bars.loc[bar.Index]))
+
+    messages = drain(queue)
+    assert len(messages) == 1 + 2 * 50
+    closed = [message for message in messages if message["candle"]["closed"]]
+    assert [message["signal"] for message in closed] == signals
+    expected = {name: value for name, value in reference.stream.values().items() if name != "close_price"}
+    assert closed[-1]["indicators"] == pytest.approx(expected)
+    assert list(broadcaster.strategies) == ["BTCUSDT"]
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from app.data.bulk import KlineBulkLoader
+from app.data.model import Kline
+
+from tests.conftest import random_walk_klines
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Kline.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def bars():
+    bars = random_walk_klines(n=10, start=1_700_006_400_000)
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    bars["number_of_trades"] = 3  # Not a klines column, dropped by the loader
+    return bars
+
+
+def stored(engine):
+    with engine.connect() as connection:
+        return pd.read_sql_query(select(Kline).order_by(Kline.interval, Kline.open_time), connection)
+
+
+def test_batches_are_loaded_and_duplicates_skipped(engine, bars):
+    loader = KlineBulkLoader(engine, batch_size=3)
+    assert loader.load_dataframe(bars, symbol="BTCUSDT", interval="1m") == 10
+
+    changed = bars.copy()
+    changed["close_price"] = 1.0
+    assert loader.load_dataframe(changed, symbol="BTCUSDT", interval="1m") == 10  # Sent, not inserted
+
+    rows = stored(engine)
+    assert len(rows) == 10
+    assert (rows["symbol"] == "BTCUSDT").all() and (rows["interval"] == "1m").all()
+    assert rows["close_price"].tolist() == pytest.approx(bars["close_price"].tolist())
+
+
+def test_upsert_overwrites_the_candles_in_progress(engine, bars):
+    loader = KlineBulkLoader(engine, upsert=True, batch_size=4)
+    loader.write(bars.iloc[:6], "BTCUSDT", "1m")
+
+    # The last bar grew, and new ones closed meanwhile
+    update = bars.iloc[5:].copy()
+    update.loc[5, ["high_price", "close_price", "volume"]] = [99_999.0, 99_000.0, 42.0]
+    loader.write(update, "BTCUSDT", "1m")
+    loader.write(bars.iloc[:2], "BTCUSDT", "5m")  # Same times, other interval
+
+    rows = stored(engine)
+    one_minute = rows[rows["interval"] == "1m"].reset_index(drop=True)
+    assert len(one_minute) == 10 and (rows["interval"] == "5m").sum() == 2
+    assert one_minute.loc[5, ["high_price", "close_price", "volume"]].tolist() == [99_999.0, 99_000.0, 42.0]
+    assert one_minute.loc[4, "close_price"] == pytest.approx(bars.loc[4, "close_price"])
+
+
+def test_csv_files_are_streamed_in_chunks(engine, bars, tmp_path):
+    path = tmp_path / "BTCUSDT_1m.csv"
+    bars.to_csv(path, index=False)
+    loader = KlineBulkLoader(engine)
+    assert loader.load_csv(path, chunksize=4, symbol="BTCUSDT", interval="1m") == 10
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(Kline)).scalar() == 10
+    assert stored(engine)["open_time"].tolist() == bars["open_time"].tolist()
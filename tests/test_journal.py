@@ -0,0 +1,99 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.data.journal import TradeJournal
+from app.data.model import Base, Cycle
+
+T0 = 1_700_006_400_000
+MINUTE = 60_000
+
+
+class FlakySessions:
+    """async_sessionmaker whose first `failures` sessions can't reach the database."""
+
+    def __init__(self, session_factory, failures=0):
+        self.session_factory = session_factory
+        self.failures = failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            return UnreachableSession()
+        return self.session_factory()
+
+
+class UnreachableSession:
+    async def __aenter__(self):
+        raise ConnectionResetError("connection lost")
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def journal_test(test, failures=0, **kwargs):
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(lambda sync: Base.metadata.create_all(sync, tables=[Cycle.__table__]))
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        journal = TradeJournal(FlakySessions(session_factory, failures), strategy_id="rsi", retry_delay=0, **kwargs)
+        try:
+            await test(journal)
+            async with session_factory() as session:
+                return (await session.execute(select(Cycle).order_by(Cycle.id))).scalars().all()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_cycles_open_and_close_through_the_writer():
+    async def trade(journal):
+        journal.start()
+        journal.open_cycle("BTCUSDT", 100.0, T0, quantity=1.0, fees=0.1)
+        await asyncio.sleep(0.05)
+        journal.close_cycle("BTCUSDT", 110.0, T0 + MINUTE, fees=0.1, profit=9.8, exit_reason=1)
+        await journal.close()
+
+    cycles = journal_test(trade, flush_interval=0.01)
+    assert len(cycles) == 1
+    assert cycles[0].status == "completed" and cycles[0].exit_reason == "target_profit"
+    assert cycles[0].fees == 0.2
+
+
+def test_close_finds_the_open_cycle_in_the_database():
+    async def restart(journal):
+        journal.open_cycle("BTCUSDT", 100.0, T0, quantity=1.0)
+        await journal.close()
+        journal.ids.clear()  # As after a restart
+        journal.close_cycle("BTCUSDT", 90.0, T0 + MINUTE, profit=-10.0, exit_reason=0)
+        await journal.close()
+
+    cycles = journal_test(restart)
+    assert [(cycle.status, cycle.sell_price, cycle.exit_reason) for cycle in cycles] == [("completed", 90.0, "stop_loss")]
+
+
+def test_failed_batches_are_retried_in_order():
+    async def trade(journal):
+        journal.start()
+        journal.open_cycle("BTCUSDT", 100.0, T0)
+        journal.close_cycle("BTCUSDT", 110.0, T0 + MINUTE)
+        journal.open_cycle("BTCUSDT", 105.0, T0 + 2 * MINUTE)
+        await journal.close()
+
+    cycles = journal_test(trade, failures=2, flush_interval=0.01)
+    assert [(cycle.buy_price, cycle.status) for cycle in cycles] == [(100.0, "completed"), (105.0, "in_progress")]
+
+
+def test_close_gives_up_after_close_retries():
+    dropped = []
+
+    async def trade(journal):
+        journal.open_cycle("BTCUSDT", 100.0, T0)
+        await journal.close()
+        dropped.append(journal.dropped)
+
+    assert journal_test(trade, failures=10, close_retries=2) == []
+    assert dropped == [1]
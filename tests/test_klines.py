@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pandas as pd
+import pytest
+
+from app.data import klines as klines_module
+from app.data.exceptions import BinanceRateLimitError
+from app.data.klines import BINANCE_BASE_URL, KLINES_PATH, BinanceKlines, RequestWeightLimiter
+
+MINUTE = 60_000
+
+
+def kline(open_time):
+    price = str(100 + open_time // MINUTE % 50)
+    return [open_time, price, price, price, price, "1.0", open_time + MINUTE - 1, "100.0", 10, "0.5", "50.0", "0"]
+
+
+class MockBinance:
+    """/api/v3/klines over httpx.MockTransport: 1m bars on every minute, `responses` served first."""
+
+    def __init__(self, responses=(), used_weight=10):
+        self.responses = list(responses)
+        self.used_weight = used_weight
+        self.requests = []
+
+    def __call__(self, request):
+        assert request.url.path == KLINES_PATH
+        self.requests.append(dict(request.url.params))
+        if self.responses:
+            return self.responses.pop(0)
+        start = int(request.url.params["startTime"])
+        end = int(request.url.params["endTime"])  # Inclusive, as on Binance
+        limit = int(request.url.params["limit"])
+        first = start + (-start) % MINUTE
+        bars = [kline(open_time) for open_time in range(first, end + 1, MINUTE)][:limit]
+        return httpx.Response(200, json=bars, headers={"x-mbx-used-weight-1m": str(self.used_weight)})
+
+    def client(self):
+        return httpx.AsyncClient(base_url=BINANCE_BASE_URL, transport=httpx.MockTransport(self))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records backoff sleeps instead of waiting."""
+    recorded = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        recorded.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(klines_module.asyncio, "sleep", sleep)
+    return recorded
+
+
+def fetcher(server, start, end, **kwargs):
+    return BinanceKlines("BTCUSDT", "1m", start, end, client=server.client(), **kwargs)
+
+
+def test_chunks_are_merged_in_order_without_gaps():
+    server = MockBinance()
+    start, end = 0, 2500 * MINUTE
+    frame = asyncio.run(fetcher(server, start, end, limit=1000, max_concurrency=3).fetch_and_wrangle_klines(
+        save_to_csv=False, batch_size=2))
+
+    assert len(server.requests) == 3
+    assert [int(params["endTime"]) + 1 for params in server.requests] == [1000 * MINUTE, 2000 * MINUTE, end]
+    open_time = pd.Series(frame["open_time"].to_numpy().astype("datetime64[ms]").astype("int64"))
+    assert len(frame) == 2500
+    assert open_time.is_monotonic_increasing and open_time.is_unique
+    assert open_time.iloc[0] == start and open_time.iloc[-1] == end - MINUTE
+
+
+def test_overlapping_chunks_are_deduplicated():
+    server = MockBinance()
+    klines = fetcher(server, 0, 10 * MINUTE)
+    merged = asyncio.run(klines.fetch_chunks([(0, 6 * MINUTE), (4 * MINUTE, 10 * MINUTE)]))
+    assert [bar[0] for bar in merged] == [i * MINUTE for i in range(10)]
+
+
+@pytest.mark.parametrize("status", [429, 418])
+def test_rate_limit_responses_are_retried_after_the_requested_delay(sleeps, status):
+    server = MockBinance([httpx.Response(status, headers={"retry-after": "3"})])
+    klines = fetcher(server, 0, 5 * MINUTE)
+    bars = asyncio.run(klines.fetch_data_from_binance(0, 5 * MINUTE))
+
+    assert len(bars) == 5
+    assert len(server.requests) == 2
+    assert sleeps and sleeps[0] == pytest.approx(3, abs=0.1)  # The limiter holds requests until Retry-After
+
+
+def test_rate_limit_gives_up_after_max_retries(sleeps):
+    server = MockBinance([httpx.Response(429, headers={"retry-after": "0"})] * 3)
+    klines = fetcher(server, 0, 5 * MINUTE, max_retries=2)
+    with pytest.raises(BinanceRateLimitError):
+        asyncio.run(klines.fetch_data_from_binance(0, 5 * MINUTE))
+    assert len(server.requests) == 3
+
+
+def test_server_errors_back_off_exponentially(sleeps):
+    server = MockBinance([httpx.Response(502), httpx.Response(503)])
+    bars = asyncio.run(fetcher(server, 0, 5 * MINUTE).fetch_data_from_binance(0, 5 * MINUTE))
+    assert len(bars) == 5
+    assert sleeps == [1, 2]
+
+
+def test_used_weight_header_updates_the_limiter():
+    server = MockBinance(used_weight=1234)
+    klines = fetcher(server, 0, 5 * MINUTE)
+    asyncio.run(klines.fetch_data_from_binance(0, 5 * MINUTE))
+    assert klines.rate_limiter.used_weight == 1234
+
+
+def test_limiter_waits_for_the_next_window_near_the_budget(sleeps):
+    limiter = RequestWeightLimiter(weight_limit=100, safety_margin=0.9, request_weight=2)
+    limiter.update_from_headers({"x-mbx-used-weight-1m": "89"})
+    asyncio.run(limiter.acquire())
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 60
+    assert limiter.used_weight == 2  # New window, with this request reserved
+
+
+def test_chunk_size_larger_than_a_page_is_rejected():
+    with pytest.raises(ValueError):
+        BinanceKlines("BTCUSDT", "1m", 0, MINUTE, chunk_size=1001 * MINUTE)
+    assert BinanceKlines("BTCUSDT", "1m", 0, MINUTE, chunk_size=500 * MINUTE).chunk_size == 500 * MINUTE
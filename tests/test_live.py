@@ -0,0 +1,189 @@
+import asyncio
+import json
+import time
+
+import pytest
+import websockets
+from websockets.datastructures import Headers
+from websockets.http11 import Response
+
+from app.data import live as live_module
+from app.data.live import KlineRingBuffer, LiveKlineService
+
+from tests.test_klines import MINUTE, MockBinance
+
+T0 = 1_700_006_400_000
+
+
+def message(open_time, closed=True, symbol="BTCUSDT"):
+    kline = {"s": symbol, "t": open_time, "T": open_time + MINUTE - 1, "o": "1", "h": "2", "l": "0.5", "c": "1.5",
+             "v": "10", "n": 3, "x": closed}
+    return json.dumps({"stream": f"{symbol.lower()}@kline_1m", "data": {"e": "kline", "k": kline}})
+
+
+class FakeConnection:
+    """Serves `messages`, then raises `error`, or stops the service and waits when there is none."""
+
+    def __init__(self, service, messages, error=None):
+        self.service = service
+        self.messages = list(messages)
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def recv(self):
+        if self.messages:
+            return self.messages.pop(0)
+        if self.error is not None:
+            raise self.error
+        await self.service.stop()
+        await asyncio.Future()
+
+
+class FakeStream:
+    """Stands in for websockets.connect, one scripted FakeConnection (or exception) per connect."""
+
+    def __init__(self, service, connections):
+        self.service = service
+        self.connections = list(connections)
+        self.urls = []
+
+    def __call__(self, url, **kwargs):
+        self.urls.append(url)
+        connection = self.connections.pop(0)
+        if isinstance(connection, Exception):
+            raise connection
+        return FakeConnection(self.service, *connection)
+
+
+class RecordingWriter:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.frames = []
+
+    def write(self, df, symbol, interval):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.frames.append((symbol, interval, df))
+
+    def open_times(self):
+        return [int(t.value // 1_000_000) for _, _, df in self.frames for t in df["open_time"]]
+
+
+@pytest.fixture
+def now(monkeypatch):
+    # Wall clock 30s into the bar opened at T0 + 5 minutes
+    monkeypatch.setattr(live_module.time, "time", lambda: (T0 + 5 * MINUTE + 30_000) / 1000)
+
+
+def run(service, stream, monkeypatch):
+    monkeypatch.setattr(live_module.websockets, "connect", stream)
+    asyncio.run(service.run())
+
+
+def fast_wait_for(wait_for):
+    """asyncio.wait_for with the reconnect backoff cut short."""
+    async def wait(awaitable, timeout):
+        return await wait_for(awaitable, timeout=min(timeout, 0.01))
+    return wait
+
+
+def test_ring_buffer_keeps_the_last_bars_in_order():
+    buffer = KlineRingBuffer(capacity=3)
+    for i in range(5):
+        assert buffer.update(i * MINUTE, i * MINUTE + MINUTE - 1, 1.0, 2.0, 0.5, float(i), 10.0, True)
+    assert len(buffer) == 3 and buffer.count == 5
+    arrays = buffer.arrays()
+    assert arrays["open_time"].tolist() == [2 * MINUTE, 3 * MINUTE, 4 * MINUTE]
+    assert arrays["close_price"].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_ring_buffer_overwrites_the_open_bar_and_rejects_stale_ones():
+    buffer = KlineRingBuffer(capacity=3)
+    buffer.update(0, MINUTE - 1, 1.0, 1.0, 1.0, 1.0, 1.0, True)
+    buffer.update(MINUTE, 2 * MINUTE - 1, 1.0, 1.5, 1.0, 1.2, 2.0, False)
+    buffer.update(MINUTE, 2 * MINUTE - 1, 1.0, 1.8, 0.9, 1.4, 3.0, True)
+
+    assert len(buffer) == 2 and buffer.latest_open_time == MINUTE
+    assert buffer.arrays()["high_price"].tolist() == [1.0, 1.8]
+    assert buffer.arrays()["closed"].tolist() == [True, True]
+    assert not buffer.update(0, MINUTE - 1, 9.0, 9.0, 9.0, 9.0, 9.0, True)
+
+
+def test_warm_up_backfill_fills_the_buffer_without_storing_or_notifying(now):
+    server = MockBinance()
+    writer = RecordingWriter()
+    service = LiveKlineService(["BTCUSDT"], capacity=4, writer=writer, rest_client=server.client())
+    notified = []
+    service.subscribe(lambda symbol, buffer, closed: notified.append(buffer.latest_open_time))
+
+    assert asyncio.run(service.backfill("BTCUSDT", service.rest_client)) == 4
+    assert service.buffers["BTCUSDT"].arrays()["open_time"].tolist() == [T0 + i * MINUTE for i in range(1, 5)]
+    assert service.last_closed["BTCUSDT"] == T0 + 4 * MINUTE
+    assert not service.pending and not notified
+
+
+def test_reconnect_backfills_the_gap_and_drops_replayed_bars(now, monkeypatch):
+    server = MockBinance()
+    writer = RecordingWriter()
+    service = LiveKlineService(["BTCUSDT"], writer=writer, rest_client=server.client(), warm_up=False)
+    stream = FakeStream(service, [
+        ([message(T0), message(T0 + MINUTE)], websockets.ConnectionClosedError(None, None)),
+        websockets.InvalidStatus(Response(429, "Too Many Requests", Headers())),
+        # T0 + 4m was backfilled over REST while the stream was down
+        ([message(T0 + 4 * MINUTE), message(T0 + 5 * MINUTE, closed=False)],),
+    ])
+    monkeypatch.setattr(live_module.asyncio, "wait_for", fast_wait_for(asyncio.wait_for))
+    run(service, stream, monkeypatch)
+
+    assert len(stream.urls) == 3 and service.reconnects == 2
+    assert [int(params["startTime"]) for params in server.requests] == [T0 + 2 * MINUTE]
+    assert service.buffers["BTCUSDT"].arrays()["open_time"].tolist() == [T0 + i * MINUTE for i in range(6)]
+    assert writer.open_times() == [T0 + i * MINUTE for i in range(5)]
+
+
+def test_failed_flush_requeues_the_bars(now):
+    writer = RecordingWriter(failures=1)
+    service = LiveKlineService(["BTCUSDT"], writer=writer, warm_up=False)
+    for i in range(2):
+        service.handle_message(message(T0 + i * MINUTE))
+
+    async def flush_twice():
+        with pytest.raises(OSError):
+            await service.flush()
+        service.handle_message(message(T0 + 2 * MINUTE))
+        return await service.flush()
+
+    assert asyncio.run(flush_twice()) == 3
+    assert writer.open_times() == [T0, T0 + MINUTE, T0 + 2 * MINUTE]
+
+
+class SlowWriter(RecordingWriter):
+    """Writer taking a while in its worker thread, recording how many writes overlap."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+
+    def write(self, df, symbol, interval):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        super().write(df, symbol, interval)
+        self.active -= 1
+
+
+def test_stop_waits_for_the_flush_in_progress(now, monkeypatch):
+    writer = SlowWriter()
+    service = LiveKlineService(["BTCUSDT"], writer=writer, warm_up=False, flush_size=1)
+    stream = FakeStream(service, [([message(T0 + i * MINUTE) for i in range(3)],)])
+    run(service, stream, monkeypatch)
+
+    assert writer.max_active == 1
+    assert sorted(writer.open_times()) == [T0, T0 + MINUTE, T0 + 2 * MINUTE]
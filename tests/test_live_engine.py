@@ -0,0 +1,90 @@
+import asyncio
+
+import pandas as pd
+
+from app.data.live import KlineRingBuffer
+from app.strategies.live_engine import LiveTradingEngine
+
+MINUTE = 60_000
+
+
+def closed_bar(buffer, open_time):
+    buffer.update(open_time, open_time + MINUTE - 1, 1.0, 2.0, 0.5, 1.5, 10.0, True)
+    return buffer
+
+
+def queued_close_times(engine):
+    close_times = []
+    while not engine.bars.empty():
+        close_times.append(engine.bars.get_nowait()["close_time"])
+    return close_times
+
+
+class WarmUpStrategy:
+    def warm_up(self, data):
+        return {}
+
+
+def test_on_bar_drops_bars_already_warmed_up_on():
+    engine = LiveTradingEngine(exchange=None, strategy=WarmUpStrategy())
+    history = pd.DataFrame({
+        "high_price": [2.0, 2.0], "low_price": [0.5, 0.5], "close_price": [1.5, 1.5],
+        "close_time": pd.to_datetime([MINUTE - 1, 2 * MINUTE - 1], unit="ms"),
+    })
+    engine.warm_up(history)
+    buffer = KlineRingBuffer()
+    for open_time in (0, MINUTE, 2 * MINUTE):
+        engine.on_bar("BTCUSDT", closed_bar(buffer, open_time), True)
+    assert queued_close_times(engine) == [3 * MINUTE - 1]
+
+
+def test_on_bar_queues_each_closed_bar_once():
+    engine = LiveTradingEngine(exchange=None, strategy=None)
+    buffer = closed_bar(KlineRingBuffer(), 0)
+    engine.on_bar("BTCUSDT", buffer, True)
+    engine.on_bar("BTCUSDT", buffer, True)  # Same bar notified again
+    engine.on_bar("ETHUSDT", closed_bar(KlineRingBuffer(), MINUTE), True)
+    buffer.update(MINUTE, 2 * MINUTE - 1, 1.0, 2.0, 0.5, 1.5, 10.0, False)
+    engine.on_bar("BTCUSDT", buffer, False)
+    assert queued_close_times(engine) == [MINUTE - 1]
+
+
+class PriceOnlyExchange:
+    def update_price(self, symbol, price):
+        pass
+
+
+class FlakyStrategy:
+    """Fails on the first bar, then never signals."""
+
+    def __init__(self):
+        self.updates = 0
+        self.stream = self
+
+    def update(self, bar):
+        self.updates += 1
+        if self.updates == 1:
+            raise RuntimeError("indicator blew up")
+        return 0
+
+    def values(self):
+        return {"ATR": float("nan")}
+
+
+def test_run_keeps_consuming_bars_after_an_error():
+    strategy = FlakyStrategy()
+    engine = LiveTradingEngine(PriceOnlyExchange(), strategy)
+    buffer = KlineRingBuffer()
+    for open_time in (0, MINUTE):
+        engine.on_bar("BTCUSDT", closed_bar(buffer, open_time), True)
+
+    async def consume():
+        task = asyncio.create_task(engine.run())
+        while strategy.updates < 2 and not task.done():
+            await asyncio.sleep(0)
+        running = not task.done()
+        task.cancel()
+        return running
+
+    assert asyncio.run(consume())
+    assert strategy.updates == 2
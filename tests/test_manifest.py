@@ -0,0 +1,63 @@
+import asyncio
+
+import pandas as pd
+
+from app.data.klines import BinanceKlines
+from app.data.manifest import BackfillManifest, find_holes, merge_ranges, subtract_ranges
+
+from tests.test_klines import MINUTE, MockBinance
+
+
+def minutes(*ranges):
+    return [[start * MINUTE, end * MINUTE] for start, end in ranges]
+
+
+def test_find_holes_between_and_around_the_stored_bars():
+    stored = [t * MINUTE for t in (2, 3, 4, 7, 8)]
+    assert find_holes(stored, MINUTE, 0, 12 * MINUTE) == minutes((0, 2), (5, 7), (9, 12))
+    assert find_holes(stored, MINUTE, 2 * MINUTE, 5 * MINUTE) == []
+    assert find_holes([], MINUTE, 0, 3 * MINUTE) == minutes((0, 3))
+
+
+def test_ranges_are_merged_and_subtracted():
+    assert merge_ranges(minutes((5, 6), (0, 2), (2, 3), (1, 2))) == minutes((0, 3), (5, 6))
+    covered = minutes((2, 3), (5, 12))
+    assert subtract_ranges(0, 10 * MINUTE, covered) == minutes((0, 2), (3, 5))
+    assert subtract_ranges(6 * MINUTE, 8 * MINUTE, covered) == []
+    assert subtract_ranges(0, MINUTE, covered) == minutes((0, 1))
+
+
+def test_manifest_persists_and_forgets_ranges(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = BackfillManifest(str(path))
+    manifest.record("BTCUSDT", "1m", completed=minutes((0, 5), (5, 10)), empty=minutes((3, 4)))
+
+    reloaded = BackfillManifest(str(path))
+    assert reloaded.completed("BTCUSDT", "1m") == [tuple(r) for r in minutes((0, 10))]
+    assert reloaded.empty("BTCUSDT", "1m") == [tuple(r) for r in minutes((3, 4))]
+    assert reloaded.missing("BTCUSDT", "1m", 0, 15 * MINUTE) == minutes((10, 15))
+
+    reloaded.forget("BTCUSDT", "1m", 4 * MINUTE, 6 * MINUTE)
+    assert reloaded.missing("BTCUSDT", "1m", 0, 15 * MINUTE) == minutes((4, 6), (10, 15))
+
+
+def backfill(server, tmp_path, start, end):
+    klines = BinanceKlines("BTCUSDT", "1m", start, end, client=server.client(), limit=100, output_dir=str(tmp_path))
+    return asyncio.run(klines.backfill(batch_size=2))
+
+
+def test_backfill_only_fetches_what_is_missing(tmp_path):
+    server = MockBinance()
+    assert backfill(server, tmp_path, 0, 300 * MINUTE) == 300
+    assert backfill(server, tmp_path, 0, 300 * MINUTE) == 0
+
+    # A hole in the stored CSV, then a longer range: only the hole and the new bars are fetched
+    path = tmp_path / "BTCUSDT_1m.csv"
+    stored = pd.read_csv(path)
+    stored.drop(index=range(120, 130)).to_csv(path, index=False)
+    server.requests.clear()
+    assert backfill(server, tmp_path, 0, 350 * MINUTE) == 60
+    assert sorted(int(params["startTime"]) for params in server.requests) == [120 * MINUTE, 300 * MINUTE]
+
+    open_time = pd.to_datetime(pd.read_csv(path)["open_time"]).astype("datetime64[ms]").astype("int64")
+    assert open_time.tolist() == [t * MINUTE for t in range(350)]
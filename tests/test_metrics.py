@@ -0,0 +1,76 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.strategies import metrics as m
+
+from tests.conftest import random_walk_klines
+
+USE_JIT = [
+    pytest.param(True, id="jit", marks=pytest.mark.skipif(m.njit is None, reason="numba is not installed")),
+    pytest.param(False, id="numpy"),
+]
+
+CLOSE = [100.0, 100.0, 110.0, 121.0, 121.0, 110.0]
+
+
+def test_equity_curve_marks_trades_to_market():
+    # Bought at the close of bar 1, sold at the close of bar 3 with the whole balance
+    equity = m.equity_curve(CLOSE, [1], [3], [100.0], [21.0], 100.0)
+    np.testing.assert_allclose(equity, [100.0, 100.0, 110.0, 121.0, 121.0, 121.0])
+
+
+def test_equity_curve_follows_a_position_left_open():
+    equity = m.equity_curve(CLOSE, [1], [3], [100.0], [21.0], 100.0, open_entry=4, final_balance=121.0)
+    np.testing.assert_allclose(equity, [100.0, 100.0, 110.0, 121.0, 121.0, 110.0])
+
+
+def test_equity_curve_without_trades_is_flat():
+    np.testing.assert_array_equal(m.equity_curve(CLOSE, [], [], [], [], 100.0), np.full(6, 100.0))
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_performance_metrics_of_a_hand_computed_curve(use_jit):
+    equity = [100.0, 110.0, 99.0, 121.0]
+    metrics = m.performance_metrics(equity, "1d", profit=[10.0, -11.0, 22.0], balance_before=[100.0, 110.0, 99.0],
+                                    bars_in_market=3, use_jit=use_jit)
+
+    returns = np.array([0.1, -0.1, 22 / 99])
+    mean = returns.mean()
+    std = math.sqrt(((returns - mean) ** 2).sum() / 2)
+    downside = math.sqrt(0.01 / 3)
+    cagr = 1.21 ** (365 / 3) - 1
+    expected = {
+        'Sharpe Ratio': mean / std * math.sqrt(365),
+        'Sortino Ratio': mean / downside * math.sqrt(365),
+        'Volatility (%)': std * math.sqrt(365) * 100,
+        'Max Drawdown (%)': 10.0,
+        'Max Drawdown Duration (bars)': 1,
+        'CAGR (%)': cagr * 100,
+        'Calmar Ratio': cagr / 0.1,
+        'ROI (%)': 21.0,
+        'Net Profit ($)': 21.0,
+        'Total Trades': 3,
+        'Win Rate (%)': 200 / 3,
+        'Profit Factor': 32 / 11,
+        'Expectancy ($)': 7.0,
+        'Average Profit (%)': (10 + 2200 / 99) / 2,
+        'Average Loss (%)': -10.0,
+        'Turnover': (2 * 309 + 21) / 107.5,
+        'Exposure (%)': 75.0,
+    }
+    assert metrics.keys() == expected.keys()
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value, rel=1e-12), name
+
+
+@pytest.mark.skipif(m.njit is None, reason="numba is not installed")
+def test_equity_stats_jit_and_numpy_agree():
+    equity = 100 * random_walk_klines(n=10_000, seed=5)["close_price"].to_numpy() / 30000
+    np.testing.assert_allclose(m._equity_stats_jit(equity), m._equity_stats_numpy(equity), rtol=1e-9)
+
+
+def test_empty_equity_curve_is_rejected():
+    with pytest.raises(ValueError):
+        m.performance_metrics([])
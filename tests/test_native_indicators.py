@@ -0,0 +1,193 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.strategies import native_indicators as ni
+
+from tests.conftest import random_walk_klines
+
+USE_JIT = [
+    pytest.param(True, id="jit", marks=pytest.mark.skipif(ni.njit is None, reason="numba is not installed")),
+    pytest.param(False, id="numpy"),
+]
+
+
+# pandas formulas of pandas_ta 0.3.14b, the reference when pandas_ta isn't installed
+
+def ref_sma(x, length):
+    return x.rolling(length, min_periods=length).mean()
+
+
+def ref_rma(x, length):
+    return x.ewm(alpha=1 / length, min_periods=length).mean()
+
+
+def ref_ema(x, length):
+    x = x.copy()
+    seed = x.iloc[:length].mean()
+    x.iloc[:length - 1] = np.nan
+    x.iloc[length - 1] = seed
+    return x.ewm(span=length, adjust=False).mean()
+
+
+def ref_rsi(close, length):
+    change = close.diff()
+    gains, losses = ref_rma(change.clip(lower=0), length), ref_rma(change.clip(upper=0).abs(), length)
+    return 100 * gains / (gains + losses)
+
+
+def ref_bbands(close, length, std):
+    middle = ref_sma(close, length)
+    deviation = std * np.sqrt(close.rolling(length, min_periods=length).var(ddof=0))
+    return middle - deviation, middle, middle + deviation
+
+
+def ref_true_range(high, low, close):
+    previous = close.shift(1)
+    ranges = pd.concat([high - low, high - previous, previous - low], axis=1).abs().max(axis=1)
+    ranges.iloc[:1] = np.nan
+    return ranges
+
+
+def ref_atr(high, low, close, length):
+    return ref_rma(ref_true_range(high, low, close), length)
+
+
+def ref_adx(high, low, close, length):
+    up, down = high - high.shift(1), low.shift(1) - low
+    plus = ((up > down) & (up > 0)) * up
+    minus = ((down > up) & (down > 0)) * down
+    scale = 100 / ref_atr(high, low, close, length)
+    plus_di, minus_di = scale * ref_rma(plus, length), scale * ref_rma(minus, length)
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+    return ref_rma(dx, length), plus_di, minus_di
+
+
+def ref_macd(close, fast, slow, signal):
+    line = ref_ema(close, fast) - ref_ema(close, slow)
+    signal_line = ref_ema(line.loc[line.first_valid_index():], signal).reindex(line.index)
+    return line, line - signal_line, signal_line
+
+
+def ref_stoch(high, low, close, k, d, smooth_k):
+    lowest, highest = low.rolling(k).min(), high.rolling(k).max()
+    spread = highest - lowest
+    if (spread == 0).any():
+        spread = spread + sys.float_info.epsilon
+    stoch = 100 * (close - lowest) / spread
+    stoch_k = ref_sma(stoch.loc[stoch.first_valid_index():], smooth_k).reindex(stoch.index)
+    return stoch_k, ref_sma(stoch_k.loc[stoch_k.first_valid_index():], d).reindex(stoch.index)
+
+
+def ref_linreg(close, length):
+    """Value on the last bar and slope of the least squares line, as pandas_ta.linreg."""
+    x = np.arange(1, length + 1)
+    x_sum, x2_sum = x.sum(), (x * x).sum()
+    divisor = length * x2_sum - x_sum * x_sum
+
+    def slope(y):
+        return (length * (x * y).sum() - x_sum * y.sum()) / divisor
+
+    def value(y):
+        m = slope(y)
+        return m * length + (y.sum() * x2_sum - x_sum * (x * y).sum()) / divisor
+
+    return close.rolling(length).apply(value, raw=True), close.rolling(length).apply(slope, raw=True)
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return random_walk_klines(n=5000)
+
+
+def assert_matches(actual, expected):
+    actual, expected = np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+    assert actual.shape == expected.shape
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+@pytest.fixture(scope="module")
+def references(bars):
+    high, low, close, volume = bars["high_price"], bars["low_price"], bars["close_price"], bars["volume"]
+    p = ni.DEFAULT_PARAMS
+    volume_sma = ref_sma(volume, p['volume_length'])
+    swing_high, swing_low = high.rolling(p['fib_length']).max(), low.rolling(p['fib_length']).min()
+    expected = {
+        'RSI': ref_rsi(close, p['rsi_length']),
+        'SMA_short': ref_sma(close, p['sma_short_length']),
+        'SMA_long': ref_sma(close, p['sma_long_length']),
+        'EMA': ref_ema(close, p['ema_length']),
+        'ATR': ref_atr(high, low, close, p['atr_length']),
+        'volume_sma': volume_sma,
+        'relative_volume': volume / volume_sma,
+        'swing_high': swing_high,
+        'swing_low': swing_low,
+        'support': low.rolling(p['pattern_length']).min(),
+        'resistance': high.rolling(p['pattern_length']).max(),
+    }
+    expected.update(zip(('lower_band', 'middle_band', 'upper_band'),
+                        ref_bbands(close, p['bollinger_length'], p['bollinger_std_dev'])))
+    expected.update(zip(('MACD', 'MACD_hist', 'MACD_signal'),
+                        ref_macd(close, p['macd_fast'], p['macd_slow'], p['macd_signal'])))
+    expected.update(zip(('STOCH_k', 'STOCH_d'),
+                        ref_stoch(high, low, close, p['stoch_k'], p['stoch_d'], p['stoch_smooth_k'])))
+    expected.update(zip(('trendline', 'trendline_slope'), ref_linreg(close, p['trendline_length'])))
+    expected.update((f'fib_{ratio}', swing_high - ratio * (swing_high - swing_low)) for ratio in ni.FIB_RATIOS)
+    return expected
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+@pytest.mark.parametrize("indicator", list(ni.INDICATORS), ids=str)
+def test_indicators_match_the_pandas_formulas(bars, references, indicator, use_jit):
+    values = ni.compute(indicator, bars, use_jit=use_jit)
+    assert values
+    for column, actual in values.items():
+        assert_matches(actual, references[column])
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_adx_matches_the_pandas_formula(bars, use_jit):
+    high, low, close = bars["high_price"], bars["low_price"], bars["close_price"]
+    for actual, expected in zip(ni.adx(high, low, close, 30, use_jit), ref_adx(high, low, close, 30)):
+        assert_matches(actual, expected)
+
+
+@pytest.mark.skipif(ni.njit is None, reason="numba is not installed")
+@pytest.mark.parametrize("indicator", list(ni.FUSED), ids=str)
+def test_fused_kernels_match_the_separate_indicators(bars, indicator):
+    fused = ni.compute(indicator, bars, use_jit=True)
+    separate = {}
+    for group in ni.FUSED[indicator]:
+        separate.update(ni.compute(group, bars, use_jit=False))
+    assert set(fused) == set(separate)
+    for column, values in fused.items():
+        assert_matches(values, separate[column])
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_flat_prices_give_finite_stochastics(use_jit):
+    flat = np.full(50, 100.0)
+    stoch_k, stoch_d = ni.stoch(flat, flat, flat, use_jit=use_jit)
+    assert np.all(stoch_k[15:] == 0) and np.all(stoch_d[17:] == 0)
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_indicators_match_pandas_ta(bars, use_jit):
+    ta = pytest.importorskip("pandas_ta")
+    high, low, close = bars["high_price"], bars["low_price"], bars["close_price"]
+    cases = [
+        (ta.rsi(close, length=14), ni.rsi(close, 14, use_jit)),
+        (ta.sma(close, length=50), ni.sma(close, 50)),
+        (ta.ema(close, length=20), ni.ema(close, 20, use_jit)),
+        (ta.bbands(close, length=20, std=2).iloc[:, :3].to_numpy().T, ni.bbands(close, 20, 2)),
+        (ta.atr(high, low, close, length=14), ni.atr(high, low, close, 14, use_jit)),
+        (ta.adx(high, low, close, length=30).to_numpy().T, ni.adx(high, low, close, 30, use_jit)),
+        (ta.macd(close).to_numpy().T, ni.macd(close, use_jit=use_jit)),
+        (ta.stoch(high, low, close).to_numpy().T, ni.stoch(high, low, close, use_jit=use_jit)),
+        (ta.linreg(close, length=20), ni.trendline(close, 20)[0]),
+    ]
+    for expected, actual in cases:
+        assert_matches(actual, expected)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.strategies import optimizer as opt
+from app.strategies.optimizer import ParameterSweep, evaluate_combination
+
+from tests.conftest import random_walk_klines
+
+PARAM_GRID = {
+    "rsi_length": [7, 14],
+    "bollinger_length": [20, 30],
+    "target_profit": [0.2, 1],
+    "stoploss": [0.5],
+}
+
+
+@pytest.fixture(scope="module")
+def klines():
+    # A week of 1m bars
+    bars = random_walk_klines(n=7 * 1440, seed=2)
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    return bars
+
+
+def test_grid_yields_every_combination():
+    combinations = list(opt.grid(PARAM_GRID))
+    assert len(combinations) == 8
+    assert combinations[0] == {"rsi_length": 7, "bollinger_length": 20, "target_profit": 0.2, "stoploss": 0.5}
+
+
+def test_sweep_matches_evaluating_each_combination(klines):
+    sweep = ParameterSweep(klines, fees=0.1, workers=2, max_pending=3, symbol="BTCUSDT", interval="1m")
+    table = sweep.run_all(opt.grid(PARAM_GRID))
+
+    expected = pd.DataFrame([
+        evaluate_combination(klines, {"fees": 0.1, **params}, interval="1m") for params in opt.grid(PARAM_GRID)
+    ])
+    assert len(table) == 8
+    assert table["Total Trades"].sum() > 0
+    assert table["ROI (%)"].is_monotonic_decreasing
+    assert sweep.best()["ROI (%)"] == table["ROI (%)"].iloc[0]
+    # Results arrive in completion order, compare them per combination
+    by_params = list(PARAM_GRID)
+    pd.testing.assert_frame_equal(table[expected.columns].sort_values(by_params, ignore_index=True),
+                                  expected.sort_values(by_params, ignore_index=True))
+
+
+@pytest.mark.parametrize("anchored", [False, True])
+def test_walk_forward_windows_tile_the_test_periods(klines, anchored):
+    windows = opt.walk_forward_windows(klines["open_time"], train="2D", test="1D", anchored=anchored)
+    assert [test_start // 1440 for _, test_start, _ in windows] == [2, 3, 4, 5, 6]
+    assert all(window[2] == following[1] for window, following in zip(windows, windows[1:]))
+    assert windows[-1][2] == len(klines)
+    assert [train_start // 1440 for train_start, _, _ in windows] == ([0] * 5 if anchored else [0, 1, 2, 3, 4])
+
+
+def test_walk_forward_chains_the_test_equity_curves(klines):
+    walk_forward = opt.WalkForwardOptimizer(klines, train="2D", test="1D", initial_investment=100, fees=0.1,
+                                            workers=2, min_trades=0)
+    result = walk_forward.run(opt.grid(PARAM_GRID))
+
+    windows = walk_forward.windows
+    assert len(result.windows) == len(windows) == 5
+    assert result.equity.index.equals(pd.DatetimeIndex(klines["open_time"].iloc[windows[0][1]:]))
+
+    capital = 100.0
+    for (_, test_start, test_end), row in zip(windows, result.windows.itertuples()):
+        # Each test period is a fresh run of the chosen combination, scaled to the capital left by the previous one
+        params = {"fees": 0.1, **row.params}
+        close, atr, signal = opt.strategy_signals(klines, params)
+        backtester = opt.VectorizedBacktester(initial_investment=1.0, **{name: params[name] for name in opt.RISK_PARAMS})
+        expected = capital * backtester.run_arrays(close[test_start:test_end], atr[test_start:test_end],
+                                            signal[test_start:test_end]).equity
+        segment = result.equity.iloc[test_start - windows[0][1]:test_end - windows[0][1]].to_numpy()
+        np.testing.assert_allclose(segment, expected, rtol=1e-12)
+        assert segment[0] == pytest.approx(capital)
+        capital = segment[-1]
+    assert result.metrics("1m")["ROI (%)"] == pytest.approx(capital - 100.0)
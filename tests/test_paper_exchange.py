@@ -0,0 +1,90 @@
+import pytest
+
+from app.strategies.exceptions import InsufficientBalanceError, OrderRejectedError
+from app.strategies.paper_exchange import PaperExchange
+
+MINUTE = 60_000
+
+
+def holding_btc(**kwargs):
+    exchange = PaperExchange(balances={"USDT": 0.0, "BTC": 1.0}, **kwargs)
+    exchange.update_price("BTCUSDT", 100.0)
+    return exchange
+
+
+def bar(exchange, open_price, high_price, low_price, close_price, volume=100.0, open_time=0):
+    exchange.process_bar("BTCUSDT", open_time, open_price, high_price, low_price, close_price, volume)
+
+
+def test_oco_take_profit_cancels_the_stop():
+    exchange = holding_btc()
+    limit, stop = exchange.oco_sell("BTCUSDT", 1.0, price=110.0, stop_price=90.0, stop_limit_price=89.0)
+    assert exchange.free("BTC") == 0.0 and exchange.locked["BTC"] == 1.0
+
+    bar(exchange, 100.0, 105.0, 95.0, 104.0)
+    assert limit.status == stop.status == "NEW"
+    bar(exchange, 104.0, 112.0, 95.0, 111.0)
+
+    assert (limit.status, stop.status) == ("FILLED", "CANCELED")
+    assert exchange.open_orders == {}
+    assert [(fill.side, fill.price) for fill in exchange.fills] == [("SELL", 110.0)]
+    assert exchange.free("USDT") == pytest.approx(110.0 * 0.999)
+    assert exchange.locked["BTC"] == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize("pessimistic, expected", [(True, ("CANCELED", "FILLED", 89.0)),
+                                                   (False, ("FILLED", "CANCELED", 110.0))])
+def test_oco_legs_reached_in_one_bar(pessimistic, expected):
+    exchange = holding_btc(pessimistic=pessimistic)
+    limit, stop = exchange.oco_sell("BTCUSDT", 1.0, price=110.0, stop_price=90.0, stop_limit_price=89.0)
+    bar(exchange, 100.0, 115.0, 85.0, 100.0)
+    assert (limit.status, stop.status, exchange.fills[0].price) == expected
+    assert len(exchange.fills) == 1
+
+
+def test_oco_stop_limit_waits_for_its_limit_price():
+    exchange = holding_btc()
+    _, stop = exchange.oco_sell("BTCUSDT", 1.0, price=110.0, stop_price=90.0, stop_limit_price=89.0)
+    # Gaps through the stop: triggered, but the price never trades back up to 89 on the next bars
+    bar(exchange, 85.0, 86.0, 80.0, 82.0, open_time=0)
+    bar(exchange, 82.0, 88.0, 81.0, 87.0, open_time=MINUTE)
+    assert stop.triggered and stop.status == "NEW"
+    bar(exchange, 87.0, 92.0, 86.0, 91.0, open_time=2 * MINUTE)
+    assert stop.status == "FILLED" and exchange.fills[0].price == 89.0
+
+
+def test_large_limit_orders_fill_partially_with_price_improvement():
+    exchange = PaperExchange(balances={"USDT": 1000.0}, participation=0.1)
+    exchange.update_price("BTCUSDT", 101.0)
+    order = exchange.limit_order("BTCUSDT", "BUY", 5.0, 100.0)
+    assert exchange.locked["USDT"] == 500.0
+
+    bar(exchange, 101.0, 102.0, 99.0, 100.0, volume=20.0, open_time=0)
+    assert (order.status, order.executed_qty) == ("PARTIALLY_FILLED", 2.0)
+    bar(exchange, 98.0, 99.0, 97.0, 98.5, volume=20.0, open_time=MINUTE)  # Gaps below the limit: fills at the open
+    bar(exchange, 100.5, 101.0, 99.0, 100.0, volume=20.0, open_time=2 * MINUTE)
+
+    assert order.status == "FILLED" and order.order_id not in exchange.open_orders
+    assert [(fill.quantity, fill.price) for fill in exchange.fills] == [(2.0, 100.0), (2.0, 98.0), (1.0, 100.0)]
+    assert exchange.free("BTC") == pytest.approx(5.0 * 0.999)
+    assert exchange.free("USDT") == pytest.approx(1000.0 - 496.0)
+    assert exchange.locked["USDT"] == pytest.approx(0.0)
+
+
+def test_cancel_releases_the_locked_balance():
+    exchange = PaperExchange(balances={"USDT": 1000.0})
+    order = exchange.limit_order("BTCUSDT", "BUY", 2.0, 100.0)
+    with pytest.raises(InsufficientBalanceError):
+        exchange.limit_order("BTCUSDT", "BUY", 9.0, 100.0)
+    exchange.cancel(order.order_id)
+    assert order.status == "CANCELED"
+    assert exchange.free("USDT") == 1000.0 and exchange.locked["USDT"] == 0.0
+
+
+def test_orders_below_the_exchange_filters_are_rejected():
+    exchange = holding_btc()
+    with pytest.raises(OrderRejectedError):
+        exchange.market_order("BTCUSDT", "SELL", quantity=0.01)  # 1 USDT, under the 5 USDT notional
+    with pytest.raises(OrderRejectedError):
+        exchange.oco_sell("BTCUSDT", 1.0, price=95.0, stop_price=90.0, stop_limit_price=89.0)
+    assert exchange.free("BTC") == 1.0
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from app.data.parquet_store import ParquetKlineStore
+
+from tests.conftest import random_walk_klines
+
+
+def test_store_merges_frames_with_different_columns(tmp_path):
+    store = ParquetKlineStore(tmp_path)
+    bars = random_walk_klines(n=4, start=1_700_006_400_000)
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    bars["number_of_trades"] = [5, 6, 7, 8]
+
+    store.write(bars.iloc[:2], "BTCUSDT", "1m")
+    store.write(bars.iloc[2:].drop(columns="number_of_trades"), "BTCUSDT", "1m")  # Like a rollup frame
+    assert store.read("BTCUSDT", "1m")["number_of_trades"].tolist()[:2] == [5, 6]
+    assert store.read("BTCUSDT", "1m")["number_of_trades"].isna().tolist() == [False, False, True, True]
+
+    store.write(bars.iloc[:1].drop(columns="volume"), "BTCUSDT", "1m")
+    stored = store.read("BTCUSDT", "1m")
+    assert len(stored) == 4 and stored["number_of_trades"].iloc[0] == 5
+    assert stored["volume"].isna().tolist() == [True, False, False, False]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.strategies import portfolio as pf
+from app.strategies.backtester import EXIT_STOP_LOSS, EXIT_TARGET_PROFIT
+from app.strategies.portfolio import AlignedKlines, PortfolioBacktester
+
+from tests.conftest import random_walk_klines
+
+USE_JIT = [
+    pytest.param(True, id="jit", marks=pytest.mark.skipif(pf.njit is None, reason="numba is not installed")),
+    pytest.param(False, id="numpy"),
+]
+
+RISK = dict(target_profit=10, stoploss=10, fees=0, initial_investment=100, atr_multiplier=0)
+
+
+@pytest.fixture(scope="module")
+def portfolio():
+    frames = {}
+    for seed, symbol in enumerate(("BTCUSDT", "ETHUSDT", "BNBUSDT")):
+        bars = random_walk_klines(n=20_000, seed=seed)
+        bars["open_time"] = pd.to_datetime(bars["open_time"], unit="ms")
+        frames[symbol] = bars
+    # BNBUSDT lists late and ETHUSDT has an exchange gap
+    frames["BNBUSDT"] = frames["BNBUSDT"].iloc[5000:]
+    frames["ETHUSDT"] = frames["ETHUSDT"].drop(index=range(8000, 8500))
+    aligned = AlignedKlines.from_frames(frames)
+    close = aligned["close_price"]
+    atr = np.where(np.isfinite(close), close * 0.001, np.nan)
+    signal = (np.random.default_rng(3).random(close.shape) < 0.02) & aligned.valid
+    return aligned, atr, signal
+
+
+@pytest.mark.skipif(pf.njit is None, reason="numba is not installed")
+@pytest.mark.parametrize("max_allocation", [None, 0.8, {"BTCUSDT": 0.6, "ETHUSDT": 0.3}])
+def test_jit_and_numpy_give_the_same_trades(portfolio, max_allocation):
+    aligned, atr, signal = portfolio
+    runs = [
+        PortfolioBacktester(target_profit=0.2, stoploss=0.2, max_allocation=max_allocation, min_order=1.0,
+                            use_jit=use_jit).run(aligned, atr, signal)
+        for use_jit in (True, False)
+    ]
+    assert len(runs[0]) > 100
+    for name in ("symbol_idx", "entry_idx", "exit_idx", "exit_reason", "open_symbol", "open_entry"):
+        np.testing.assert_array_equal(getattr(runs[0], name), getattr(runs[1], name))
+    for name in ("exit_price", "allocation", "profit", "open_allocation"):
+        np.testing.assert_allclose(getattr(runs[0], name), getattr(runs[1], name), rtol=1e-12)
+    assert runs[0].final_balance == pytest.approx(runs[1].final_balance, rel=1e-12)
+    np.testing.assert_allclose(runs[0].equity, runs[1].equity, rtol=1e-12)
+
+
+@pytest.mark.parametrize("use_jit", USE_JIT)
+def test_symbols_share_one_capital_pool(use_jit):
+    close = [[100.0, 100.0, 105.0, 111.0, 111.0],
+             [50.0, 50.0, 44.0, 50.0, 55.0]]
+    signal = [[False, True, False, False, False],
+              [False, True, False, True, False]]
+    result = PortfolioBacktester(**RISK, max_allocation=0.5, use_jit=use_jit).run_arrays(
+        close, np.zeros((2, 5)), signal, symbols=["BTCUSDT", "ETHUSDT"])
+
+    # Bar 1: both enter with half of 100. ETH stops out on bar 2 (-6), BTC is sold at its target (110) on
+    # bar 3 (+5), then ETH re-enters with half of the 99 left and is still open at the end
+    assert [(cycle['Symbol'], cycle['Profit/Loss']) for cycle in result.to_trade_cycles()] == [
+        ("ETHUSDT", pytest.approx(-6.0)), ("BTCUSDT", pytest.approx(5.0))]
+    np.testing.assert_array_equal(result.exit_reason, [EXIT_STOP_LOSS, EXIT_TARGET_PROFIT])
+    np.testing.assert_array_equal(result.open_symbol, [1])
+    np.testing.assert_allclose(result.open_allocation, [49.5])
+    assert result.final_balance == pytest.approx(99.0)
+    np.testing.assert_allclose(result.equity, [100.0, 100.0, 96.5, 99.0, 99.0 + 49.5 * 0.1])
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.strategies.backtester import VectorizedBacktester
+from app.strategies.registry import IndicatorArrays, SignalSet, SignalSpec, get_spec, rank_strategies
+from app.strategies.schemas import StrategyIndicator
+
+from tests.conftest import random_walk_klines
+
+
+def test_crosses_and_prev_operands():
+    arrays = {
+        "close_price": np.array([10.0, 12.0, 11.0, 9.0, 13.0, 13.0]),
+        "open_price": np.array([10.0, 10.0, 12.0, 11.0, 9.0, 14.0]),
+        "EMA": np.array([np.nan, 11.0, 11.0, 10.0, 11.0, 12.0]),
+    }
+    signals = SignalSet([
+        SignalSpec("above", [("close_price", "crosses_above", "EMA")]),
+        SignalSpec("below", [("close_price", "crosses_below", "EMA")]),
+        SignalSpec("level", [("close_price", "crosses_above", 11.5)]),
+        SignalSpec("up", [(("-", "close_price", ("prev", "close_price")), ">", 1.5)]),
+        SignalSpec("up_bar_above", [("close_price", "crosses_above", "EMA"), ("close_price", ">", "open_price")]),
+    ])
+    # The shared crossing is evaluated once
+    assert len(signals.conditions) == 5
+
+    masks = signals.evaluate(arrays)
+    assert masks.shape == (5, 6)
+    # Bar 1 follows a NaN EMA, so it isn't a cross; bar 2 touches the EMA without crossing below it
+    assert np.flatnonzero(masks[0]).tolist() == [4]
+    assert np.flatnonzero(masks[1]).tolist() == [3]
+    assert np.flatnonzero(masks[2]).tolist() == [1, 4]
+    assert np.flatnonzero(masks[3]).tolist() == [1, 4]
+    assert np.flatnonzero(masks[4]).tolist() == [4]
+
+
+def test_invalid_specs_are_rejected():
+    with pytest.raises(ValueError):
+        SignalSpec("empty", [])
+    with pytest.raises(ValueError):
+        SignalSpec("operator", [("RSI", "==", 30)])
+    with pytest.raises(ValueError):
+        SignalSpec("operand", [(("prev", "RSI", "EMA"), "<", 30)])
+    with pytest.raises(ValueError):
+        get_spec("unknown")
+    assert SignalSpec("atr", [(("-", "close_price", ("prev", "close_price")), ">", "ATR")]).uses_history
+    assert not get_spec(StrategyIndicator.RSI).uses_history
+
+
+@pytest.fixture(scope="module")
+def klines():
+    return random_walk_klines(n=5000, seed=4)
+
+
+def test_rank_strategies_backtests_each_spec_on_its_signals(klines):
+    specs = [StrategyIndicator.RSI, StrategyIndicator.MACD, StrategyIndicator.ATR, StrategyIndicator.RSI_MA_MACD]
+    backtester = VectorizedBacktester(target_profit=0.5, stoploss=0.5, initial_investment=1000, use_jit=False)
+    table = rank_strategies(klines, specs=specs, backtester=backtester, use_jit=False)
+
+    assert len(table) == 4
+    assert table["ROI (%)"].is_monotonic_decreasing
+    arrays = IndicatorArrays(klines, use_jit=False)
+    for key in specs:
+        spec = get_spec(key)
+        mask = SignalSet([spec]).evaluate(arrays)[0] & np.isfinite(arrays["ATR"])
+        row = table.set_index("Strategy").loc[spec.name]
+        assert row["Signals"] == np.count_nonzero(mask) > 0
+        result = backtester.run_arrays(arrays["close_price"], arrays["ATR"], mask)
+        assert row["Final Balance"] == pytest.approx(result.final_balance)
+        assert row["Total Trades"] == result.metrics("1m")["Total Trades"]
+
+
+def test_indicators_are_computed_once_for_all_specs(klines):
+    arrays = IndicatorArrays(klines, use_jit=False)
+    signals = SignalSet(get_spec(key) for key in StrategyIndicator)
+    arrays.prepare(signals.columns | {"ATR"})
+    computed = list(arrays.computed)
+    signals.evaluate(arrays)
+    assert arrays.computed == computed  # Nothing left to compute after prepare()
+    assert len(computed) == len(set(computed))
+    assert isinstance(rank_strategies(klines, use_jit=False), pd.DataFrame)
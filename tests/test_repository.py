@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from app.data.parquet_store import ParquetKlineStore
+from app.data.repository import KlineRepository
+from app.data.resample import resample_frame
+
+from tests.conftest import random_walk_klines
+
+DAY = pd.Timedelta(days=1)
+
+
+@pytest.fixture
+def repository(tmp_path):
+    # Two days of 1m bars starting at midnight
+    bars = random_walk_klines(n=2 * 1440, start=1_700_006_400_000)
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    store = ParquetKlineStore(tmp_path)
+    store.write(bars, "BTCUSDT", "1m")
+    return KlineRepository(store=store)
+
+
+def materialize(repository, start, end):
+    bars = repository.fetch("BTCUSDT", "1m", start, end)
+    repository.store.write(resample_frame(bars, "1h"), "BTCUSDT", "1h")
+
+
+def test_covering_rollups_are_served(repository):
+    start = pd.Timestamp("2023-11-15")
+    materialize(repository, start, start + 2 * DAY)
+    candles = repository.aggregate("1h", start=start, end=start + 2 * DAY)
+    assert len(candles) == 48
+    pd.testing.assert_frame_equal(candles, repository.fetch("BTCUSDT", "1h"))
+
+
+@pytest.mark.parametrize("materialized", [(0, 1), (1, 2)])
+def test_partial_rollups_fall_back_to_the_source_bars(repository, materialized):
+    start = pd.Timestamp("2023-11-15")
+    materialize(repository, start + materialized[0] * DAY, start + materialized[1] * DAY)
+    expected = resample_frame(repository.fetch("BTCUSDT", "1m"), "1h")
+
+    candles = repository.aggregate("1h", start=start, end=start + 2 * DAY)
+    assert len(candles) == 48
+    pd.testing.assert_frame_equal(candles, expected)
+
+
+def test_rollups_with_a_hole_do_not_cover_the_range(repository):
+    start = pd.Timestamp("2023-11-15")
+    materialize(repository, start, start + 2 * DAY)
+    rollups = repository.fetch("BTCUSDT", "1h")
+    buckets = repository._source_buckets("1h", "BTCUSDT", "1m", start, start + 2 * DAY)
+
+    assert repository._covers(rollups, buckets)
+    assert not repository._covers(rollups.drop(index=10).reset_index(drop=True), buckets)
+
+
+def test_gaps_in_the_source_bars_do_not_defeat_the_rollups(tmp_path):
+    # Two days of 1m bars with a three hour outage, rolled up as the rollup writers do
+    bars = random_walk_klines(n=2 * 1440, start=1_700_006_400_000)
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    bars = bars.drop(index=range(600, 780)).reset_index(drop=True)
+    store = ParquetKlineStore(tmp_path)
+    store.write(bars, "BTCUSDT", "1m")
+    store.write(resample_frame(bars, "1h"), "BTCUSDT", "1h")
+    repository = KlineRepository(store=store)
+
+    start = pd.Timestamp("2023-11-15")
+    assert repository._source_buckets("1h", "BTCUSDT", "1m", start, start + 2 * DAY)[2] == 45
+    candles = repository.aggregate("1h", start=start, end=start + 2 * DAY)
+    pd.testing.assert_frame_equal(candles, repository.fetch("BTCUSDT", "1h"))
@@ -0,0 +1,68 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from app.data.bulk import KlineBulkLoader
+from app.data.model import Kline
+from app.data.parquet_store import ParquetKlineStore
+from app.data.response_cache import ResponseCache
+
+from tests.conftest import random_walk_klines
+
+KEY = ("BTCUSDT", "1m", "2023-11")
+
+
+def bars_from(start, n=10):
+    bars = random_walk_klines(n=n, start=int(pd.Timestamp(start).value // 1_000_000))
+    for name in ("open_time", "close_time"):
+        bars[name] = pd.to_datetime(bars[name], unit="ms")
+    return bars
+
+
+def test_closed_months_are_revalidated_by_etag():
+    cache = ResponseCache()
+    entry = cache.put(KEY, "<html>", closed=True)
+    headers = entry.headers()
+
+    assert headers["Cache-Control"] == "public, no-cache"
+    assert cache.get(KEY) is entry
+    assert entry.not_modified({"if-none-match": headers["ETag"]})
+    assert not entry.not_modified({"if-none-match": '"stale"'})
+
+
+def test_the_current_month_expires_after_the_ttl():
+    cache = ResponseCache(ttl=0)
+    entry = cache.put(KEY, "<html>", closed=False)
+    assert entry.headers()["Cache-Control"] == "public, max-age=0"
+    assert cache.get(KEY) is None
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(("BTCUSDT", "1m", "2023-09"), "a", closed=True)
+    cache.put(("BTCUSDT", "1m", "2023-10"), "b", closed=True)
+    cache.get(("BTCUSDT", "1m", "2023-09"))
+    cache.put(KEY, "c", closed=True)
+    assert sorted(cache.entries) == [("BTCUSDT", "1m", "2023-09"), KEY]
+
+
+def test_bulk_loader_writes_invalidate_the_months_written():
+    cache = ResponseCache()
+    for key in (KEY, ("BTCUSDT", "1h", "2023-11"), ("BTCUSDT", "1m", "2023-10"), ("ETHUSDT", "1m", "2023-11")):
+        cache.put(key, "<html>", closed=True)
+    engine = create_engine("sqlite://")
+    Kline.__table__.create(engine)
+    loader = KlineBulkLoader(engine, on_write=cache.invalidate)
+
+    assert loader.write(bars_from("2023-11-30 23:55"), "BTCUSDT", "1m") == 10
+    # Charts of every interval of the month are built from those bars (which run into December)
+    assert sorted(cache.entries) == [("BTCUSDT", "1m", "2023-10"), ("ETHUSDT", "1m", "2023-11")]
+
+
+def test_parquet_store_writes_invalidate_the_months_written(tmp_path):
+    cache = ResponseCache()
+    cache.put(KEY, "<html>", closed=True)
+    cache.put(("BTCUSDT", "1m", "2023-10"), "<html>", closed=True)
+    store = ParquetKlineStore(tmp_path, on_write=cache.invalidate)
+
+    store.write(bars_from("2023-11-30 23:55"), "BTCUSDT", "1m")
+    assert list(cache.entries) == [("BTCUSDT", "1m", "2023-10")]
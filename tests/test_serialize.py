@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from app.data.serialize import PRICE_COLUMNS, to_float32_binary
+
+from tests.conftest import random_walk_klines
+
+
+def test_float32_binary_columns_are_aligned():
+    klines = random_walk_klines(n=5)
+    klines["open_time"] = pd.to_datetime(klines["open_time"], unit="ms")
+    body = to_float32_binary(klines)
+    n = 5
+
+    assert len(body) == 8 + 8 * n + 4 * n * len(PRICE_COLUMNS)
+    assert np.frombuffer(body, dtype="<u8", count=1)[0] == n
+    # Zero-copy views as the chart takes them: int64 at offset 8, float32 columns after it
+    open_time = np.frombuffer(body, dtype="<i8", count=n, offset=8)
+    np.testing.assert_array_equal(open_time, klines["open_time"].to_numpy().astype("datetime64[ms]").astype(np.int64))
+    for index, name in enumerate(PRICE_COLUMNS):
+        values = np.frombuffer(body, dtype="<f4", count=n, offset=8 + 8 * n + 4 * n * index)
+        np.testing.assert_array_equal(values, klines[name].to_numpy(dtype=np.float32))
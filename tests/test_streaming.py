@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.strategies import native_indicators as ni
+from app.strategies.indicators import Strategy
+from app.strategies.streaming import StreamingIndicators
+
+PARAMS = dict(rsi_length=14, bollinger_length=20, bollinger_std_dev=2, atr_length=14, adx_length=30,
+              sma_short_length=50, sma_long_length=200)
+
+
+def streamed(klines):
+    """Values of every column after each bar, fed one bar at a time."""
+    stream = StreamingIndicators(**PARAMS)
+    rows = []
+    for high, low, close in klines[['high_price', 'low_price', 'close_price']].to_numpy():
+        stream.update(high, low, close)
+        rows.append(stream.values())
+    return {column: np.array([row[column] for row in rows]) for column in StreamingIndicators.COLUMNS}
+
+
+def batch(klines):
+    high, low, close = (klines[column].to_numpy() for column in ('high_price', 'low_price', 'close_price'))
+    lower, middle, upper = ni.bbands(close, PARAMS['bollinger_length'], PARAMS['bollinger_std_dev'])
+    return {
+        'close_price': close,
+        'RSI': ni.rsi(close, PARAMS['rsi_length']),
+        'lower_band': lower,
+        'middle_band': middle,
+        'upper_band': upper,
+        'ATR': ni.atr(high, low, close, PARAMS['atr_length']),
+        'ADX': ni.adx(high, low, close, PARAMS['adx_length'])[0],
+        'SMA_short': ni.sma(close, PARAMS['sma_short_length']),
+        'SMA_long': ni.sma(close, PARAMS['sma_long_length']),
+    }
+
+
+@pytest.mark.parametrize('column', StreamingIndicators.COLUMNS)
+def test_streaming_matches_batch(klines, column):
+    expected = batch(klines)[column]
+    actual = streamed(klines)[column]
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, equal_nan=True)
+
+
+def test_logic_strategy_labels_the_bollinger_bands(klines):
+    data = Strategy(klines.copy(), **PARAMS).logic_strategy().dropna()
+    assert (data['lower_band'] < data['middle_band']).all() and (data['middle_band'] < data['upper_band']).all()
+    np.testing.assert_allclose(data['lower_band'], batch(klines)['lower_band'][data.index], rtol=1e-12)
+
+
+def test_update_signals_match_get_decision(klines):
+    strategy = Strategy(klines.copy(), **PARAMS)
+    strategy.logic_strategy()
+    expected = (strategy.get_decision()['Signal'] == 1).to_numpy()
+
+    live = Strategy(None, **PARAMS)
+    signals = [live.update(bar) for bar in klines.to_dict('records')]
+    np.testing.assert_array_equal(np.array(signals) == 1, expected)
+
+
+def test_warm_up_then_update_continues_the_stream(klines):
+    live = Strategy(None, **PARAMS)
+    live.warm_up(klines.iloc[:2000])
+    for bar in klines.iloc[2000:].to_dict('records'):
+        live.update(bar)
+    expected = batch(klines)
+    for column, value in live.stream.values().items():
+        assert value == pytest.approx(expected[column][-1], rel=1e-9)